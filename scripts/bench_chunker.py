@@ -0,0 +1,110 @@
+"""
+Chunker throughput and memory: the previous whole-document implementation
+vs. the streaming one in AbstractIngestor._chunk.
+
+    PYTHONPATH=src:. python scripts/bench_chunker.py --pages 500
+    PYTHONPATH=src:. python scripts/bench_chunker.py --file manual.pdf
+
+Each implementation runs in a fresh interpreter so peak RSS is its own.
+Without `--file` the input is a synthetic manual of `--pages` pages. The
+run fails if the two produce different chunk ids.
+"""
+from __future__ import annotations
+import argparse
+import hashlib
+import json
+import random
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+from core.ingestion import get_ingestor
+from core.ingestion.base import AbstractIngestor, IngestParams
+from core.tokenizer import token_byte_lengths, tokenizer
+
+_WORDS = (
+    "pump valve pressure maintenance schedule replace filter inspect torque bolt "
+    "warning caution operator manual section figure table step release lock motor"
+).split()
+
+
+class _Text(AbstractIngestor):
+    def _convert_to_markdown(self, data: bytes) -> str:
+        return data.decode()
+
+
+def _legacy_chunk(ingestor: AbstractIngestor, text: str, source: str):
+    """The chunker as it was: encode everything, decode every window."""
+    enc = tokenizer()
+    tokens = enc.encode(text)
+    size, overlap = ingestor.params.chunk_size, ingestor.params.overlap
+    for i in range(0, len(tokens), size - overlap):
+        chunk_text = enc.decode(tokens[i : i + size])
+        digest = hashlib.md5(chunk_text.encode("utf-8")).hexdigest()[:12]
+        yield f"{Path(source).stem}_{digest}"
+
+
+def _manual(pages: int) -> str:
+    rng = random.Random(0)
+    out = []
+    for p in range(pages):
+        lines = [f"## Section {p + 1}"]
+        for _ in range(40):
+            lines.append(" ".join(rng.choices(_WORDS, k=rng.randint(6, 18))).capitalize() + ".")
+        out.append("\n".join(lines))
+    return "\n\n".join(out)
+
+
+def _run(impl: str, pages: int, file: str | None) -> dict:
+    if file:
+        text = get_ingestor(file)._convert_to_markdown(Path(file).read_bytes())
+    else:
+        text = _manual(pages)
+    tokenizer(), token_byte_lengths()  # load outside the timed region
+    ingestor = _Text(IngestParams())
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    if impl == "legacy":
+        ids = list(_legacy_chunk(ingestor, text, "manual.pdf"))
+    else:
+        ids = [c.id for c in ingestor._chunk(text, "manual.pdf")]
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "chunks": len(ids),
+        "seconds": elapsed,
+        "peak_rss_mb": peak / 1024,
+        "rss_growth_mb": (peak - rss_before) / 1024,
+        "ids": hashlib.sha1("\n".join(ids).encode()).hexdigest(),
+    }
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--pages", type=int, default=500)
+    p.add_argument("--file", default=None, help="pdf/docx/xlsx to chunk instead of the synthetic manual")
+    p.add_argument("--impl", choices=("legacy", "streaming"), help=argparse.SUPPRESS)
+    args = p.parse_args()
+    if args.impl:
+        print(json.dumps(_run(args.impl, args.pages, args.file)))
+        return
+
+    results = {}
+    for impl in ("legacy", "streaming"):
+        cmd = [sys.executable, __file__, "--impl", impl, "--pages", str(args.pages)]
+        if args.file:
+            cmd += ["--file", args.file]
+        results[impl] = json.loads(subprocess.run(cmd, capture_output=True, text=True, check=True).stdout)
+    print(f"{'impl':>10} {'chunks':>7} {'chunks/s':>9} {'peak RSS MB':>12} {'growth MB':>10}")
+    for impl, r in results.items():
+        print(
+            f"{impl:>10} {r['chunks']:>7} {r['chunks'] / r['seconds']:>9.0f}"
+            f" {r['peak_rss_mb']:>12.1f} {r['rss_growth_mb']:>10.1f}"
+        )
+    if results["legacy"]["ids"] != results["streaming"]["ids"]:
+        raise SystemExit("chunk ids differ between implementations")
+
+
+if __name__ == "__main__":
+    main()
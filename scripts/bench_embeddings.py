@@ -0,0 +1,85 @@
+"""
+Embedding throughput vs. concurrency against a local fake OpenAI server.
+
+    PYTHONPATH=src:. python scripts/bench_embeddings.py --texts 5000 --latency 0.2
+
+The fake server sleeps `--latency` seconds per request and can inject 429s
+(`--error-rate`) to exercise the backoff path. No network access is needed.
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from openai import AsyncOpenAI
+from core.embeddings import OpenAIEmbedding
+
+
+def _handler(latency: float, error_rate: float, dim: int):
+    class FakeEmbeddings(BaseHTTPRequestHandler):
+        def do_POST(self) -> None:
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            time.sleep(latency)
+            if random.random() < error_rate:
+                self._send(429, {"error": {"message": "rate limited", "type": "rate_limit"}})
+                return
+            data = [
+                {"object": "embedding", "index": i, "embedding": [float(len(t) % 7)] * dim}
+                for i, t in enumerate(body["input"])
+            ]
+            self._send(200, {"object": "list", "data": data, "model": body["model"],
+                             "usage": {"prompt_tokens": 0, "total_tokens": 0}})
+
+        def _send(self, code: int, payload: dict) -> None:
+            raw = json.dumps(payload).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(raw)))
+            self.end_headers()
+            self.wfile.write(raw)
+
+        def log_message(self, *args) -> None:  # keep the benchmark output readable
+            pass
+
+    return FakeEmbeddings
+
+
+async def _bench(base_url: str, texts: list[str], concurrency: int, batch: int) -> float:
+    client = AsyncOpenAI(api_key="fake", base_url=base_url, max_retries=0)
+    emb = OpenAIEmbedding(model="fake", batch=batch, concurrency=concurrency, client=client)
+    start = time.perf_counter()
+    out = await emb.embed_texts(texts)
+    elapsed = time.perf_counter() - start
+    assert len(out) == len(texts)
+    assert all(v[0] == float(len(t) % 7) for v, t in zip(out, texts)), "order not preserved"
+    await client.close()
+    return elapsed
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--texts", type=int, default=5000)
+    p.add_argument("--batch", type=int, default=100, help="max items per request")
+    p.add_argument("--latency", type=float, default=0.2, help="seconds per fake request")
+    p.add_argument("--error-rate", type=float, default=0.0)
+    p.add_argument("--dim", type=int, default=64)
+    p.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    args = p.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _handler(args.latency, args.error_rate, args.dim))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+    texts = [f"chunk {i} " + "lorem ipsum " * (i % 40) for i in range(args.texts)]
+    print(f"{'concurrency':>11} {'seconds':>8} {'texts/s':>9}")
+    for c in args.concurrency:
+        elapsed = asyncio.run(_bench(base_url, texts, c, args.batch))
+        print(f"{c:>11} {elapsed:>8.2f} {len(texts) / elapsed:>9.0f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
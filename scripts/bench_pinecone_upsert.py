@@ -0,0 +1,129 @@
+"""
+Bulk upsert throughput: the previous serial path (embed everything, then
+fixed 80-vector requests one at a time) vs. the pipelined
+PineconeVectorStore.upsert at several concurrencies.
+
+    PYTHONPATH=src:. python scripts/bench_pinecone_upsert.py --chunks 5000
+    PYTHONPATH=src:. python scripts/bench_pinecone_upsert.py --concurrency 1 4 16 --error-rate 0.02
+
+Runs against an in-process fake index whose request latency is
+`--latency` plus payload size over `--bandwidth`, which rejects bodies
+over 2 MB like the real API, and fails `--error-rate` of requests. The
+embedding model is a fake with `--embed-latency` per call. No network
+access is needed.
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import random
+import time
+from types import SimpleNamespace
+from core.schema import Chunk, DocumentBatch
+from core.vector_stores.pinecone_store import PineconeVectorStore
+
+_LIMIT = 2 * 1024 * 1024
+
+
+class FakeEmbedding:
+    def __init__(self, latency: float, dim: int) -> None:
+        self._latency = latency
+        self._dim = dim
+
+    async def embed_texts(self, texts):
+        await asyncio.sleep(self._latency)
+        rng = random.Random(len(texts))
+        return [[rng.uniform(-0.1, 0.1) for _ in range(self._dim)] for _ in texts]
+
+
+class FakeIndex:
+    def __init__(self, latency: float, bandwidth: float, error_rate: float) -> None:
+        self._latency = latency
+        self._bandwidth = bandwidth
+        self._error_rate = error_rate
+        self.rejected = 0
+
+    async def upsert(self, vectors, namespace):
+        body = len(json.dumps({"namespace": namespace, "vectors": [
+            {"id": i, "values": list(v), "metadata": m} for i, v, m in vectors
+        ]}))
+        await asyncio.sleep(self._latency + body / self._bandwidth)
+        if body > _LIMIT:
+            self.rejected += 1
+            raise ValueError(f"request size {body} exceeds 2 MB")
+        if random.random() < self._error_rate:
+            raise ConnectionError("503 from fake index")
+
+    async def close(self):
+        pass
+
+
+class FakePinecone:
+    def __init__(self, index: FakeIndex) -> None:
+        self._index = index
+
+    def list_indexes(self):
+        return SimpleNamespace(names=lambda: ["rag-index"])
+
+    def Index(self, name):
+        return self._index
+
+    def describe_index(self, name):
+        return SimpleNamespace(host="fake")
+
+    def IndexAsyncio(self, host):
+        return self._index
+
+
+async def _legacy(store: PineconeVectorStore, index: FakeIndex, batch: DocumentBatch) -> int:
+    """The previous upsert: embed the whole batch, then 80 vectors per request, serially."""
+    embeds = await store._embed_async([c.text for c in batch.chunks])
+    vectors = store._build_vectors(batch.chunks, embeds)
+    sent = 0
+    for i in range(0, len(vectors), 80):
+        try:
+            await index.upsert(vectors=vectors[i : i + 80], namespace="bench")
+            sent += len(vectors[i : i + 80])
+        except Exception:
+            pass  # counted as rejected / failed
+    return sent
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--chunks", type=int, default=5000)
+    p.add_argument("--dim", type=int, default=1536)
+    p.add_argument("--text-chars", type=int, default=2000, help="chunk text carried in the metadata")
+    p.add_argument("--latency", type=float, default=0.05, help="fake request latency (s)")
+    p.add_argument("--bandwidth", type=float, default=50e6, help="fake upload bytes/s per request")
+    p.add_argument("--embed-latency", type=float, default=0.2, help="fake embedding call latency (s)")
+    p.add_argument("--error-rate", type=float, default=0.0)
+    p.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8, 16])
+    args = p.parse_args()
+
+    text = ("pump valve maintenance " * (args.text_chars // 23 + 1))[: args.text_chars]
+    batch = DocumentBatch(
+        source="bench", chunks=[Chunk(id=f"c{i}", text=text, index=i, source="bench") for i in range(args.chunks)]
+    )
+    embedding = FakeEmbedding(args.embed_latency, args.dim)
+
+    print(f"{'mode':>14} {'seconds':>8} {'vectors/s':>10} {'stored':>7} {'requests':>9} {'retries':>8}")
+    index = FakeIndex(args.latency, args.bandwidth, args.error_rate)
+    store = PineconeVectorStore(embedding, pc=FakePinecone(index))
+    start = time.perf_counter()
+    sent = asyncio.run(_legacy(store, index, batch))
+    elapsed = time.perf_counter() - start
+    requests = -(-args.chunks // 80)
+    print(f"{'legacy':>14} {elapsed:>8.2f} {sent / elapsed:>10.0f} {sent:>7} {requests:>9} {'-':>8}"
+          + (f"  ({index.rejected} rejected over 2 MB)" if index.rejected else ""))
+
+    for c in args.concurrency:
+        index = FakeIndex(args.latency, args.bandwidth, args.error_rate)
+        store = PineconeVectorStore(embedding, pc=FakePinecone(index), upsert_concurrency=c)
+        stats = store.upsert(batch, "bench")
+        print(f"{f'pipeline x{c}':>14} {stats.seconds:>8.2f} {stats.per_s:>10.0f} {stats.vectors:>7}"
+              f" {stats.batches:>9} {stats.retries:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Rerank latency and ranking agreement: ONNX Runtime vs. PyTorch cross-encoder.
+
+    PYTHONPATH=src:. python scripts/bench_rerank.py --candidates 8 32 64 --repeats 20
+
+Passages are synthetic unless `--corpus` points at a text file (one passage
+per blank-line separated block). Agreement is measured on the raw scores:
+Spearman rank correlation and overlap of the top-k sets.
+"""
+from __future__ import annotations
+import argparse
+import random
+import statistics
+import time
+from pathlib import Path
+import numpy as np
+from core.strategies.rerank import SbertRerank
+
+_WORDS = (
+    "pharmacy invoice dosage ibuprofen vaccine contract payment balance resident facility "
+    "revenue manager standing order travel typhoid children schedule wholesaler default "
+    "terminate days past due policy customer delivery insurance claim refill"
+).split()
+
+
+def _passages(corpus: str | None, n: int, rng: random.Random) -> list[str]:
+    if corpus:
+        blocks = [b.strip() for b in Path(corpus).read_text().split("\n\n") if b.strip()]
+        return [rng.choice(blocks) for _ in range(n)]
+    return [" ".join(rng.choices(_WORDS, k=rng.randint(40, 350))) for _ in range(n)]
+
+
+def _spearman(a: np.ndarray, b: np.ndarray) -> float:
+    ra, rb = np.argsort(np.argsort(a)), np.argsort(np.argsort(b))
+    return float(np.corrcoef(ra, rb)[0, 1])
+
+
+def _time(rerank: SbertRerank, pairs: list[list[str]], repeats: int) -> tuple[float, np.ndarray]:
+    scores = rerank.score_pairs(pairs)  # warm-up
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        rerank.score_pairs(pairs)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), scores
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--candidates", type=int, nargs="+", default=[8, 16, 32, 64])
+    p.add_argument("--repeats", type=int, default=20)
+    p.add_argument("--top-k", type=int, default=6)
+    p.add_argument("--threads", type=int, default=None)
+    p.add_argument("--corpus", default=None)
+    args = p.parse_args()
+
+    torch_rr = SbertRerank(backend="torch")
+    onnx_rr = SbertRerank(backend="onnx", threads=args.threads)
+    if torch_rr.mode != "cross" or onnx_rr.mode != "onnx":
+        raise SystemExit(f"need both backends, got torch={torch_rr.mode} onnx={onnx_rr.mode}")
+
+    rng = random.Random(0)
+    print(f"{'n':>4} {'torch ms':>9} {'onnx ms':>8} {'speedup':>8} {'spearman':>9} {'top-k':>6}")
+    for n in args.candidates:
+        query = " ".join(rng.choices(_WORDS, k=8))
+        pairs = [[query, t] for t in _passages(args.corpus, n, rng)]
+        t_torch, s_torch = _time(torch_rr, pairs, args.repeats)
+        t_onnx, s_onnx = _time(onnx_rr, pairs, args.repeats)
+        k = min(args.top_k, n)
+        overlap = len(set(np.argsort(-s_torch)[:k]) & set(np.argsort(-s_onnx)[:k])) / k
+        print(
+            f"{n:>4} {t_torch * 1000:>9.1f} {t_onnx * 1000:>8.1f} {t_torch / t_onnx:>7.1f}x"
+            f" {_spearman(s_torch, s_onnx):>9.3f} {overlap:>6.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Rerank throughput under concurrency: one forward pass per request vs.
+cross-request micro-batching (RerankBatcher).
+
+    PYTHONPATH=src:. python scripts/bench_rerank_batching.py --concurrency 1 8 32 --candidates 24
+
+Uses the configured SbertRerank backend. `--simulate` replaces it with a
+fake cross-encoder that burns a fixed amount of CPU per call plus a
+per-pair amount, which is enough to show the batching effect offline.
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import statistics
+import time
+import numpy as np
+from core.schema import Chunk
+from core.strategies.rerank import RerankBatcher, SbertRerank
+
+
+class SimulatedCrossEncoder:
+    mode = "cross"
+
+    def __init__(self, call_units: int, pair_units: int) -> None:
+        self._call = call_units
+        self._pair = pair_units
+
+    def score_pairs(self, pairs):
+        sum(range(1000 * (self._call + self._pair * len(pairs))))  # CPU work, not wall-clock waiting
+        return np.array([float(len(t)) for _, t in pairs], dtype=np.float32)
+
+    def run(self, query, chunks, top_n=6):
+        scores = self.score_pairs([[query, c.text] for c in chunks])
+        return [c for _, c in sorted(zip(scores, chunks), key=lambda x: -x[0])][:top_n]
+
+
+async def _bench(rerank, concurrency: int, rounds: int, chunks: list[Chunk]) -> tuple[float, float]:
+    loop = asyncio.get_running_loop()
+
+    async def _one(i: int) -> float:
+        start = time.perf_counter()
+        if isinstance(rerank, RerankBatcher):
+            await rerank.run(f"query {i}", chunks)
+        else:
+            await loop.run_in_executor(None, rerank.run, f"query {i}", chunks)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    latencies = []
+    for r in range(rounds):
+        latencies += await asyncio.gather(*(_one(r * concurrency + i) for i in range(concurrency)))
+    return concurrency * rounds / (time.perf_counter() - start), statistics.median(latencies)
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 64])
+    p.add_argument("--rounds", type=int, default=5)
+    p.add_argument("--candidates", type=int, default=24, help="pairs per request")
+    p.add_argument("--max-batch", type=int, default=64)
+    p.add_argument("--max-wait-ms", type=float, default=5.0)
+    p.add_argument("--simulate", action="store_true", help="fake cross-encoder, no model download")
+    args = p.parse_args()
+
+    inner = SimulatedCrossEncoder(call_units=400, pair_units=10) if args.simulate else SbertRerank()
+    if inner.mode not in ("onnx", "cross"):
+        raise SystemExit(f"no cross-encoder available (mode={inner.mode}); try --simulate")
+    chunks = [Chunk(id=str(i), text="passage " * (20 + i % 30), index=i, source="bench") for i in range(args.candidates)]
+
+    print(f"{'concurrency':>11} {'mode':>8} {'req/s':>8} {'p50 ms':>8} {'mean batch':>11}")
+    for c in args.concurrency:
+        for name in ("single", "batched"):
+            rerank = RerankBatcher(inner, args.max_batch, args.max_wait_ms) if name == "batched" else inner
+            qps, p50 = asyncio.run(_bench(rerank, c, args.rounds, chunks))
+            mean = rerank.stats()["mean_batch_pairs"] if name == "batched" else args.candidates
+            print(f"{c:>11} {name:>8} {qps:>8.1f} {p50 * 1000:>8.1f} {mean:>11}")
+            if name == "batched":
+                rerank.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Cold import time of the API module, measured with `python -X importtime`.
+
+    PYTHONPATH=src:. python scripts/bench_startup.py --runs 5 --top 15
+
+Each run is a fresh interpreter with the service credentials removed from
+the environment, so it also checks that importing the app needs none of
+them. Reports the median total and the slowest modules by cumulative time.
+"""
+from __future__ import annotations
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+SECRETS = ("OPENAI_API_KEY", "PINECONE_API_KEY", "SUPABASE_URL", "SUPABASE_SERVICE_KEY", "DROPBOX_APP_SECRET")
+HEAVY = ("pinecone", "chromadb", "sentence_transformers", "torch", "onnxruntime", "pandas")
+
+
+def import_profile(module: str = "app") -> tuple[dict[str, int], list[str]]:
+    """(cumulative µs per module, heavy modules loaded) for one cold import."""
+    env = {k: v for k, v in os.environ.items() if k not in SECRETS}
+    env["PYTHONPATH"] = os.pathsep.join([str(ROOT / "src"), str(ROOT), env.get("PYTHONPATH", "")])
+    code = f"import sys, {module}; print(','.join(m for m in {HEAVY!r} if m in sys.modules))"
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    cumulative: dict[str, int] = {}
+    for line in proc.stderr.splitlines():
+        if line.startswith("import time:") and "cumulative" not in line:
+            _, cum, name = line[len("import time:"):].split("|")
+            cumulative[name.strip()] = max(cumulative.get(name.strip(), 0), int(cum))
+    return cumulative, [m for m in proc.stdout.strip().split(",") if m]
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--module", default="app")
+    p.add_argument("--runs", type=int, default=5)
+    p.add_argument("--top", type=int, default=15)
+    args = p.parse_args()
+
+    profiles = [import_profile(args.module) for _ in range(args.runs)]
+    totals = [prof[args.module] / 1000 for prof, _ in profiles]
+    last, heavy = profiles[-1]
+    print(f"import {args.module}: median {statistics.median(totals):.0f} ms over {args.runs} runs")
+    print(f"heavy modules loaded: {', '.join(heavy) or 'none'}")
+    for name, cum in sorted(last.items(), key=lambda kv: kv[1], reverse=True)[1 : args.top + 1]:
+        print(f"{cum / 1000:>9.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
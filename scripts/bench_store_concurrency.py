@@ -0,0 +1,82 @@
+"""
+Retrieval under concurrency: legacy executor path vs. native query_async.
+
+    PYTHONPATH=src:. python scripts/bench_store_concurrency.py --requests 200 --fanout 4
+
+"legacy" reproduces the old orchestrator behaviour: every sub-query runs
+the sync `query` on the default executor, which starts a fresh event loop
+(asyncio.run) for the embedding call. "native" awaits `query_async`.
+Uses NumpyVectorStore and a fake embedding with fixed latency, so no
+network access is needed. Reports p50/p99 latency and peak thread count.
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import statistics
+import tempfile
+import threading
+import time
+import numpy as np
+from core.schema import Chunk, DocumentBatch
+from core.vector_stores.numpy_store import NumpyVectorStore
+
+
+class SlowEmbedding:
+    def __init__(self, latency: float, dim: int = 64) -> None:
+        self._latency = latency
+        self._dim = dim
+
+    async def embed_texts(self, texts):
+        await asyncio.sleep(self._latency)
+        rng = np.random.default_rng(abs(hash(tuple(texts))) % 2**32)
+        return rng.normal(size=(len(texts), self._dim)).tolist()
+
+
+async def _run(store: NumpyVectorStore, mode: str, requests: int, fanout: int) -> tuple[list[float], int]:
+    loop = asyncio.get_running_loop()
+    peak = threading.active_count()
+    stop = asyncio.Event()
+
+    async def _watch() -> None:
+        nonlocal peak
+        while not stop.is_set():
+            peak = max(peak, threading.active_count())
+            await asyncio.sleep(0.005)
+
+    async def _one(i: int) -> float:
+        start = time.perf_counter()
+        qs = [f"request {i} variant {j}" for j in range(fanout)]
+        if mode == "legacy":
+            await asyncio.gather(*(loop.run_in_executor(None, store.query, q, "bench", 8) for q in qs))
+        else:
+            await asyncio.gather(*(store.query_async(q, "bench", 8) for q in qs))
+        return time.perf_counter() - start
+
+    watcher = asyncio.create_task(_watch())
+    latencies = await asyncio.gather(*(_one(i) for i in range(requests)))
+    stop.set()
+    await watcher
+    return list(latencies), peak
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--requests", type=int, default=200, help="concurrent requests")
+    p.add_argument("--fanout", type=int, default=4, help="sub-queries per request")
+    p.add_argument("--latency", type=float, default=0.05, help="fake embedding latency (s)")
+    p.add_argument("--rows", type=int, default=20_000)
+    args = p.parse_args()
+
+    store = NumpyVectorStore(SlowEmbedding(args.latency), path=tempfile.mkdtemp(), background_compaction=False)
+    chunks = [Chunk(id=f"c{i}", text=f"chunk {i}", index=i, source="bench") for i in range(args.rows)]
+    store.upsert(DocumentBatch(source="bench", chunks=chunks), "bench")
+
+    print(f"{'mode':>7} {'p50 ms':>8} {'p99 ms':>8} {'threads':>8}")
+    for mode in ("legacy", "native"):
+        latencies, peak = asyncio.run(_run(store, mode, args.requests, args.fanout))
+        q = statistics.quantiles(latencies, n=100)
+        print(f"{mode:>7} {q[49] * 1000:>8.1f} {q[98] * 1000:>8.1f} {peak:>8}")
+
+
+if __name__ == "__main__":
+    main()
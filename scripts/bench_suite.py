@@ -0,0 +1,423 @@
+"""
+Offline micro-benchmarks for the core pipeline, with a JSON baseline to
+catch regressions between commits.
+
+    PYTHONPATH=src:. python scripts/bench_suite.py                       # run, compare with .bench/baseline.json
+    PYTHONPATH=src:. python scripts/bench_suite.py --update-baseline     # run and make this the baseline
+    PYTHONPATH=src:. python scripts/bench_suite.py --cases 'convert.*' chunk --scale 0.2
+    PYTHONPATH=src:. python scripts/bench_suite.py --baseline .bench/1f4505a.json
+
+Cases: the streaming chunker (AbstractIngestor._chunk), every ingestor's
+_convert_to_markdown on generated documents, SbertRerank.run at several
+candidate counts, ChromaVectorStore upsert and query, and
+RagOrchestrator.answer_async end to end. Embeddings, query expansion and
+generation are deterministic stand-ins, and the Hugging Face hub is
+forced offline, so nothing touches the network. The one file needed is
+tiktoken's cl100k_base BPE, cached after its first download (see
+TIKTOKEN_CACHE_DIR). Rerank cases are skipped when no cross-encoder or
+bi-encoder is cached locally.
+
+Each case runs once to warm up, then `--repeats` times; the median is
+reported. Results go to `--out` (default .bench/<commit>.json). When a
+baseline exists, any case whose median is more than `--threshold` slower
+is flagged and the exit status is 1. Baselines only compare meaningfully
+on the same machine and `--scale`.
+"""
+from __future__ import annotations
+import os
+
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+os.environ.setdefault("METRICS", "0")
+
+import argparse
+import asyncio
+import fnmatch
+import hashlib
+import io
+import json
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Sequence
+import numpy as np
+from core.ingestion.base import AbstractIngestor, IngestParams
+from core.schema import Chunk, DocumentBatch
+from core.strategies.context import ContextPacker, PackedContext
+from core.tokenizer import token_byte_lengths, tokenizer
+
+_WORDS = (
+    "pump valve pressure maintenance schedule replace filter inspect torque bolt warning caution "
+    "operator manual section figure table step release lock motor invoice dosage contract payment"
+).split()
+_DIM = 384
+
+
+# ── Stand-ins ──────────────────────────────────────────────────────
+class FakeEmbedding:
+    """Unit vectors seeded by the text's hash, memoised so repeated texts cost a lookup."""
+
+    def __init__(self, dim: int = _DIM) -> None:
+        self._dim = dim
+        self._memo: dict[str, list[float]] = {}
+
+    def embed_texts(self, texts: Sequence[str]) -> list[list[float]]:
+        return [self._memo.get(t) or self._vector(t) for t in texts]
+
+    def _vector(self, text: str) -> list[float]:
+        seed = int.from_bytes(hashlib.md5(text.encode()).digest()[:8], "little")
+        vec = np.random.default_rng(seed).standard_normal(self._dim)
+        out = self._memo[text] = (vec / np.linalg.norm(vec)).tolist()
+        return out
+
+
+class FakeExpansion:
+    async def run(self, query: str) -> list[str]:
+        return [f"{query} procedure", f"how to {query}"]
+
+
+class FakeCompletion:
+    """Packs context like OpenAICompletion and answers with its opening words."""
+
+    def __init__(self, max_context_tokens: int = 3000) -> None:
+        self._packer = ContextPacker(max_context_tokens)
+
+    def pack(self, chunks: Sequence[Chunk]) -> PackedContext:
+        return self._packer.pack(chunks)
+
+    async def run(self, query: str, context: Sequence[str]) -> str:
+        return " ".join(" ".join(context).split()[:60])
+
+
+class _Text(AbstractIngestor):
+    def _convert_to_markdown(self, data: bytes) -> str:
+        return data.decode()
+
+
+# ── Generated inputs ───────────────────────────────────────────────
+def _sentence(rng: random.Random, lo: int = 6, hi: int = 18) -> str:
+    return " ".join(rng.choices(_WORDS, k=rng.randint(lo, hi))).capitalize() + "."
+
+
+def _manual(pages: int) -> str:
+    rng = random.Random(0)
+    return "\n\n".join(
+        "\n".join([f"## Section {p + 1}", *(_sentence(rng) for _ in range(40))]) for p in range(pages)
+    )
+
+
+def _docx(paragraphs: int) -> bytes:
+    from docx import Document
+
+    rng = random.Random(1)
+    doc = Document()
+    for i in range(paragraphs):
+        if i % 20 == 0:
+            doc.add_heading(f"Section {i // 20 + 1}", level=2)
+        doc.add_paragraph(" ".join(_sentence(rng) for _ in range(3)))
+    out = io.BytesIO()
+    doc.save(out)
+    return out.getvalue()
+
+
+def _pdf(pages: int, lines: int = 40) -> bytes:
+    """Uncompressed PDF, `lines` lines of Helvetica text per page."""
+    rng = random.Random(2)
+    objs = [b"<< /Type /Catalog /Pages 2 0 R >>"]
+    kids = " ".join(f"{3 + 2 * i} 0 R" for i in range(pages))
+    objs.append(f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>".encode())
+    for i in range(pages):
+        objs.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {4 + 2 * i} 0 R"
+            f" /Resources << /Font << /F1 {3 + 2 * pages} 0 R >> >> >>".encode()
+        )
+        text = " ".join(f"({_sentence(rng, 6, 12)}) '" for _ in range(lines))
+        stream = f"BT /F1 10 Tf 14 TL 50 760 Td {text} ET".encode()
+        objs.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+    objs.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    out, offsets = bytearray(b"%PDF-1.4\n"), []
+    for num, body in enumerate(objs, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (num, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objs) + 1)
+    out += b"".join(b"%010d 00000 n \n" % o for o in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objs) + 1, xref)
+    return bytes(out)
+
+
+def _xlsx(rows: int) -> bytes:
+    from openpyxl import Workbook
+
+    rng = random.Random(3)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("inventory")
+    ws.append(["sku", "part", "qty", "price", "location", "supplier", "updated", "notes"])
+    for i in range(rows):
+        ws.append([
+            f"SKU-{i:06d}",
+            rng.choice(_WORDS),
+            rng.randint(0, 500),
+            round(rng.uniform(1, 900), 2),
+            f"A{rng.randint(1, 40)}-{rng.randint(1, 12)}",
+            rng.choice(_WORDS).upper(),
+            f"2024-{rng.randint(1, 12):02d}-01",
+            _sentence(rng, 3, 8) if i % 4 == 0 else None,  # sparse column
+        ])
+    out = io.BytesIO()
+    wb.save(out)
+    return out.getvalue()
+
+
+def _chunks(n: int) -> list[Chunk]:
+    rng = random.Random(4)
+    texts = (" ".join(_sentence(rng) for _ in range(12)) for _ in range(n))
+    return [Chunk(id=f"c{i}", text=t, index=i % 200, source=f"doc{i // 200}.pdf") for i, t in enumerate(texts)]
+
+
+def _queries(n: int) -> list[str]:
+    rng = random.Random(5)
+    return [" ".join(rng.choices(_WORDS, k=rng.randint(3, 7))) for _ in range(n)]
+
+
+# ── Cases ──────────────────────────────────────────────────────────
+@dataclass(slots=True)
+class Case:
+    name: str
+    unit: str  # what `items` counts
+    # untimed preparation, run before every repeat → (the timed call, items it processes)
+    prepare: Callable[[], tuple[Callable[[], Any], int]]
+
+
+def _cases(scale: float) -> list[Case]:
+    def n(base: int) -> int:
+        return max(1, int(base * scale))
+
+    cases = [Case("chunk", "chunks", lambda: _chunk_case(n(200)))]
+    for kind, size, unit in (("docx", n(2000), "paragraphs"), ("pdf", n(60), "pages"), ("xlsx", n(20_000), "rows")):
+        cases.append(Case(f"convert.{kind}", unit, lambda kind=kind, size=size: _convert_case(kind, size)))
+    for candidates in (8, 32, 64):
+        cases.append(Case(f"rerank.{candidates}", "candidates", lambda c=candidates: _rerank_case(c)))
+    cases.append(Case("chroma.upsert", "chunks", lambda: _upsert_case(n(5000))))
+    cases.append(Case("chroma.query", "queries", lambda: _query_case(n(5000), 100)))
+    cases.append(Case("answer", "queries", lambda: _answer_case(n(5000), 20)))
+    return cases
+
+
+def _chunk_case(pages: int) -> tuple[Callable[[], Any], int]:
+    text = _generated("manual", pages, lambda: _manual(pages).encode()).decode()
+    ingestor = _Text(IngestParams())
+    chunks = sum(1 for _ in ingestor._chunk(text, "manual.pdf"))
+    return (lambda: list(ingestor._chunk(text, "manual.pdf"))), chunks
+
+
+def _convert_case(kind: str, size: int) -> tuple[Callable[[], Any], int]:
+    from core.ingestion import get_ingestor
+
+    build = {"docx": _docx, "pdf": _pdf, "xlsx": _xlsx}[kind]
+    data = _generated(kind, size, lambda: build(size))
+    ingestor = get_ingestor(f"bench.{kind}")
+    return (lambda: ingestor._convert_to_markdown(data)), size
+
+
+def _rerank_case(candidates: int) -> tuple[Callable[[], Any], int]:
+    rerank = _rerank()
+    if rerank.mode == "none":
+        raise _Skip("no rerank model cached locally")
+    chunks = _chunks(candidates)
+    return (lambda: rerank.run("replace the pump valve filter", chunks, 6)), candidates
+
+
+def _upsert_case(size: int) -> tuple[Callable[[], Any], int]:
+    from core.vector_stores.chroma_store import ChromaVectorStore
+
+    chunks = _chunks(size)
+    embedding = _embedding()
+    embedding.embed_texts([c.text for c in chunks])  # vectors are not what is being measured
+    store = ChromaVectorStore(embedding, path=tempfile.mkdtemp(prefix="bench-chroma-", dir=_scratch()))
+    return (lambda: store.upsert(DocumentBatch(source="bench", chunks=chunks), "bench")), size
+
+
+def _query_case(size: int, queries: int) -> tuple[Callable[[], Any], int]:
+    store = _populated_store(size)
+    texts = _queries(queries)
+    _embedding().embed_texts(texts)
+    return (lambda: [store.query_many([q], "bench", 8) for q in texts]), queries
+
+
+def _answer_case(size: int, queries: int) -> tuple[Callable[[], Any], int]:
+    from core.orchestrator import RagOrchestrator
+
+    store = _populated_store(size)
+    rag = RagOrchestrator(store, FakeCompletion(), _embedding(), FakeExpansion(), _rerank())
+    texts = _queries(queries)
+
+    async def run() -> None:
+        for q in texts:
+            await rag.answer_async(q, "bench", k=8)
+
+    return (lambda: asyncio.run(run())), queries
+
+
+class _Skip(Exception):
+    pass
+
+
+@lru_cache(maxsize=None)
+def _embedding() -> FakeEmbedding:
+    return FakeEmbedding()
+
+
+@lru_cache(maxsize=None)
+def _rerank():
+    from core.strategies.rerank import SbertRerank
+
+    return SbertRerank()
+
+
+@lru_cache(maxsize=None)
+def _populated_store(size: int):
+    from core.vector_stores.chroma_store import ChromaVectorStore
+
+    store = ChromaVectorStore(_embedding(), path=tempfile.mkdtemp(prefix="bench-chroma-", dir=_scratch()))
+    store.upsert(DocumentBatch(source="bench", chunks=_chunks(size)), "bench")
+    return store
+
+
+@lru_cache(maxsize=None)
+def _scratch() -> str:
+    return tempfile.mkdtemp(prefix="bench-")
+
+
+def _generated(kind: str, size: int, build: Callable[[], bytes]) -> bytes:
+    """Generated inputs are cached on disk; building them is not part of any case."""
+    path = Path(_scratch()) / f"{kind}-{size}"
+    if not path.exists():
+        path.write_bytes(build())
+    return path.read_bytes()
+
+
+# ── Runner ─────────────────────────────────────────────────────────
+def _run(case: Case, repeats: int) -> dict:
+    try:
+        fn, items = case.prepare()
+        fn()  # warm-up: imports, caches, lazy model loads
+        times = []
+        for _ in range(repeats):
+            fn, items = case.prepare()
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+    except _Skip as exc:
+        return {"skipped": str(exc)}
+    median = statistics.median(times)
+    return {
+        "unit": case.unit,
+        "items": items,
+        "runs": repeats,
+        "median_s": round(median, 6),
+        "min_s": round(min(times), 6),
+        "per_s": round(items / median, 1) if median else 0.0,
+    }
+
+
+def _meta(scale: float, repeats: int) -> dict:
+    def git(*args: str) -> str:
+        try:
+            return subprocess.run(["git", *args], capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return ""
+
+    commit = git("rev-parse", "--short", "HEAD") or "unknown"
+    dirty = bool(git("status", "--porcelain", "--untracked-files=no"))
+    return {
+        "commit": commit + ("-dirty" if dirty else ""),
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()} x{os.cpu_count()}",
+        "scale": scale,
+        "repeats": repeats,
+        "rerank": _rerank().mode,
+    }
+
+
+def _compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """Print the table against `baseline`; returns the cases that got slower."""
+    old = baseline.get("results", {})
+    for key in ("machine", "scale"):
+        if baseline.get("meta", {}).get(key) != results["meta"][key]:
+            print(f"warning: baseline {key} {baseline.get('meta', {}).get(key)!r} != {results['meta'][key]!r}")
+    print(f"baseline {baseline.get('meta', {}).get('commit', '?')}")
+    print(f"{'case':<16} {'median ms':>10} {'per s':>10} {'base ms':>10} {'change':>8}")
+    slower = []
+    for name, r in results["results"].items():
+        if "skipped" in r:
+            print(f"{name:<16} {'skipped: ' + r['skipped']:>40}")
+            continue
+        base = old.get(name, {}).get("median_s")
+        line = f"{name:<16} {r['median_s'] * 1000:>10.1f} {r['per_s']:>10.1f}"
+        if not base:
+            print(f"{line} {'-':>10} {'new':>8}")
+            continue
+        change = r["median_s"] / base - 1
+        flag = "  SLOWER" if change > threshold else "  faster" if change < -threshold else ""
+        print(f"{line} {base * 1000:>10.1f} {change:>+8.1%}{flag}")
+        if change > threshold:
+            slower.append(name)
+    return slower
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--cases", nargs="+", default=["*"], help="case names or glob patterns")
+    p.add_argument("--scale", type=float, default=1.0, help="multiplies every input size")
+    p.add_argument("--repeats", type=int, default=5)
+    p.add_argument("--out", default=None, help="results file (default .bench/<commit>.json)")
+    p.add_argument("--baseline", default=".bench/baseline.json", help="results to compare against")
+    p.add_argument("--update-baseline", action="store_true", help="also write the results to --baseline")
+    p.add_argument("--threshold", type=float, default=0.15, help="relative slowdown flagged as a regression")
+    args = p.parse_args()
+
+    tokenizer(), token_byte_lengths()  # load outside every timed region
+    cases = [c for c in _cases(args.scale) if any(fnmatch.fnmatch(c.name, pat) for pat in args.cases)]
+    if not cases:
+        print(f"no case matches {args.cases}", file=sys.stderr)
+        return 2
+    results: dict = {"meta": _meta(args.scale, args.repeats), "results": {}}
+    try:
+        for case in cases:
+            results["results"][case.name] = _run(case, args.repeats)
+            print(f"{case.name:<16} {json.dumps(results['results'][case.name])}", file=sys.stderr)
+    finally:
+        shutil.rmtree(_scratch(), ignore_errors=True)
+
+    out = Path(args.out or f".bench/{results['meta']['commit']}.json")
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(results, indent=2) + "\n")
+    print(f"wrote {out}")
+
+    baseline = Path(args.baseline)
+    slower: list[str] = []
+    if baseline.exists() and baseline.resolve() != out.resolve():
+        slower = _compare(results, json.loads(baseline.read_text()), args.threshold)
+    if args.update_baseline:
+        baseline.parent.mkdir(parents=True, exist_ok=True)
+        baseline.write_text(out.read_text())
+        print(f"baseline is now {results['meta']['commit']}")
+    if slower:
+        print(f"regressions over {args.threshold:.0%}: {', '.join(slower)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""
+XLSX ingestion time and memory: the previous pandas implementation
+(read_excel of every sheet, then chunk the joined text) vs. the streaming
+read-only XlsxIngestor.
+
+    PYTHONPATH=src:. python scripts/bench_xlsx.py --rows 200000 --sheets 3
+    PYTHONPATH=src:. python scripts/bench_xlsx.py --file inventory.xlsx
+
+Each implementation runs in a fresh interpreter so peak RSS is its own.
+Without `--file` a synthetic dense workbook is generated first (write-only,
+so generation itself stays small). The run fails if the two produce
+different chunk ids; with `--file` they may only differ by the blank
+cells of a sparse sheet (see XlsxIngestor), so that is a warning there.
+"""
+from __future__ import annotations
+import argparse
+import datetime
+import hashlib
+import json
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from io import BytesIO
+from pathlib import Path
+import openpyxl
+from core.ingestion.base import IngestParams
+from core.ingestion.xlsx_ingestor import XlsxIngestor
+from core.tokenizer import token_byte_lengths, tokenizer
+
+_PARTS = "pump valve filter motor seal bearing gasket impeller".split()
+
+
+def _legacy_text(data: bytes) -> str:
+    """XlsxIngestor._convert_to_markdown as it was."""
+    import pandas as pd
+
+    dfs = pd.read_excel(BytesIO(data), sheet_name=None, header=None)
+    lines: list[str] = []
+    for name, df in dfs.items():
+        lines.append(f"# {name}")
+        for row in df.itertuples(index=False):
+            cells = [str(cell) for cell in row if str(cell).strip()]
+            if cells:
+                lines.append(" | ".join(cells))
+    return "\n".join(lines)
+
+
+def _workbook(path: str, sheets: int, rows: int) -> None:
+    rng = random.Random(0)
+    wb = openpyxl.Workbook(write_only=True)
+    for s in range(sheets):
+        ws = wb.create_sheet(f"Site {s + 1}")
+        ws.append(["sku", "part", "description", "qty", "unit price", "last service"])
+        for r in range(rows):
+            part = rng.choice(_PARTS)
+            ws.append([
+                100_000 + r,
+                part,
+                f"{part} for line {rng.randint(1, 40)}, {rng.choice(_PARTS)} side",
+                rng.randint(0, 500),
+                round(rng.uniform(1, 900), 2) + 0.005,
+                datetime.datetime(2020, 1, 1) + datetime.timedelta(days=rng.randint(0, 1500)),
+            ])
+    wb.save(path)
+
+
+def _run(impl: str, file: str) -> dict:
+    data = Path(file).read_bytes()
+    tokenizer(), token_byte_lengths()  # load outside the timed region
+    ingestor = XlsxIngestor(IngestParams())
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    if impl == "legacy":
+        ids = [c.id for c in ingestor._chunk(_legacy_text(data), file)]
+    else:
+        ids = [c.id for c in ingestor.iter_chunks(data, file)]
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "chunks": len(ids),
+        "seconds": elapsed,
+        "peak_rss_mb": peak / 1024,
+        "rss_growth_mb": (peak - rss_before) / 1024,
+        "ids": hashlib.sha1("\n".join(ids).encode()).hexdigest(),
+    }
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--rows", type=int, default=200_000, help="rows per synthetic sheet")
+    p.add_argument("--sheets", type=int, default=3)
+    p.add_argument("--file", default=None, help="xlsx to ingest instead of the synthetic workbook")
+    p.add_argument("--impl", choices=("legacy", "streaming"), help=argparse.SUPPRESS)
+    args = p.parse_args()
+    if args.impl:
+        print(json.dumps(_run(args.impl, args.file)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        file = args.file
+        if file is None:
+            file = str(Path(tmp) / "synthetic.xlsx")
+            start = time.perf_counter()
+            _workbook(file, args.sheets, args.rows)
+            print(f"generated {args.sheets}×{args.rows} rows in {time.perf_counter() - start:.1f}s,"
+                  f" {Path(file).stat().st_size / 2**20:.1f} MB")
+        results = {}
+        for impl in ("legacy", "streaming"):
+            cmd = [sys.executable, __file__, "--impl", impl, "--file", file]
+            results[impl] = json.loads(subprocess.run(cmd, capture_output=True, text=True, check=True).stdout)
+    print(f"{'impl':>10} {'chunks':>7} {'seconds':>8} {'peak RSS MB':>12} {'growth MB':>10}")
+    for impl, r in results.items():
+        print(
+            f"{impl:>10} {r['chunks']:>7} {r['seconds']:>8.2f}"
+            f" {r['peak_rss_mb']:>12.1f} {r['rss_growth_mb']:>10.1f}"
+        )
+    if results["legacy"]["ids"] != results["streaming"]["ids"]:
+        if args.file is None:
+            raise SystemExit("chunk ids differ between implementations")
+        print("chunk ids differ: expected when the sheet has blank cells")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,157 @@
 from __future__ import annotations
+import json
 import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
 from fastapi import FastAPI, Depends, HTTPException
 from pydantic import BaseModel
 from starlette.requests import Request
-from starlette.responses import JSONResponse
+from starlette.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from core import telemetry
 from core.embeddings import OpenAIEmbedding
-from core.vector_stores.pinecone_store import PineconeVectorStore
+from core.embedding_cache import CachedEmbedding, EmbeddingCache
+from core.registry import Registry
 from core.strategies.expansion import PromptExpansion
-from core.strategies.rerank import SbertRerank
+from core.strategies.rerank import RerankBatcher, SbertRerank
 from core.strategies.generation import OpenAICompletion
 from core.orchestrator import RagOrchestrator
-from integrations.supabase.auth import AuthService
+from core.answer_cache import answer_cache_from_config
+from core.docstore import docstore_from_config
+from integrations.supabase.auth import AuthService, claims_dependency
+from src import config
 
 logging.basicConfig(level=logging.INFO)
-auth_service = AuthService()
 
-embedding = OpenAIEmbedding()
-store = PineconeVectorStore(embedding)
-expansion = PromptExpansion()
-rerank = SbertRerank()
-generation = OpenAICompletion()
-rag = RagOrchestrator(store, generation, embedding, expansion, rerank)
+# ── Components: built on first use or by the startup warm-up ───────
+components = Registry()
 
-app = FastAPI()
+
+def _embedding():
+    embedding = OpenAIEmbedding()
+    if config.EMBED_CACHE_PATH:
+        embedding = CachedEmbedding(
+            embedding, EmbeddingCache(config.EMBED_CACHE_PATH, config.EMBED_CACHE_MAX_MB * 1024 * 1024)
+        )
+    return embedding
+
+
+def _store():
+    from core.vector_stores.pinecone_store import PineconeVectorStore  # slow SDK import
+
+    return PineconeVectorStore(components.get("embedding"), docstore=components.get("docstore"))
+
+
+def _rerank():
+    rerank = SbertRerank()
+    if config.RERANK_BATCH_PAIRS:
+        return RerankBatcher(rerank, config.RERANK_BATCH_PAIRS, config.RERANK_MAX_WAIT_MS)
+    return rerank
+
+
+def _auth():
+    auth = AuthService()
+    auth.start()  # JWKS prefetch, so the first request skips the key fetch
+    return auth
+
+
+def _rag():
+    return RagOrchestrator(
+        components.get("store"),
+        components.get("generation"),
+        components.get("embedding"),
+        components.get("expansion"),
+        components.get("rerank"),
+        answer_cache=answer_cache_from_config(),
+        skip_expansion_above=config.SKIP_EXPANSION_ABOVE,
+        skip_rerank_above=config.SKIP_RERANK_ABOVE,
+        docstore=components.get("docstore"),
+        neighbours=config.CONTEXT_NEIGHBOURS,
+    )
+
+
+def _dropbox_webhook():
+    from integrations.dropbox import DropboxWebhookHandler
+
+    return DropboxWebhookHandler()
+
+
+def _dropbox_sync():
+    from core.ingestion.manifest import IngestManifest
+    from core.ingestion.pipeline import IngestPipeline
+    from integrations.dropbox import DropboxSync
+    from integrations.supabase import SupabaseRepository
+
+    pipeline = IngestPipeline(
+        components.get("store"),
+        components.get("embedding"),
+        manifest=IngestManifest(config.INGEST_MANIFEST_PATH) if config.INGEST_MANIFEST_PATH else None,
+    )
+    return DropboxSync(SupabaseRepository(), pipeline)
+
+
+# built by the startup warm-up; the Dropbox ones wait for the first webhook
+_SERVING = ("auth", "embedding", "docstore", "store", "expansion", "rerank", "generation", "rag")
+
+components.register("auth", _auth, requires=("supabase",))
+components.register("embedding", _embedding, requires=("openai",))
+components.register("docstore", docstore_from_config)
+components.register("store", _store, requires=("pinecone",))
+components.register("expansion", PromptExpansion, requires=("openai",))
+components.register("rerank", _rerank)
+components.register("generation", OpenAICompletion, requires=("openai",))
+components.register("rag", _rag)
+components.register("dropbox_webhook", _dropbox_webhook, requires=("dropbox",))
+components.register("dropbox_sync", _dropbox_sync, requires=("dropbox", "supabase"))
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    if config.WARM_UP:
+        await components.warm_up(_SERVING)
+    yield
+    auth = components.peek("auth")
+    if auth is not None:
+        auth.close()
+    sync = components.peek("dropbox_sync")
+    if sync is not None:
+        await sync.aclose()
+    rag = components.peek("rag")
+    if rag is not None:
+        await rag.aclose()
+    rerank = components.peek("rerank")
+    if isinstance(rerank, RerankBatcher):
+        rerank.close()
+    docstore = components.peek("docstore")
+    if docstore is not None:
+        docstore.close()
+
+class AdmissionControl:
+    """Caps concurrent /rag requests per worker; overflow gets 503 instead of queueing."""
+
+    def __init__(self, app, max_in_flight: int, prefix: str = "/rag/") -> None:
+        self._app = app
+        self._max = max_in_flight
+        self._prefix = prefix
+        self._in_flight = 0  # only touched on the event loop
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith(self._prefix):
+            await self._app(scope, receive, send)
+            return
+        if self._in_flight >= self._max:
+            busy = JSONResponse({"detail": "server busy"}, status_code=503, headers={"Retry-After": "1"})
+            await busy(scope, receive, send)
+            return
+        self._in_flight += 1
+        try:
+            await self._app(scope, receive, send)  # spans the whole body, streams included
+        finally:
+            self._in_flight -= 1
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(AdmissionControl, max_in_flight=config.MAX_IN_FLIGHT)
+
+_claims = claims_dependency(lambda: components.aget("auth"))
 
 class AskRequest(BaseModel):
     query: str
@@ -30,12 +159,13 @@ class AskRequest(BaseModel):
     trace: bool | None = False
 
 @app.post("/rag/ask")
-def ask(
+async def ask(
     body: AskRequest,
-    claims: dict = Depends(auth_service.fastapi_dependency()),
+    claims: dict = Depends(_claims),
 ):
     user_id = claims["sub"]
-    answer = rag.answer(
+    rag = await components.aget("rag")
+    answer = await rag.answer_async(
         query=body.query,
         user_id=user_id,
         k=body.k or 6,
@@ -43,6 +173,58 @@ def ask(
     )
     return JSONResponse(answer if isinstance(answer, dict) else {"answer": answer})
 
+@app.post("/rag/ask/stream")
+async def ask_stream(
+    body: AskRequest,
+    claims: dict = Depends(_claims),
+):
+    rag = await components.aget("rag")
+    events = rag.answer_stream(
+        query=body.query,
+        user_id=claims["sub"],
+        k=body.k or 6,
+        trace=body.trace or False,
+    )
+    return StreamingResponse(
+        _sse(events),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+async def _sse(events: AsyncIterator[tuple[str, dict]]) -> AsyncIterator[str]:
+    async for event, payload in events:
+        yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+@app.get("/dropbox/webhook")
+def dropbox_challenge(challenge: str):
+    """Dropbox's one-time endpoint verification: echo the challenge."""
+    return PlainTextResponse(challenge, headers={"X-Content-Type-Options": "nosniff"})
+
+@app.post("/dropbox/webhook")
+async def dropbox_webhook(request: Request):
+    body = await request.body()
+    handler = await components.aget("dropbox_webhook")
+    try:
+        handler.verify(request.headers.get("X-Dropbox-Signature", ""), body)
+    except ValueError:
+        raise HTTPException(status_code=403, detail="invalid signature")
+    accounts = handler.parse_accounts(body)
+    sync = await components.aget("dropbox_sync")
+    sync.notify(accounts)  # debounced; the sync runs in the background
+    return {"accounts": len(accounts)}
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus scrape: per-stage latency and size histograms."""
+    payload = telemetry.metrics_payload()
+    if payload is None:
+        raise HTTPException(status_code=404, detail="metrics are disabled")
+    body, content_type = payload
+    return Response(body, media_type=content_type)
+
 @app.get("/health")
 def health():
+    rerank = components.peek("rerank")
+    if isinstance(rerank, RerankBatcher):
+        return {"status": "ok", "rerank": rerank.stats()}
     return {"status": "ok"}
@@ -1,24 +1,148 @@
 #!/usr/bin/env python
 from __future__ import annotations
 import argparse
+import asyncio
+import glob
 import logging
+import os
 from pathlib import Path
 import sys
-from core.ingestion import get_ingestor
+from core import clients
+from core.ingestion import supported
+from core.ingestion.manifest import IngestManifest
+from core.ingestion.pipeline import IngestPipeline, IngestReport
 from core.embeddings import OpenAIEmbedding
+from core.embedding_cache import CachedEmbedding, EmbeddingCache
 from core.vector_stores.pinecone_store import PineconeVectorStore
+from core.answer_cache import SqliteAnswerCache
+from core.docstore import SqliteDocStore
+from src import config
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-def main() -> None:
+def main() -> int:
     args = _parse_args()
+    config.require("openai", "pinecone")
+    found = _expand(args.paths)
+    if not found:
+        logger.error("no ingestible files in %s", args.paths)
+        return 1
+    # a file's source is its path under the directory it was given by, so it
+    # doesn't change with whatever else is ingested in the same run
+    root = Path(os.path.abspath(args.root)) if args.root else found
+    paths = list(found)
+
     embedding = OpenAIEmbedding()
-    store = PineconeVectorStore(embedding)
+    cache = None
+    if args.embed_cache:
+        cache = EmbeddingCache(args.embed_cache, config.EMBED_CACHE_MAX_MB * 1024 * 1024)
+        embedding = CachedEmbedding(embedding, cache)
+    docstore = SqliteDocStore(args.docstore) if args.docstore else None
+    store = PineconeVectorStore(embedding, docstore=docstore)
+    if config.ANSWER_CACHE == "sqlite":  # the API's cached answers go stale on ingest
+        store.on_change(SqliteAnswerCache(config.ANSWER_CACHE_PATH).invalidate)
+    pipeline = IngestPipeline(
+        store,
+        embedding,
+        parse_workers=args.workers,
+        embed_workers=args.embed_workers,
+        upsert_workers=args.upsert_workers,
+        batch_size=args.batch_size,
+        manifest=IngestManifest(args.manifest) if args.manifest else None,
+    )
+
+    async def _run() -> IngestReport:
+        try:
+            return await pipeline.run(paths, args.namespace, prune=args.prune, root=root)
+        finally:
+            await store.aclose()
+            await clients.aclose()
+            if docstore is not None:
+                docstore.close()
+
+    report = asyncio.run(_run())
+    for stage in report.stages:
+        logger.info("stage %s", stage)
+    logger.info("%s files unchanged, %s stale chunks deleted", report.unchanged, report.deleted)
+    if cache is not None:
+        logger.info("embedding cache %s", cache.stats())
+    if report.failed:
+        logger.error("%s files failed: %s", len(report.failed), report.failed)
+        return 1
+    return 0
+
+
+def _expand(specs: list[str]) -> dict[Path, Path]:
+    """
+    Files, directories (recursive) and glob patterns → unique ingestible
+    files (absolute), each with the root it was found under: the
+    directory, the pattern's directory before its first wildcard, or a
+    file's parent.
+    """
+    found: dict[Path, Path] = {}
+    for spec in specs:
+        path = Path(os.path.abspath(spec))
+        if path.is_dir():
+            root = path
+            matches = sorted(p for p in path.rglob("*") if p.is_file() and supported(p.name))
+        elif glob.has_magic(spec):
+            root = _glob_root(path)
+            matches = sorted(Path(p) for p in glob.glob(str(path), recursive=True) if supported(p))
+        else:
+            root = path.parent
+            matches = [path]  # explicit files are passed through; unsupported ones fail loudly
+        for match in matches:
+            found.setdefault(match, root)
+    return found
+
+
+def _glob_root(pattern: Path) -> Path:
+    fixed = []
+    for part in pattern.parts:
+        if glob.has_magic(part):
+            break
+        fixed.append(part)
+    return Path(*fixed)
+
+
+def _parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Ingest documents into the vector store")
+    p.add_argument("paths", nargs="+", help="files, directories or glob patterns (quote globs)")
+    p.add_argument("--namespace", required=True, help="target namespace (user id)")
+    p.add_argument(
+        "--embed-cache",
+        default=config.EMBED_CACHE_PATH,
+        help="sqlite embedding cache path (default: EMBED_CACHE_PATH, off when empty)",
+    )
+    p.add_argument(
+        "--manifest",
+        default=config.INGEST_MANIFEST_PATH,
+        help="sqlite ingest manifest for incremental re-ingestion; empty string re-ingests everything",
+    )
+    p.add_argument(
+        "--docstore",
+        default=config.DOCSTORE_PATH,
+        help="sqlite chunk docstore the API reads texts from; empty string keeps texts in Pinecone metadata",
+    )
+    p.add_argument(
+        "--root",
+        default=None,
+        help="make sources paths relative to this directory (default: the directory each path was given by);"
+        " needed when same-named files come from different arguments",
+    )
+    p.add_argument(
+        "--prune",
+        action="store_true",
+        help="delete sources the manifest holds for this namespace that are not among the given paths",
+    )
+    p.add_argument("--workers", type=int, default=None, help="parse processes (default: CPU count)")
+    p.add_argument("--embed-workers", type=int, default=4)
+    p.add_argument("--upsert-workers", type=int, default=4)
+    p.add_argument("--batch-size", type=int, default=256, help="chunks per embed/upsert batch")
+    return p.parse_args()
+
 
-    for file_path in args.files:
-        data = Path(file_path).read_bytes()
-        ingestor = get_ingestor(file_path)
-        batch = ingestor.ingest_bytes(data, Path(file_path).name)
-        store.upsert(batch, namespace=args.namespace)
+if __name__ == "__main__":
+    sys.exit(main())
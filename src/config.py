@@ -10,17 +10,97 @@ def _env(key: str, default: str | None = None) -> str:
         raise RuntimeError(f"missing env {key}")
     return val
 
-OPENAI_API_KEY = _env("OPENAI_API_KEY")
+def _float_or_none(key: str) -> float | None:
+    val = os.getenv(key)
+    return float(val) if val else None
+
+# service credentials are read on first access (module __getattr__ below), so
+# importing config never fails; require() checks one subsystem up front
+_SECRETS = {
+    "OPENAI_API_KEY": "OPENAI_API_KEY",
+    "PINECONE_API_KEY": "PINECONE_API_KEY",
+    "SUPABASE_URL": "SUPABASE_URL",
+    "SUPABASE_SERVICE_ROLE_KEY": "SUPABASE_SERVICE_KEY",
+    "DROPBOX_APP_SECRET": "DROPBOX_APP_SECRET",
+}
+SUBSYSTEMS = {
+    "openai": ("OPENAI_API_KEY",),
+    "pinecone": ("PINECONE_API_KEY",),
+    "supabase": ("SUPABASE_URL", "SUPABASE_SERVICE_KEY"),
+    "dropbox": ("DROPBOX_APP_SECRET",),
+}
+
+def require(*subsystems: str) -> None:
+    missing = [key for name in subsystems for key in SUBSYSTEMS[name] if os.getenv(key) is None]
+    if missing:
+        raise RuntimeError(f"missing env {', '.join(missing)} (needed by {', '.join(subsystems)})")
+
+def __getattr__(name: str) -> str:
+    if name in _SECRETS:
+        return _env(_SECRETS[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 EMBED_MODEL = os.getenv("EMBED_MODEL", "text-embedding-3-large")
 GPT_MODEL = os.getenv("GPT_MODEL", "gpt-4o-mini")
 EMBED_DIM = int(os.getenv("EMBED_DIM", "1536"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "5"))
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", "")  # sqlite path, e.g. .embed_cache.sqlite; "" (off)
+EMBED_CACHE_MAX_MB = int(os.getenv("EMBED_CACHE_MAX_MB", "1024"))
+
+INGEST_MANIFEST_PATH = os.getenv("INGEST_MANIFEST_PATH", ".ingest_manifest.sqlite")  # "" disables
+DOCSTORE_PATH = os.getenv("DOCSTORE_PATH", "")  # chunk texts, e.g. .docstore.sqlite; "" keeps them in the vector metadata
+CONTEXT_NEIGHBOURS = int(os.getenv("CONTEXT_NEIGHBOURS", "0"))  # chunks either side of a hit put in the context
+
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "0"))  # page-extraction processes per PDF; 0 = one per core
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "8"))
+PDF_PAGE_TIMEOUT = float(os.getenv("PDF_PAGE_TIMEOUT", "30"))  # seconds; 0 = no limit
+PDF_WORKER_MAX_MB = int(os.getenv("PDF_WORKER_MAX_MB", "2048"))  # headroom per PDF page / ingest parse worker; 0 = no cap
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "32"))  # smaller PDFs stay in-process
+
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
 
-PINECONE_API_KEY = _env("PINECONE_API_KEY")
 PINECONE_INDEX = os.getenv("PINECONE_INDEX", "rag-index")
+PINECONE_UPSERT_MAX_BYTES = int(os.getenv("PINECONE_UPSERT_MAX_BYTES", "1900000"))  # API limit: 2 MB per request
+PINECONE_UPSERT_MAX_VECTORS = int(os.getenv("PINECONE_UPSERT_MAX_VECTORS", "1000"))
+PINECONE_UPSERT_CONCURRENCY = int(os.getenv("PINECONE_UPSERT_CONCURRENCY", "8"))  # requests in flight
+PINECONE_UPSERT_RETRIES = int(os.getenv("PINECONE_UPSERT_RETRIES", "3"))
+PINECONE_UPSERT_EMBED_BATCH = int(os.getenv("PINECONE_UPSERT_EMBED_BATCH", "256"))  # chunks embedded per group
+
+AUTH_CLAIMS_CACHE_SIZE = int(os.getenv("AUTH_CLAIMS_CACHE_SIZE", "10000"))  # verified tokens kept; 0 disables
+AUTH_JWKS_REFRESH_S = float(os.getenv("AUTH_JWKS_REFRESH_S", "600"))
+
+SUPABASE_TIMEOUT = float(os.getenv("SUPABASE_TIMEOUT", "30"))  # seconds per request (connect: 5)
+SUPABASE_MAX_CONNECTIONS = int(os.getenv("SUPABASE_MAX_CONNECTIONS", "20"))
+SUPABASE_HTTP2 = os.getenv("SUPABASE_HTTP2", "1") != "0"  # needs the h2 package
+
+DROPBOX_API_URL = os.getenv("DROPBOX_API_URL", "https://api.dropboxapi.com/2")
+DROPBOX_CONTENT_URL = os.getenv("DROPBOX_CONTENT_URL", "https://content.dropboxapi.com/2")
+DROPBOX_ACCOUNTS_TABLE = os.getenv("DROPBOX_ACCOUNTS_TABLE", "dropbox_accounts")
+DROPBOX_DEBOUNCE_S = float(os.getenv("DROPBOX_DEBOUNCE_S", "5"))  # fold webhook bursts per account
+DROPBOX_DOWNLOAD_CONCURRENCY = int(os.getenv("DROPBOX_DOWNLOAD_CONCURRENCY", "8"))
+DROPBOX_SYNC_DIR = os.getenv("DROPBOX_SYNC_DIR", "")  # where downloads are staged; "" = system temp dir
+
+ANSWER_CACHE = os.getenv("ANSWER_CACHE", "")  # memory | sqlite | "" (off)
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", ".answer_cache.sqlite")
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+
+RERANK_BACKEND = os.getenv("RERANK_BACKEND", "auto")  # auto | onnx | torch
+RERANK_ONNX_MODEL = os.getenv("RERANK_ONNX_MODEL", "")  # local export dir or Hub repo; "" = default model
+RERANK_ONNX_FILE = os.getenv("RERANK_ONNX_FILE", "onnx/model_quint8_avx2.onnx")
+RERANK_MAX_LENGTH = int(os.getenv("RERANK_MAX_LENGTH", "256"))
+RERANK_THREADS = int(os.getenv("RERANK_THREADS", "0"))  # 0 = onnxruntime default
+RERANK_BATCH_PAIRS = int(os.getenv("RERANK_BATCH_PAIRS", "64"))  # cross-request micro-batch; 0 disables
+RERANK_MAX_WAIT_MS = float(os.getenv("RERANK_MAX_WAIT_MS", "5"))
+
+# adaptive pipeline: skip a stage when the original query's top score clears it ("" = never)
+SKIP_EXPANSION_ABOVE = _float_or_none("SKIP_EXPANSION_ABOVE")
+SKIP_RERANK_ABOVE = _float_or_none("SKIP_RERANK_ABOVE")
 
-SUPABASE_URL = _env("SUPABASE_URL")
-SUPABASE_SERVICE_ROLE_KEY = _env("SUPABASE_SERVICE_KEY")
+METRICS = os.getenv("METRICS", "0") != "0"  # per-stage Prometheus histograms on /metrics (needs prometheus_client)
+OTEL_SPANS = os.getenv("OTEL_SPANS", "0") != "0"  # also open an OpenTelemetry span per stage (needs opentelemetry-api)
 
-DROPBOX_APP_SECRET = _env("DROPBOX_APP_SECRET")
+MAX_IN_FLIGHT = int(os.getenv("MAX_IN_FLIGHT", "64"))  # concurrent /rag requests per worker
+WARM_UP = os.getenv("WARM_UP", "1") != "0"  # build components in the startup hook, not on first request
 
 PROMPTS_PATH = str(Path(__file__).with_name("prompts.yml"))
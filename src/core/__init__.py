@@ -1,12 +1,18 @@
-from .schema import Chunk, DocumentBatch
+from .schema import Chunk, DocumentBatch, ScoredChunk
 from .embeddings import OpenAIEmbedding
+from .embedding_cache import CachedEmbedding, EmbeddingCache
 from .orchestrator import RagOrchestrator
+from .registry import Registry
 from .exceptions import RagError
 
 __all__ = [
     "Chunk",
     "DocumentBatch",
+    "ScoredChunk",
     "OpenAIEmbedding",
+    "CachedEmbedding",
+    "EmbeddingCache",
     "RagOrchestrator",
+    "Registry",
     "RagError",
 ]
@@ -0,0 +1,253 @@
+from __future__ import annotations
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Sequence
+import itertools
+import json
+import logging
+import sqlite3
+import threading
+import time
+import numpy as np
+from src import config
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class AnswerCache(ABC):
+    """
+    Semantic answer cache scoped by namespace: a lookup hits when a cached
+    query embedding has cosine similarity >= `threshold` with the new one
+    (and the same k). Entries expire after `ttl` seconds; the least
+    recently used are evicted past `max_entries`. Stores call
+    `invalidate(namespace)` whenever an upsert or delete touches it.
+
+    `invalidate` also bumps the namespace's generation. A caller reads
+    `generation` before it retrieves and passes it to `put`, which drops
+    the answer if an invalidation happened in between: that answer was
+    built from the old contents.
+    """
+
+    def __init__(self, threshold: float = 0.95, ttl: float = 3600.0, max_entries: int = 10_000) -> None:
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+    @abstractmethod
+    def get(self, namespace: str, k: int, vector: Sequence[float]) -> dict | None: ...
+
+    @abstractmethod
+    def put(
+        self,
+        namespace: str,
+        k: int,
+        query: str,
+        vector: Sequence[float],
+        payload: dict,
+        generation: int | None = None,
+    ) -> None: ...
+
+    @abstractmethod
+    def invalidate(self, namespace: str) -> None: ...
+
+    @abstractmethod
+    def generation(self, namespace: str) -> int: ...
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+    def _count(self, payload: dict | None) -> dict | None:
+        if payload is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return payload
+
+
+@dataclass(slots=True)
+class _Entry:
+    namespace: str
+    k: int
+    vector: np.ndarray
+    payload: dict
+    expires: float
+
+
+class InMemoryAnswerCache(AnswerCache):
+    def __init__(self, threshold: float = 0.95, ttl: float = 3600.0, max_entries: int = 10_000) -> None:
+        super().__init__(threshold, ttl, max_entries)
+        self._lru: OrderedDict[int, _Entry] = OrderedDict()
+        self._by_ns: dict[str, set[int]] = {}
+        self._ids = itertools.count()
+        self._generations: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, namespace: str, k: int, vector: Sequence[float]) -> dict | None:
+        now = time.time()
+        with self._lock:
+            live = []
+            for eid in list(self._by_ns.get(namespace, ())):
+                entry = self._lru[eid]
+                if entry.expires <= now:
+                    self._drop(eid)
+                elif entry.k == k:
+                    live.append(eid)
+            best = _best([self._lru[e].vector for e in live], vector, self.threshold)
+            if best is None:
+                return self._count(None)
+            self._lru.move_to_end(live[best])
+            return self._count(self._lru[live[best]].payload)
+
+    def put(
+        self,
+        namespace: str,
+        k: int,
+        query: str,
+        vector: Sequence[float],
+        payload: dict,
+        generation: int | None = None,
+    ) -> None:
+        entry = _Entry(namespace, k, _unit(vector), payload, time.time() + self.ttl)
+        with self._lock:
+            if generation is not None and generation != self._generations.get(namespace, 0):
+                return  # invalidated since the caller looked up
+            eid = next(self._ids)
+            self._lru[eid] = entry
+            self._by_ns.setdefault(namespace, set()).add(eid)
+            while len(self._lru) > self.max_entries:
+                self._drop(next(iter(self._lru)))
+
+    def invalidate(self, namespace: str) -> None:
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            for eid in list(self._by_ns.get(namespace, ())):
+                self._drop(eid)
+
+    def generation(self, namespace: str) -> int:
+        with self._lock:
+            return self._generations.get(namespace, 0)
+
+    def _drop(self, eid: int) -> None:
+        entry = self._lru.pop(eid)
+        ids = self._by_ns[entry.namespace]
+        ids.discard(eid)
+        if not ids:
+            del self._by_ns[entry.namespace]
+
+
+class SqliteAnswerCache(AnswerCache):
+    """Shared across worker processes and the ingest CLI through one sqlite file."""
+
+    def __init__(
+        self,
+        path: str = ".answer_cache.sqlite",
+        threshold: float = 0.95,
+        ttl: float = 3600.0,
+        max_entries: int = 10_000,
+    ) -> None:
+        super().__init__(threshold, ttl, max_entries)
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            " id INTEGER PRIMARY KEY, namespace TEXT NOT NULL, k INTEGER NOT NULL,"
+            " query TEXT NOT NULL, vec BLOB NOT NULL, payload TEXT NOT NULL,"
+            " expires REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS answers_ns ON answers(namespace, k)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS answers_accessed ON answers(accessed)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS generations (namespace TEXT PRIMARY KEY, n INTEGER NOT NULL)"
+        )
+        self._db.commit()
+
+    def get(self, namespace: str, k: int, vector: Sequence[float]) -> dict | None:
+        now = time.time()
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, vec FROM answers WHERE namespace = ? AND k = ? AND expires > ?",
+                (namespace, k, now),
+            ).fetchall()
+            best = _best([np.frombuffer(v, dtype=np.float32) for _, v in rows], vector, self.threshold)
+            if best is None:
+                return self._count(None)
+            eid = rows[best][0]
+            payload = self._db.execute("SELECT payload FROM answers WHERE id = ?", (eid,)).fetchone()[0]
+            self._db.execute("UPDATE answers SET accessed = ? WHERE id = ?", (now, eid))
+            self._db.commit()
+        return self._count(json.loads(payload))
+
+    def put(
+        self,
+        namespace: str,
+        k: int,
+        query: str,
+        vector: Sequence[float],
+        payload: dict,
+        generation: int | None = None,
+    ) -> None:
+        now = time.time()
+        row = (namespace, k, query, _unit(vector).tobytes(), json.dumps(payload), now + self.ttl, now)
+        with self._lock:
+            # one statement, so an invalidation from another process can't slip between check and insert
+            self._db.execute(
+                "INSERT INTO answers (namespace, k, query, vec, payload, expires, accessed)"
+                " SELECT ?, ?, ?, ?, ?, ?, ?"
+                " WHERE ? IS NULL OR ? = COALESCE((SELECT n FROM generations WHERE namespace = ?), 0)",
+                (*row, generation, generation, namespace),
+            )
+            self._db.execute("DELETE FROM answers WHERE expires <= ?", (now,))
+            (count,) = self._db.execute("SELECT COUNT(*) FROM answers").fetchone()
+            if count > self.max_entries:
+                self._db.execute(
+                    "DELETE FROM answers WHERE id IN"
+                    " (SELECT id FROM answers ORDER BY accessed LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+            self._db.commit()
+
+    def invalidate(self, namespace: str) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO generations VALUES (?, 1) ON CONFLICT(namespace) DO UPDATE SET n = n + 1",
+                (namespace,),
+            )
+            self._db.execute("DELETE FROM answers WHERE namespace = ?", (namespace,))
+            self._db.commit()
+
+    def generation(self, namespace: str) -> int:
+        with self._lock:
+            row = self._db.execute("SELECT n FROM generations WHERE namespace = ?", (namespace,)).fetchone()
+        return row[0] if row else 0
+
+
+def answer_cache_from_config() -> AnswerCache | None:
+    """ANSWER_CACHE=memory|sqlite; anything else disables the cache."""
+    opts = dict(threshold=config.ANSWER_CACHE_THRESHOLD, ttl=config.ANSWER_CACHE_TTL)
+    if config.ANSWER_CACHE == "memory":
+        return InMemoryAnswerCache(**opts)
+    if config.ANSWER_CACHE == "sqlite":
+        return SqliteAnswerCache(config.ANSWER_CACHE_PATH, **opts)
+    return None
+
+
+def _unit(vector: Sequence[float]) -> np.ndarray:
+    v = np.asarray(vector, dtype=np.float32)
+    n = np.linalg.norm(v)
+    return v / n if n else v
+
+
+def _best(vectors: list[np.ndarray], query: Sequence[float], threshold: float) -> int | None:
+    """Index of the most similar cached vector if it clears `threshold`."""
+    if not vectors:
+        return None
+    sims = np.stack(vectors) @ _unit(query)
+    i = int(np.argmax(sims))
+    return i if sims[i] >= threshold else None
@@ -0,0 +1,55 @@
+from __future__ import annotations
+from typing import Any
+import asyncio
+import logging
+import weakref
+import httpx
+from openai import AsyncOpenAI
+from src import config
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# httpx pools bind to the loop that first uses them, so clients are shared
+# per running loop: one per process under uvicorn, one per asyncio.run in scripts
+_POOLS: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str, Any]] = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def openai_client(retries: bool = True) -> AsyncOpenAI:
+    """Shared AsyncOpenAI for the running loop; `retries=False` disables SDK retries."""
+    pool = _pool()
+    client = pool.get("openai")
+    if client is None:
+        client = pool["openai"] = AsyncOpenAI(
+            api_key=config.OPENAI_API_KEY,
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=config.OPENAI_MAX_CONNECTIONS,
+                    max_keepalive_connections=config.OPENAI_MAX_CONNECTIONS,
+                ),
+                timeout=httpx.Timeout(60.0, connect=5.0),
+            ),
+        )
+    if retries:
+        return client
+    if "openai_no_retry" not in pool:
+        pool["openai_no_retry"] = client.with_options(max_retries=0)  # same connection pool
+    return pool["openai_no_retry"]
+
+
+async def aclose() -> None:
+    """Close the clients bound to the running loop."""
+    pool = _POOLS.pop(asyncio.get_running_loop(), {})
+    client = pool.get("openai")
+    if client is not None:
+        await client.close()
+
+
+def _pool() -> dict[str, Any]:
+    loop = asyncio.get_running_loop()
+    pool = _POOLS.get(loop)
+    if pool is None:
+        pool = _POOLS[loop] = {}
+    return pool
@@ -0,0 +1,128 @@
+from __future__ import annotations
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Iterable, Sequence
+import logging
+import sqlite3
+import threading
+from core.schema import Chunk
+from src import config
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+Position = tuple[str, int]  # (source, chunk index)
+
+
+class DocStore(ABC):
+    """
+    Chunk texts by (namespace, chunk id), kept next to the vector store so
+    vectors carry only ids and light metadata. Stores write chunks here
+    before their vectors and hydrate query hits with one `get_many`.
+    `neighbours` finds the chunks around a hit by (source, index), for
+    widening a reranked hit into its surrounding passage.
+    """
+
+    @abstractmethod
+    def put_many(self, namespace: str, chunks: Sequence[Chunk]) -> None: ...
+
+    @abstractmethod
+    def get_many(self, namespace: str, ids: Sequence[str]) -> dict[str, Chunk]: ...
+
+    @abstractmethod
+    def at(self, namespace: str, positions: Sequence[Position]) -> dict[Position, Chunk]:
+        """Chunks by (source, index); positions with no chunk are left out."""
+
+    @abstractmethod
+    def delete(self, namespace: str, ids: Iterable[str]) -> None: ...
+
+    def close(self) -> None:
+        pass
+
+    def neighbours(self, namespace: str, chunks: Sequence[Chunk], window: int = 1) -> list[Chunk]:
+        """
+        Chunks up to `window` indexes either side of each of `chunks`, not
+        themselves among `chunks`: nearest first, in the order of the chunk
+        they surround.
+        """
+        have = {(c.source, c.index) for c in chunks}
+        wanted: dict[Position, None] = {}
+        for c in chunks:
+            for d in range(1, window + 1):
+                for pos in ((c.source, c.index - d), (c.source, c.index + d)):
+                    if pos[1] >= 0 and pos not in have:
+                        wanted.setdefault(pos)
+        if not wanted:
+            return []
+        found = self.at(namespace, list(wanted))
+        return [found[pos] for pos in wanted if pos in found]
+
+
+class SqliteDocStore(DocStore):
+    def __init__(self, path: str = ".docstore.sqlite") -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            " namespace TEXT NOT NULL, id TEXT NOT NULL, source TEXT NOT NULL, idx INTEGER NOT NULL,"
+            " text TEXT NOT NULL, page_start INTEGER, page_end INTEGER, PRIMARY KEY (namespace, id))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS chunks_position ON chunks(namespace, source, idx)")
+        self._db.commit()
+
+    def put_many(self, namespace: str, chunks: Sequence[Chunk]) -> None:
+        rows = [(namespace, c.id, c.source, c.index, c.text, c.page_start, c.page_end) for c in chunks]
+        with self._lock, self._db:
+            self._db.executemany("INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def get_many(self, namespace: str, ids: Sequence[str]) -> dict[str, Chunk]:
+        found: dict[str, Chunk] = {}
+        with self._lock:
+            for part in _parts(list(dict.fromkeys(ids))):
+                rows = self._db.execute(
+                    "SELECT id, text, idx, source, page_start, page_end FROM chunks"
+                    f" WHERE namespace = ? AND id IN ({_marks(part)})",
+                    (namespace, *part),
+                ).fetchall()
+                found.update((r[0], Chunk(*r)) for r in rows)
+        return found
+
+    def at(self, namespace: str, positions: Sequence[Position]) -> dict[Position, Chunk]:
+        found: dict[Position, Chunk] = {}
+        with self._lock:
+            for part in _parts(list(positions)):
+                rows = self._db.execute(
+                    f"WITH want(source, idx) AS (VALUES {','.join(['(?, ?)'] * len(part))})"
+                    " SELECT c.id, c.text, c.idx, c.source, c.page_start, c.page_end"
+                    " FROM want JOIN chunks c ON c.namespace = ? AND c.source = want.source AND c.idx = want.idx"
+                    " ORDER BY c.rowid",  # a re-ingested file briefly holds old and new chunks: newest wins
+                    (*(v for pos in part for v in pos), namespace),
+                ).fetchall()
+                found.update(((r[3], r[2]), Chunk(*r)) for r in rows)
+        return found
+
+    def delete(self, namespace: str, ids: Iterable[str]) -> None:
+        with self._lock, self._db:
+            for part in _parts(list(ids)):
+                self._db.execute(
+                    f"DELETE FROM chunks WHERE namespace = ? AND id IN ({_marks(part)})", (namespace, *part)
+                )
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+def docstore_from_config() -> DocStore | None:
+    return SqliteDocStore(config.DOCSTORE_PATH) if config.DOCSTORE_PATH else None
+
+
+def _marks(items: Sequence) -> str:
+    return ",".join("?" * len(items))
+
+
+def _parts(items: list, size: int = 400) -> list[list]:
+    # stay well under sqlite's bound-variable limit (positions bind two each)
+    return [items[i : i + size] for i in range(0, len(items), size)]
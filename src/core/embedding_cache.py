@@ -0,0 +1,195 @@
+from __future__ import annotations
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Sequence
+import asyncio
+import hashlib
+import inspect
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding cache: sqlite on disk, LRU dict in memory.
+    Keys are sha256(model, dimension, text); vectors are stored as float32.
+    The disk tier evicts least-recently-used rows once `max_bytes` is exceeded.
+    """
+
+    def __init__(
+        self,
+        path: str = ".embed_cache.sqlite",
+        max_bytes: int = 1024 * 1024 * 1024,
+        memory_items: int = 10_000,
+    ) -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._max_bytes = max_bytes
+        self._memory_items = memory_items
+        self._mem: OrderedDict[str, list[float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY, vec BLOB NOT NULL,"
+            " nbytes INTEGER NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_accessed ON embeddings(accessed)")
+        self._disk_bytes = self._db.execute(
+            "SELECT COALESCE(SUM(nbytes), 0) FROM embeddings"
+        ).fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(model: str, dimensions: int | None, text: str) -> str:
+        raw = f"{model}\x00{dimensions or 'native'}\x00{text}".encode("utf-8")
+        return hashlib.sha256(raw).hexdigest()
+
+    # ── Lookup / store ─────────────────────────────────────────────
+    def get_many(self, keys: Sequence[str]) -> list[list[float] | None]:
+        out: list[list[float] | None] = [None] * len(keys)
+        missing: dict[str, list[int]] = {}
+        with self._lock:
+            for i, k in enumerate(keys):
+                vec = self._mem.get(k)
+                if vec is not None:
+                    self._mem.move_to_end(k)
+                    out[i] = vec
+                else:
+                    missing.setdefault(k, []).append(i)
+
+            found = self._load(list(missing)) if missing else {}
+            for k, vec in found.items():
+                self._remember(k, vec)
+                for i in missing[k]:
+                    out[i] = vec
+
+            n_hit = sum(v is not None for v in out)
+            self.hits += n_hit
+            self.misses += len(keys) - n_hit
+        return out
+
+    def put_many(self, keys: Sequence[str], vectors: Sequence[Sequence[float]]) -> None:
+        now = time.time()
+        rows = []
+        for k, vec in zip(keys, vectors):
+            blob = array("f", vec).tobytes()
+            rows.append((k, blob, len(blob), now))
+        with self._lock:
+            for k, vec in zip(keys, vectors):
+                self._remember(k, list(vec))
+            prev = sum(
+                self._db.execute(
+                    f"SELECT COALESCE(SUM(nbytes), 0) FROM embeddings WHERE key IN ({_marks(part)})",
+                    part,
+                ).fetchone()[0]
+                for part in _parts(list(keys))
+            )
+            self._db.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+            self._disk_bytes += sum(r[2] for r in rows) - prev
+            if self._disk_bytes > self._max_bytes:
+                self._evict()
+            self._db.commit()
+
+    def stats(self) -> dict[str, int | float]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "memory_items": len(self._mem),
+            "disk_bytes": self._disk_bytes,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    # ── Helpers ────────────────────────────────────────────────────
+    def _load(self, keys: list[str]) -> dict[str, list[float]]:
+        found: dict[str, list[float]] = {}
+        for part in _parts(keys):
+            rows = self._db.execute(
+                f"SELECT key, vec FROM embeddings WHERE key IN ({_marks(part)})", part
+            ).fetchall()
+            for k, blob in rows:
+                vec = array("f")
+                vec.frombytes(blob)
+                found[k] = vec.tolist()
+        if found:
+            self._db.executemany(
+                "UPDATE embeddings SET accessed = ? WHERE key = ?",
+                [(time.time(), k) for k in found],
+            )
+            self._db.commit()
+        return found
+
+    def _remember(self, key: str, vec: list[float]) -> None:
+        self._mem[key] = vec
+        self._mem.move_to_end(key)
+        while len(self._mem) > self._memory_items:
+            self._mem.popitem(last=False)
+
+    def _evict(self) -> None:
+        target = int(self._max_bytes * 0.9)
+        while self._disk_bytes > target:
+            rows = self._db.execute(
+                "SELECT key, nbytes FROM embeddings ORDER BY accessed LIMIT 500"
+            ).fetchall()
+            if not rows:
+                break
+            self._db.executemany("DELETE FROM embeddings WHERE key = ?", [(k,) for k, _ in rows])
+            self._disk_bytes -= sum(n for _, n in rows)
+        logger.info("embedding cache evicted to %s bytes", self._disk_bytes)
+
+
+class CachedEmbedding:
+    """
+    Wraps any embedding model; only texts missing from the cache reach it.
+    Cache reads and writes run in a worker thread, off the event loop.
+    """
+
+    def __init__(self, inner, cache: EmbeddingCache) -> None:
+        self._inner = inner
+        self._cache = cache
+        self.model = getattr(inner, "model", type(inner).__name__)
+        self.dimensions = getattr(inner, "dimensions", None)
+
+    @property
+    def cache(self) -> EmbeddingCache:
+        return self._cache
+
+    async def embed_texts(self, texts: Sequence[str]) -> list[list[float]]:
+        keys = [EmbeddingCache.key(self.model, self.dimensions, t) for t in texts]
+        out = await asyncio.to_thread(self._cache.get_many, keys)
+
+        todo: dict[str, str] = {}  # key -> text, de-duplicated
+        for k, t, vec in zip(keys, texts, out):
+            if vec is None:
+                todo.setdefault(k, t)
+        if not todo:
+            return out  # type: ignore[return-value]
+
+        logger.info("embedding cache: %s/%s texts missing", len(todo), len(texts))
+        fresh = self._inner.embed_texts(list(todo.values()))
+        if inspect.isawaitable(fresh):
+            fresh = await fresh
+        by_key = dict(zip(todo, fresh))
+        await asyncio.to_thread(self._cache.put_many, list(by_key), list(by_key.values()))
+        return [vec if vec is not None else list(by_key[k]) for k, vec in zip(keys, out)]
+
+
+def _marks(items: Sequence) -> str:
+    return ",".join("?" * len(items))
+
+
+def _parts(keys: list[str], size: int = 500) -> list[list[str]]:
+    # stay well under sqlite's bound-variable limit
+    return [keys[i : i + size] for i in range(0, len(keys), size)]
@@ -2,30 +2,112 @@ from __future__ import annotations
 from typing import Sequence
 import logging
 import asyncio
+import random
+import weakref
+import openai
 from openai import AsyncOpenAI
+from core import clients, telemetry
+from core.tokenizer import tokenizer
 from src import config
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
-_client = AsyncOpenAI(api_key=config.OPENAI_API_KEY)
+_RETRYABLE = (openai.RateLimitError, openai.InternalServerError, openai.APIConnectionError)
 
 
 class OpenAIEmbedding:
-    def __init__(self, model: str | None = None, batch: int = 100) -> None:
+    def __init__(
+        self,
+        model: str | None = None,
+        batch: int = 2048,
+        dimensions: int | None = None,
+        max_batch_tokens: int = 100_000,
+        concurrency: int | None = None,
+        max_retries: int = 6,
+        client: AsyncOpenAI | None = None,
+    ) -> None:
         self._model = model or config.EMBED_MODEL
+        self._dimensions = dimensions
         self._batch = batch
-        self._sem = asyncio.Semaphore(5)
+        self._max_tokens = max_batch_tokens
+        self._concurrency = concurrency or config.EMBED_CONCURRENCY
+        self._max_retries = max_retries
+        self._client = client
+        # asyncio primitives bind to a loop; keep one semaphore per running loop
+        self._sems: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+    @property
+    def model(self) -> str:
+        return self._model
+
+    @property
+    def dimensions(self) -> int | None:
+        return self._dimensions
 
     async def embed_texts(self, texts: Sequence[str]) -> list[list[float]]:
         logger.info("embedding %s texts", len(texts))
-        out: list[list[float]] = []
-        for i in range(0, len(texts), self._batch):
-            async with self._sem:
-                resp = await _client.embeddings.create(
+        if not texts:
+            return []
+        sem = self._semaphore()
+
+        async def _run(lo: int, hi: int) -> list[list[float]]:
+            async with sem:
+                return await self._create(texts[lo:hi])
+
+        with telemetry.span("embed", texts=len(texts)) as s:
+            plan, tokens = self._plan(texts)
+            s.set(tokens=tokens, requests=len(plan))
+            parts = await asyncio.gather(*(_run(lo, hi) for lo, hi in plan))
+        return [vec for part in parts for vec in part]
+
+    # ── Helpers ────────────────────────────────────────────────────
+    def _plan(self, texts: Sequence[str]) -> tuple[list[tuple[int, int]], int]:
+        """Split into [lo, hi) ranges bounded by item count and token budget; also the total tokens."""
+        sizes = [len(t) for t in tokenizer().encode_ordinary_batch(list(texts))]
+        out: list[tuple[int, int]] = []
+        lo, tokens = 0, 0
+        for i, n in enumerate(sizes):
+            if i > lo and (i - lo >= self._batch or tokens + n > self._max_tokens):
+                out.append((lo, i))
+                lo, tokens = i, 0
+            tokens += n
+        out.append((lo, len(sizes)))
+        return out, sum(sizes)
+
+    async def _create(self, inputs: Sequence[str]) -> list[list[float]]:
+        extra = {"dimensions": self._dimensions} if self._dimensions else {}
+        # retries are handled here so backoff is jittered and batches retry independently
+        client = self._client or clients.openai_client(retries=False)
+        for attempt in range(self._max_retries + 1):
+            try:
+                resp = await client.embeddings.create(
                     model=self._model,
-                    input=texts[i : i + self._batch],
+                    input=list(inputs),
                     encoding_format="float",
+                    **extra,
                 )
-            out.extend([d.embedding for d in resp.data])
-        return out
+                return [d.embedding for d in sorted(resp.data, key=lambda d: d.index)]
+            except _RETRYABLE as exc:
+                if attempt == self._max_retries:
+                    raise
+                delay = random.uniform(0, min(30.0, 0.5 * 2**attempt))  # full jitter
+                delay = max(delay, _retry_after(exc))
+                logger.warning("embedding batch failed (%s); retry in %.2fs", exc, delay)
+                await asyncio.sleep(delay)
+        raise AssertionError("unreachable")
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        sem = self._sems.get(loop)
+        if sem is None:
+            sem = self._sems[loop] = asyncio.Semaphore(self._concurrency)
+        return sem
+
+
+def _retry_after(exc: Exception) -> float:
+    response = getattr(exc, "response", None)
+    try:
+        return float(response.headers.get("retry-after", 0)) if response is not None else 0.0
+    except ValueError:
+        return 0.0
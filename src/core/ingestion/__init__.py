@@ -1,3 +1 @@
-from .factory import get_ingestor
-
-__all__ = ["get_ingestor"]
+from .factory import get_ingestor, supported
@@ -2,16 +2,26 @@ from __future__ import annotations
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Iterable
+from typing import Iterable, Iterator
+import bisect
 import hashlib
+import itertools
 import logging
-import tiktoken
+import os
+import re
+import numpy as np
 from core.schema import Chunk, DocumentBatch
+from core.tokenizer import token_byte_lengths, tokenizer
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
-_TOKENIZER = tiktoken.get_encoding("cl100k_base")
+# cl100k's pre-tokenizer always starts a new piece at a non-space character
+# that follows a newline, so the text can be encoded in parts cut there with
+# identical tokens (numeric rows of a sheet included)
+_SAFE_CUT = re.compile(r"\n(?=\S)")
+_SEGMENT_CHARS = 32_768
+_ENCODE_THREADS = min(8, os.cpu_count() or 1)  # segments encoded in parallel (tiktoken drops the GIL)
 
 
 @dataclass(frozen=True, slots=True)
@@ -27,27 +37,117 @@ class AbstractIngestor(ABC):
         self.params = params or IngestParams()
 
     def ingest_bytes(self, data: bytes, filename: str) -> DocumentBatch:
+        return DocumentBatch(source=filename, chunks=list(self.iter_chunks(data, filename)))
+
+    def iter_chunks(self, data: bytes, filename: str) -> Iterator[Chunk]:
+        """Chunks in document order, produced as the text is converted."""
         logger.info("ingesting %s", filename)
-        markdown = self._convert_to_markdown(data)
-        chunks = list(self._chunk(markdown, filename))
-        return DocumentBatch(source=filename, chunks=chunks)
+        return self._chunk(self._sections(data), filename)
 
     @abstractmethod
     def _convert_to_markdown(self, data: bytes) -> str: ...
 
+    def _sections(self, data: bytes) -> Iterable[str | tuple[int, str]]:
+        """
+        The markdown in consecutive pieces (pages, sheets…); override to stream.
+        Yield (page, text) pairs to record the pages each chunk spans.
+        """
+        yield self._convert_to_markdown(data)
+
     # ───────────────────────────────────────────────────────────────
     # deterministic id: <file_stem>_<md5(first-12) >
+    # windows of `chunk_size` tokens every `chunk_size - overlap`; the text of
+    # a window is the byte slice its tokens cover (what decode would return)
     # ───────────────────────────────────────────────────────────────
-    def _chunk(self, text: str, source: str) -> Iterable[Chunk]:
-        tokens = _TOKENIZER.encode(text)
-        size, overlap = self.params.chunk_size, self.params.overlap
-        for i in range(0, len(tokens), size - overlap):
-            window = tokens[i : i + size]
-            chunk_text = _TOKENIZER.decode(window)
+    def _chunk(self, text: str | Iterable[str | tuple[int, str]], source: str) -> Iterator[Chunk]:
+        enc, lengths = tokenizer(), token_byte_lengths()
+        stem = Path(source).stem
+        size, step = self.params.chunk_size, self.params.chunk_size - self.params.overlap
+        ends = np.empty(0, dtype=np.int64)  # byte end of each token from `base` on
+        base = 0  # token index of ends[0]
+        buf, buf_at = b"", 0  # utf-8 bytes from offset `buf_at` on
+        start = 0  # token index of the next window
+        page_at: list[int] = []  # byte offset where each page's text begins
+        page_no: list[int] = []
+
+        def pieces(items: Iterable[str | tuple[int, str]]) -> Iterator[str]:
+            offset = 0
+            for item in items:
+                if isinstance(item, str):
+                    yield item
+                    offset += len(_utf8(item))
+                    continue
+                page, piece = item
+                body = piece.lstrip()  # a page starts at its text, not at the break before it
+                page_at.append(offset + len(_utf8(piece[: len(piece) - len(body)])))
+                page_no.append(page)
+                yield piece
+                offset += len(_utf8(piece))
+
+        def page(pos: int) -> int | None:
+            if not page_no:
+                return None
+            return page_no[max(0, bisect.bisect_right(page_at, pos) - 1)]
+
+        def window(hi: int) -> Chunk:
+            lo_byte = int(ends[start - 1 - base]) if start else 0
+            hi_byte = int(ends[hi - 1 - base])
+            raw = buf[lo_byte - buf_at : hi_byte - buf_at]
+            chunk_text = raw.decode("utf-8", errors="replace")
             digest = hashlib.md5(chunk_text.encode("utf-8")).hexdigest()[:12]
-            yield Chunk(
-                id=f"{Path(source).stem}_{digest}",
+            first = min(lo_byte + len(raw) - len(raw.lstrip()), hi_byte - 1)  # skip a leading page break
+            return Chunk(
+                id=f"{stem}_{digest}",
                 text=chunk_text,
-                index=i // (size - overlap),
+                index=start // step,
                 source=source,
+                page_start=page(first),
+                page_end=page(max(lo_byte, hi_byte - 1)),
             )
+
+        segments = _segments(pieces([text] if isinstance(text, str) else text))
+        while group := list(itertools.islice(segments, _ENCODE_THREADS)):
+            if len(group) > 1:
+                encoded = enc.encode_batch(group, num_threads=_ENCODE_THREADS)
+            else:
+                encoded = [enc.encode(group[0])]
+            for segment, tokens in zip(group, encoded):
+                offset = int(ends[-1]) if len(ends) else buf_at
+                ends = np.concatenate([ends, offset + np.cumsum(lengths[tokens])])
+                buf += _utf8(segment)
+                while start + size <= base + len(ends):
+                    yield window(start + size)
+                    start += step
+                # keep the token before the next window: its end is where the window starts
+                drop = max(0, start - 1 - base)
+                if drop:
+                    buf, buf_at = buf[int(ends[drop - 1]) - buf_at :], int(ends[drop - 1])
+                    ends, base = ends[drop:], base + drop
+        total = base + len(ends)
+        while start < total:
+            yield window(min(start + size, total))
+            start += step
+
+
+def _segments(pieces: Iterable[str], target: int | None = None) -> Iterator[str]:
+    """Re-cut `pieces` into runs of roughly `target` chars, only at safe cuts."""
+    target = target or _SEGMENT_CHARS
+    pending = ""
+    for piece in pieces:
+        text, pos = pending + piece, 0
+        while len(text) - pos > target:
+            cut = _SAFE_CUT.search(text, pos + target)
+            if cut is None:
+                break
+            yield text[pos : cut.end()]
+            pos = cut.end()
+        pending = text[pos:]
+    if pending:
+        yield pending
+
+
+def _utf8(text: str) -> bytes:
+    try:
+        return text.encode("utf-8")
+    except UnicodeEncodeError:  # lone surrogates: tiktoken encodes the replaced text
+        return text.encode("utf-16", "surrogatepass").decode("utf-16", "replace").encode("utf-8")
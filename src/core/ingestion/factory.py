@@ -18,3 +18,7 @@ def get_ingestor(filename: str, params: IngestParams | None = None) -> AbstractI
     if ext not in _EXT_TO_CLASS:  # explicit to surface unsupported types loudly
         raise ValueError(f"no ingestor for extension {ext}")
     return _EXT_TO_CLASS[ext](params)
+
+
+def supported(filename: str) -> bool:
+    return Path(filename).suffix.lower() in _EXT_TO_CLASS
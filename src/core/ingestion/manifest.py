@@ -0,0 +1,94 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Iterable
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class IngestManifest:
+    """
+    What each namespace holds, per source file: the content hash it was
+    ingested from and the ids of its chunks. Lets re-ingestion skip
+    unchanged files, embed only new chunks and delete the stale ones.
+    """
+
+    def __init__(self, path: str = ".ingest_manifest.sqlite") -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " namespace TEXT NOT NULL, source TEXT NOT NULL, content_hash TEXT NOT NULL,"
+            " updated REAL NOT NULL, PRIMARY KEY (namespace, source))"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            " namespace TEXT NOT NULL, source TEXT NOT NULL, chunk_id TEXT NOT NULL,"
+            " PRIMARY KEY (namespace, source, chunk_id))"
+        )
+        self._db.commit()
+
+    def content_hash(self, namespace: str, source: str) -> str | None:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT content_hash FROM files WHERE namespace = ? AND source = ?", (namespace, source)
+            ).fetchone()
+        return row[0] if row else None
+
+    def chunk_ids(self, namespace: str, source: str) -> set[str]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT chunk_id FROM chunks WHERE namespace = ? AND source = ?", (namespace, source)
+            ).fetchall()
+        return {r[0] for r in rows}
+
+    def held_elsewhere(self, namespace: str, source: str, chunk_ids: Iterable[str]) -> set[str]:
+        """
+        Those of `chunk_ids` another source in the namespace also holds:
+        ids are <file stem>_<text hash>, so same-named files in different
+        folders share the id of any chunk whose text they share.
+        """
+        ids = list(chunk_ids)
+        held: set[str] = set()
+        with self._lock:
+            for i in range(0, len(ids), 500):  # under sqlite's bound-variable limit
+                part = ids[i : i + 500]
+                rows = self._db.execute(
+                    "SELECT DISTINCT chunk_id FROM chunks WHERE namespace = ? AND source != ?"
+                    f" AND chunk_id IN ({','.join('?' * len(part))})",
+                    (namespace, source, *part),
+                ).fetchall()
+                held.update(r[0] for r in rows)
+        return held
+
+    def sources(self, namespace: str) -> list[str]:
+        with self._lock:
+            rows = self._db.execute("SELECT source FROM files WHERE namespace = ?", (namespace,)).fetchall()
+        return [r[0] for r in rows]
+
+    def record(self, namespace: str, source: str, content_hash: str, chunk_ids: Iterable[str]) -> None:
+        """Replace what is known about `source` once its chunks are all stored."""
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM chunks WHERE namespace = ? AND source = ?", (namespace, source))
+            self._db.executemany(
+                "INSERT OR IGNORE INTO chunks (namespace, source, chunk_id) VALUES (?, ?, ?)",
+                ((namespace, source, cid) for cid in chunk_ids),
+            )
+            self._db.execute(
+                "INSERT OR REPLACE INTO files (namespace, source, content_hash, updated) VALUES (?, ?, ?, ?)",
+                (namespace, source, content_hash, time.time()),
+            )
+
+    def forget(self, namespace: str, source: str) -> None:
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM chunks WHERE namespace = ? AND source = ?", (namespace, source))
+            self._db.execute("DELETE FROM files WHERE namespace = ? AND source = ?", (namespace, source))
+
+    def close(self) -> None:
+        self._db.close()
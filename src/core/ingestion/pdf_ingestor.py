@@ -1,14 +1,171 @@
+from __future__ import annotations
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from io import BytesIO
+from typing import Iterator
+import logging
+import multiprocessing
+import os
+import signal
+import tempfile
+import threading
 import pdfplumber
-from core.ingestion.base import AbstractIngestor
+from core.ingestion.base import AbstractIngestor, IngestParams
+from src import config
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
 
 
 class PdfIngestor(AbstractIngestor):
+    """
+    Pages are extracted in order and streamed to the chunker with their
+    1-based page numbers. Documents of `parallel_min_pages` pages or more
+    are split into ranges of `pages_per_task` pages across a process pool;
+    each worker runs under an address-space cap of `max_worker_mb` and gives
+    up on a page after `page_timeout` seconds, so a pathological page is
+    skipped (with a warning) instead of stalling the document.
+    """
+
+    def __init__(
+        self,
+        params: IngestParams | None = None,
+        workers: int | None = None,
+        pages_per_task: int | None = None,
+        page_timeout: float | None = None,
+        max_worker_mb: int | None = None,
+        parallel_min_pages: int | None = None,
+    ) -> None:
+        super().__init__(params)
+        self._workers = workers or config.PDF_WORKERS or os.cpu_count() or 1
+        self._pages_per_task = pages_per_task or config.PDF_PAGES_PER_TASK
+        self._timeout = config.PDF_PAGE_TIMEOUT if page_timeout is None else page_timeout
+        self._max_mb = config.PDF_WORKER_MAX_MB if max_worker_mb is None else max_worker_mb
+        self._min_pages = parallel_min_pages or config.PDF_PARALLEL_MIN_PAGES
+
     def _convert_to_markdown(self, data: bytes) -> str:
-        contents: list[str] = []
+        return "".join(text for _, text in self._sections(data))
+
+    def _sections(self, data: bytes) -> Iterator[tuple[int, str]]:
+        """(page, text) for non-empty pages, "\n\n"-separated, as they are extracted."""
+        sep = ""
+        for page, text in self._pages(data):
+            if text:
+                yield page, sep + text
+                sep = "\n\n"
+
+    def _pages(self, data: bytes) -> Iterator[tuple[int, str]]:
         with pdfplumber.open(BytesIO(data)) as pdf:
-            for page in pdf.pages:
-                text = page.extract_text() or ""
-                if text.strip():
-                    contents.append(text.strip())
-        return "\n\n".join(contents)
+            total = len(pdf.pages)
+            # inside an ingest pipeline worker the files are already spread over the cores
+            if total < self._min_pages or self._workers < 2 or multiprocessing.parent_process() is not None:
+                yield from _extract(pdf, 0, total, self._timeout)
+                return
+        with tempfile.NamedTemporaryFile(suffix=".pdf") as tmp:
+            tmp.write(data)
+            tmp.flush()
+            yield from self._parallel(tmp.name, total)
+
+    def _parallel(self, path: str, total: int) -> Iterator[tuple[int, str]]:
+        """Page ranges on a process pool, yielded in page order with a bounded number in flight."""
+        ranges = deque((lo, min(lo + self._pages_per_task, total)) for lo in range(0, total, self._pages_per_task))
+        workers = min(self._workers, len(ranges))
+        pending: deque[tuple[int, int, Future]] = deque()
+        retried: set[int] = set()
+        pool = capped_pool(workers, self._max_mb)
+        try:
+            while ranges or pending:
+                while ranges and len(pending) < workers * 2:
+                    lo, hi = ranges.popleft()
+                    pending.append((lo, hi, pool.submit(_extract_file, path, lo, hi, self._timeout)))
+                lo, hi, future = pending[0]
+                try:
+                    pages = future.result()
+                except BrokenProcessPool:
+                    # a worker died (e.g. past its memory cap): retry what was in flight on a
+                    # fresh pool, narrowing the range at the head down to the page that kills it
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = capped_pool(workers, self._max_mb)
+                    retry = [(a, b) for a, b, _ in pending]
+                    pending.clear()
+                    lo, hi = retry.pop(0)
+                    if hi - lo > 1:
+                        head = [(p, p + 1) for p in range(lo, hi)]
+                    elif lo in retried:
+                        logger.warning("skipping page %d: worker died extracting it twice", lo + 1)
+                        head = []
+                    else:
+                        retried.add(lo)
+                        head = [(lo, hi)]
+                    ranges.extendleft(reversed(head + retry))
+                    continue
+                pending.popleft()
+                yield from pages
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+class _PageTimeout(Exception):
+    pass
+
+
+def capped_pool(workers: int, max_mb: int) -> ProcessPoolExecutor:
+    """A process pool whose workers each run under a `max_mb` address-space cap (0 = none)."""
+    return ProcessPoolExecutor(workers, initializer=_limit_memory, initargs=(max_mb,))
+
+
+def _limit_memory(max_mb: int) -> None:
+    """
+    Pool initializer: cap the worker's address space at `max_mb` above what
+    it inherited at fork, so a runaway page fails alone.
+    """
+    if max_mb <= 0:
+        return
+    try:
+        import resource
+
+        with open("/proc/self/statm") as f:
+            inherited = int(f.read().split()[0]) * resource.getpagesize()
+        limit = inherited + max_mb * 1024 * 1024
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        resource.setrlimit(resource.RLIMIT_AS, (limit if hard < 0 else min(limit, hard), hard))
+    except (ImportError, ValueError, OSError) as exc:  # not Linux / not permitted
+        logger.warning("cannot cap pdf worker memory (%s)", exc)
+
+
+def _extract_file(path: str, lo: int, hi: int, timeout: float) -> list[tuple[int, str]]:
+    with pdfplumber.open(path) as pdf:
+        return list(_extract(pdf, lo, hi, timeout))
+
+
+def _extract(pdf: pdfplumber.PDF, lo: int, hi: int, timeout: float) -> Iterator[tuple[int, str]]:
+    """Stripped text of pages [lo, hi); pages that time out or run out of memory come back empty."""
+    # SIGALRM only reaches the main thread; elsewhere pages run without a deadline
+    alarm = timeout > 0 and threading.current_thread() is threading.main_thread() and hasattr(signal, "setitimer")
+    previous = signal.signal(signal.SIGALRM, _on_alarm) if alarm else None
+    try:
+        for i in range(lo, hi):
+            page = pdf.pages[i]
+            try:
+                if alarm:
+                    signal.setitimer(signal.ITIMER_REAL, timeout)
+                text = (page.extract_text() or "").strip()
+            except _PageTimeout:
+                logger.warning("skipping page %d: no text after %.0fs", i + 1, timeout)
+                text = ""
+            except MemoryError:
+                logger.warning("skipping page %d: out of memory", i + 1)
+                text = ""
+            finally:
+                if alarm:
+                    signal.setitimer(signal.ITIMER_REAL, 0)
+                page.close()
+            yield i + 1, text
+    finally:
+        if alarm:
+            signal.signal(signal.SIGALRM, signal.SIG_DFL if previous is None else previous)
+
+
+def _on_alarm(signum, frame) -> None:
+    raise _PageTimeout
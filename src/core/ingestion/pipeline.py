@@ -0,0 +1,348 @@
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, Mapping, Sequence
+import asyncio
+import hashlib
+import inspect
+import logging
+import os
+import time
+from core import telemetry
+from core.ingestion.base import IngestParams
+from core.ingestion.factory import get_ingestor
+from core.ingestion.manifest import IngestManifest
+from core.ingestion.pdf_ingestor import capped_pool
+from core.schema import Chunk
+from core.vector_stores.base import BaseVectorStore, EmbeddingModel, Vectors
+from src import config
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+_DELETE_BATCH = 1000  # ids per delete call (Pinecone's limit)
+
+
+@dataclass(slots=True)
+class StageStats:
+    name: str
+    unit: str
+    workers: int
+    items: int = 0
+    busy: float = 0.0  # summed worker seconds
+
+    def row(self, wall: float) -> dict:
+        return {
+            "stage": self.name,
+            self.unit: self.items,
+            "per_s": round(self.items / wall, 1) if wall else 0.0,
+            "utilisation": round(self.busy / (wall * self.workers), 2) if wall else 0.0,
+        }
+
+
+@dataclass(slots=True)
+class IngestReport:
+    files: int
+    chunks: int  # embedded and written
+    seconds: float
+    stages: list[dict]
+    failed: list[str] = field(default_factory=list)
+    unchanged: int = 0  # files skipped by the manifest
+    deleted: int = 0  # stale chunks removed
+
+
+@dataclass(slots=True)
+class _FileJob:
+    source: str
+    content_hash: str
+    chunk_ids: list[str]  # every chunk of the new version
+    stale: list[str]  # chunks of the old version that are gone
+    pending: int  # batches not yet written
+
+
+class IngestPipeline:
+    """
+    parse → embed → upsert with every stage running at once. Files are
+    converted and chunked in a process pool; chunk batches are embedded
+    and written by async workers. Bounded queues between the stages give
+    backpressure: a slow upsert stalls embedding, which stalls parsing.
+    A file that fails to parse is logged and skipped; embed or upsert
+    errors abort the run. Parse workers run under the PDF_WORKER_MAX_MB
+    memory cap; when one dies the pool is replaced and each file that was
+    in flight is parsed again on its own, so only the file that kills
+    its own worker fails.
+
+    With a manifest, a file whose content hash is unchanged is skipped
+    without parsing, only chunk ids the namespace does not hold yet are
+    embedded, and once a file's new chunks are written its stale ones
+    are deleted and the manifest updated. `prune` also removes sources
+    the manifest knows but this run was not given.
+
+    A file's source is its name, or its path relative to `root` when one
+    is given (for trees where names repeat across folders); `root` may
+    also map each path to its own root. Two files
+    with the same source would overwrite each other's chunks, so a run
+    given any is refused up front. Chunk ids keep the file stem, so such
+    files can share the id of an identical chunk; a stale id is deleted
+    only once no other source in the manifest holds it.
+    """
+
+    def __init__(
+        self,
+        store: BaseVectorStore,
+        embedding: EmbeddingModel,
+        parse_workers: int | None = None,
+        embed_workers: int = 4,
+        upsert_workers: int = 4,
+        batch_size: int = 256,
+        queue_size: int = 8,
+        params: IngestParams | None = None,
+        manifest: IngestManifest | None = None,
+    ) -> None:
+        self._store = store
+        self._embedding = embedding
+        self._parse_workers = parse_workers or os.cpu_count() or 1
+        self._embed_workers = embed_workers
+        self._upsert_workers = upsert_workers
+        self._batch = batch_size
+        self._queue_size = queue_size
+        self._params = params
+        self._manifest = manifest
+
+    @property
+    def manifest(self) -> IngestManifest | None:
+        return self._manifest
+
+    async def run(
+        self,
+        paths: Sequence[str | Path],
+        namespace: str,
+        prune: bool = False,
+        root: str | Path | Mapping[str | Path, str | Path] | None = None,
+    ) -> IngestReport:
+        sources = {str(p): _source(p, root[p] if isinstance(root, Mapping) else root) for p in paths}
+        _check_unique(sources)
+        stages = {
+            "parse": StageStats("parse", "files", self._parse_workers),
+            "embed": StageStats("embed", "chunks", self._embed_workers),
+            "upsert": StageStats("upsert", "chunks", self._upsert_workers),
+        }
+        report = IngestReport(files=0, chunks=0, seconds=0.0, stages=[])
+        embed_q: asyncio.Queue[tuple[_FileJob, list[Chunk]] | None] = asyncio.Queue(self._queue_size)
+        upsert_q: asyncio.Queue[tuple[_FileJob, list[Chunk], Vectors] | None] = asyncio.Queue(self._queue_size)
+        start = time.perf_counter()
+
+        pool = _ParsePool(self._parse_workers)
+        embedders = [
+            asyncio.create_task(self._embed_worker(embed_q, upsert_q, stages["embed"]))
+            for _ in range(self._embed_workers)
+        ]
+        upserters = [
+            asyncio.create_task(self._upsert_worker(upsert_q, namespace, stages["upsert"], report))
+            for _ in range(self._upsert_workers)
+        ]
+
+        async def _feed() -> None:
+            await self._parse_all(pool, sources, namespace, embed_q, stages["parse"], report)
+            await _drain(embed_q, embedders)
+            await _drain(upsert_q, upserters)
+            if prune:
+                failed = {sources[p] for p in report.failed}
+                await self._prune(namespace, set(sources.values()) - failed, failed, report)
+
+        tasks = [asyncio.create_task(_feed()), *embedders, *upserters]
+        try:
+            await asyncio.gather(*tasks)  # a failing worker surfaces here even while parsing waits on it
+        finally:
+            for task in tasks:
+                task.cancel()
+            pool.shutdown()
+
+        wall = time.perf_counter() - start
+        report.files = stages["parse"].items
+        report.chunks = stages["upsert"].items
+        report.seconds = round(wall, 2)
+        report.stages = [s.row(wall) for s in stages.values()]
+        logger.info(
+            "ingested %s files / %s chunks in %.1fs (%s unchanged, %s stale chunks deleted)",
+            report.files, report.chunks, wall, report.unchanged, report.deleted,
+        )
+        return report
+
+    # ── Stages ─────────────────────────────────────────────────────
+    async def _parse_all(
+        self,
+        pool: _ParsePool,
+        sources: dict[str, str],
+        namespace: str,
+        out: asyncio.Queue,
+        stats: StageStats,
+        report: IngestReport,
+    ) -> None:
+        slots = asyncio.Semaphore(self._parse_workers * 2)  # parsed files waiting on the queue
+
+        async def _one(path: str, name: str) -> None:
+            async with slots:
+                known = await asyncio.to_thread(self._manifest.content_hash, namespace, name) if self._manifest else None
+                begin = time.perf_counter()
+                try:
+                    with telemetry.span("ingest.parse") as s:
+                        digest, chunks = await pool.parse(path, name, self._params, known)
+                        s.set(chunks=len(chunks) if chunks is not None else 0)
+                except Exception:
+                    logger.exception("failed to parse %s", path)
+                    report.failed.append(path)
+                    return
+                stats.items += 1
+                stats.busy += time.perf_counter() - begin
+                if chunks is None:
+                    report.unchanged += 1
+                    return
+                old = await asyncio.to_thread(self._manifest.chunk_ids, namespace, name) if self._manifest else set()
+                ids = [c.id for c in chunks]
+                fresh = [c for c in chunks if c.id not in old]
+                batches = [fresh[i : i + self._batch] for i in range(0, len(fresh), self._batch)]
+                job = _FileJob(name, digest, ids, sorted(old - set(ids)), len(batches))
+                if not batches:
+                    await self._finish(job, namespace, report)
+                for batch in batches:
+                    await out.put((job, batch))
+
+        await asyncio.gather(*(_one(path, name) for path, name in sources.items()))
+
+    async def _embed_worker(self, inbox: asyncio.Queue, out: asyncio.Queue, stats: StageStats) -> None:
+        while (item := await inbox.get()) is not None:
+            job, chunks = item
+            begin = time.perf_counter()
+            with telemetry.span("ingest.embed", chunks=len(chunks)):
+                result = self._embedding.embed_texts([c.text for c in chunks])
+                embeds = await result if inspect.isawaitable(result) else result
+            stats.items += len(chunks)
+            stats.busy += time.perf_counter() - begin
+            await out.put((job, chunks, embeds))
+
+    async def _upsert_worker(
+        self, inbox: asyncio.Queue, namespace: str, stats: StageStats, report: IngestReport
+    ) -> None:
+        while (item := await inbox.get()) is not None:
+            job, chunks, embeds = item
+            begin = time.perf_counter()
+            with telemetry.span("ingest.upsert", chunks=len(chunks)):
+                await self._store.upsert_vectors_async(chunks, embeds, namespace)
+            stats.items += len(chunks)
+            stats.busy += time.perf_counter() - begin
+            job.pending -= 1
+            if job.pending == 0:
+                await self._finish(job, namespace, report)
+
+    # ── Manifest bookkeeping ───────────────────────────────────────
+    async def _finish(self, job: _FileJob, namespace: str, report: IngestReport) -> None:
+        """All new chunks of a file are stored: drop its stale ones, then record it."""
+        await self._delete(await self._unshared(job.source, job.stale, namespace), namespace, report)
+        if self._manifest is not None:
+            await asyncio.to_thread(self._manifest.record, namespace, job.source, job.content_hash, job.chunk_ids)
+
+    async def _prune(self, namespace: str, keep: set[str], failed: set[str], report: IngestReport) -> None:
+        if self._manifest is None:
+            return
+        known = await asyncio.to_thread(self._manifest.sources, namespace)
+        await self.forget(set(known) - keep - failed, namespace, report)
+
+    async def forget(self, sources: Iterable[str], namespace: str, report: IngestReport | None = None) -> int:
+        """Delete every chunk the manifest holds for `sources`; returns how many."""
+        if self._manifest is None:
+            raise RuntimeError("forgetting sources needs an ingest manifest")
+        report = report or IngestReport(files=0, chunks=0, seconds=0.0, stages=[])
+        before = report.deleted
+        for source in sorted(sources):
+            ids = await asyncio.to_thread(self._manifest.chunk_ids, namespace, source)
+            await self._delete(await self._unshared(source, ids, namespace), namespace, report)
+            await asyncio.to_thread(self._manifest.forget, namespace, source)
+            logger.info("removed %s from %s", source, namespace)
+        return report.deleted - before
+
+    async def _unshared(self, source: str, ids: Iterable[str], namespace: str) -> list[str]:
+        """`ids` minus those another source still holds (same-named files share ids)."""
+        ids = set(ids)
+        if self._manifest is not None and ids:
+            ids -= await asyncio.to_thread(self._manifest.held_elsewhere, namespace, source, ids)
+        return sorted(ids)
+
+    async def _delete(self, ids: list[str], namespace: str, report: IngestReport) -> None:
+        for i in range(0, len(ids), _DELETE_BATCH):
+            await self._store.delete_async(ids[i : i + _DELETE_BATCH], namespace)
+        report.deleted += len(ids)
+
+
+class _ParsePool:
+    """The parse workers' process pool, replaced when a worker dies."""
+
+    def __init__(self, workers: int) -> None:
+        self._workers = workers
+        self._executor = capped_pool(workers, config.PDF_WORKER_MAX_MB)
+
+    async def parse(
+        self, path: str, name: str, params: IngestParams | None, known_hash: str | None
+    ) -> tuple[str, list[Chunk] | None]:
+        loop = asyncio.get_running_loop()
+        executor = self._executor
+        try:
+            return await loop.run_in_executor(executor, _parse, path, name, params, known_hash)
+        except BrokenProcessPool:
+            # a worker died (e.g. past its memory cap) while this file was in flight; it
+            # may not be the cause, so parse it again alone: only the culprit breaks that
+            self._renew(executor)
+            logger.warning("parse worker died with %s in flight; retrying it in its own process", path)
+            alone = capped_pool(1, config.PDF_WORKER_MAX_MB)
+            try:
+                return await loop.run_in_executor(alone, _parse, path, name, params, known_hash)
+            finally:
+                alone.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _renew(self, broken: ProcessPoolExecutor) -> None:
+        if self._executor is broken:  # the first of the failed files replaces it
+            broken.shutdown(wait=False, cancel_futures=True)
+            self._executor = capped_pool(self._workers, config.PDF_WORKER_MAX_MB)
+
+
+async def _drain(queue: asyncio.Queue, workers: list[asyncio.Task]) -> None:
+    """Tell the workers the input is done and wait for them (their errors surface here)."""
+    for _ in workers:
+        await queue.put(None)
+    await asyncio.gather(*workers)
+
+
+def _source(path: str | Path, root: str | Path | None) -> str:
+    return Path(path).relative_to(root).as_posix() if root is not None else Path(path).name
+
+
+def _check_unique(sources: dict[str, str]) -> None:
+    paths: dict[str, list[str]] = {}
+    for path, source in sources.items():
+        paths.setdefault(source, []).append(path)
+    clashes = {source: found for source, found in paths.items() if len(found) > 1}
+    if clashes:
+        raise ValueError(f"several files map to the same source (pass a common root): {clashes}")
+
+
+def _parse(
+    path: str, name: str, params: IngestParams | None, known_hash: str | None
+) -> tuple[str, list[Chunk] | None]:
+    """
+    Runs in a worker process: (content hash, chunks) for one file, or
+    chunks=None when the hash matches `known_hash`. The hash covers the
+    chunking parameters, which change the chunks as much as the bytes do.
+    """
+    data = Path(path).read_bytes()
+    params = params or IngestParams()
+    digest = hashlib.sha256(data)
+    digest.update(f"{params.chunk_size}:{params.overlap}".encode())
+    content_hash = digest.hexdigest()
+    if content_hash == known_hash:
+        return content_hash, None
+    return content_hash, list(get_ingestor(path, params).iter_chunks(data, name))
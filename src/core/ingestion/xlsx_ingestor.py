@@ -1,16 +1,58 @@
+from __future__ import annotations
 from io import BytesIO
-import pandas as pd
-from core.ingestion.base import AbstractIngestor
+from typing import Any, Iterator
+import openpyxl
+from core.ingestion.base import AbstractIngestor, IngestParams
 
 
 class XlsxIngestor(AbstractIngestor):
+    """
+    Sheets are read row by row from a read-only workbook and streamed to the
+    chunker in groups of `rows_per_section` whole rows, tagged with the
+    1-based sheet number (as the chunk's page). The text is one "# <sheet>"
+    line per sheet followed by one "a | b | c" line per non-blank row.
+
+    Blank cells before a row's last value stay as empty positions
+    ("a |  | c") so columns line up across rows; trailing blanks are cut.
+    Cells print as the former pandas text did (integral numbers without
+    ".0", booleans as True/False), so dense sheets read exactly as before;
+    sparse ones show "" where pandas printed "nan" and drop its padding.
+    """
+
+    def __init__(self, params: IngestParams | None = None, rows_per_section: int = 512) -> None:
+        super().__init__(params)
+        self._rows_per_section = rows_per_section
+
     def _convert_to_markdown(self, data: bytes) -> str:
-        dfs = pd.read_excel(BytesIO(data), sheet_name=None, header=None)
-        lines: list[str] = []
-        for name, df in dfs.items():
-            lines.append(f"# {name}")
-            for row in df.itertuples(index=False):
-                cells = [str(cell) for cell in row if str(cell).strip()]
-                if cells:
-                    lines.append(" | ".join(cells))
-        return "\n".join(lines)
+        return "".join(text for _, text in self._sections(data))
+
+    def _sections(self, data: bytes) -> Iterator[tuple[int, str]]:
+        wb = openpyxl.load_workbook(BytesIO(data), read_only=True, data_only=True)
+        try:
+            for sheet_no, ws in enumerate(wb.worksheets, 1):
+                ws.reset_dimensions()  # trust the rows, not a possibly stale <dimension> tag
+                yield sheet_no, ("\n" if sheet_no > 1 else "") + f"# {ws.title}"
+                group: list[str] = []
+                for row in ws.iter_rows(values_only=True):
+                    cells = [_cell(value) for value in row]
+                    while cells and not cells[-1]:
+                        cells.pop()
+                    if cells:
+                        group.append(" | ".join(cells))
+                    if len(group) == self._rows_per_section:
+                        yield sheet_no, "\n" + "\n".join(group)
+                        group = []
+                if group:
+                    yield sheet_no, "\n" + "\n".join(group)
+        finally:
+            wb.close()
+
+
+def _cell(value: Any) -> str:
+    """A cell as pandas (via its openpyxl reader) would print it; "" for blanks."""
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    text = str(value)
+    return text if text.strip() else ""
@@ -3,14 +3,20 @@ import asyncio
 import functools
 import inspect
 import logging
-from dataclasses import asdict
-from typing import Sequence
+import time
+from contextlib import nullcontext
+from dataclasses import asdict, dataclass, field
+from typing import AsyncIterator, Sequence
 
-from core.schema import Chunk
+from core import clients, telemetry
+from core.answer_cache import AnswerCache
+from core.docstore import DocStore
+from core.schema import Chunk, ScoredChunk
 from core.vector_stores.base import BaseVectorStore
 from core.strategies.expansion import PromptExpansion
 from core.strategies.generation import OpenAICompletion
-from core.strategies.rerank import SbertRerank
+from core.strategies.rerank import RerankBatcher, SbertRerank
+from core.tokenizer import tokenizer
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -21,14 +27,29 @@ class RagOrchestrator:
         self,
         store: BaseVectorStore,
         generation: OpenAICompletion,
-        embedding,  # kept for future hooks
+        embedding,
         expansion: PromptExpansion | None = None,
-        rerank: SbertRerank | None = None,
+        rerank: SbertRerank | RerankBatcher | None = None,
+        answer_cache: AnswerCache | None = None,
+        skip_expansion_above: float | None = None,
+        skip_rerank_above: float | None = None,
+        docstore: DocStore | None = None,
+        neighbours: int = 0,
     ) -> None:
         self._store = store
         self._gen = generation
+        self._embedding = embedding
         self._exp = expansion
         self._rerank = rerank or SbertRerank()
+        self._cache = answer_cache
+        # adaptive mode: a confident first retrieval makes later stages optional
+        self._skip_expansion_above = skip_expansion_above
+        self._skip_rerank_above = skip_rerank_above
+        # reranked hits widen into their surrounding chunks; the packer merges the runs
+        self._docstore = docstore
+        self._neighbours = neighbours
+        if answer_cache is not None:
+            store.on_change(self._invalidate)
 
     # ── Async public API ───────────────────────────────────────────
     async def answer_async(
@@ -38,37 +59,269 @@ class RagOrchestrator:
         k: int = 8,
         trace: bool = False,
     ):
-        # 1. Expansion (await OpenAI)
+        """The answer, or with `trace` the full result including per-stage `spans`."""
+        with telemetry.collect() if trace else nullcontext([]) as spans, telemetry.span("answer") as total:
+            vector, generation, hit = await self._cached(query, user_id, k)
+            if hit is not None:
+                total.set(cached=True)
+                result = {**hit, "cached": True}
+            else:
+                r = await self._retrieve(query, user_id, k, vector)
+                context, packing = await self._context(r.top, user_id)
+                answer = await self._generate(query, context)
+                result = {"answer": answer, "chunks": r.dicts(r.top), "skipped": r.skipped, "context": packing}
+                await self._remember(query, user_id, k, vector, generation, result)
+        return {**result, "spans": [s.dict() for s in spans]} if trace else result["answer"]
+
+    async def answer_stream(
+        self,
+        query: str,
+        user_id: str,
+        k: int = 8,
+        trace: bool = False,
+    ) -> AsyncIterator[tuple[str, dict]]:
+        """
+        Yield (event, payload) pairs: "retrieval" and "rerank" (trace only),
+        then one "token" per generated delta and a final "done" (with the
+        context packing stats and per-stage spans when tracing).
+        """
+        with telemetry.collect() if trace else nullcontext([]) as spans:
+            async for event in self._stream(query, user_id, k, trace, spans):
+                yield event
+
+    async def _stream(
+        self, query: str, user_id: str, k: int, trace: bool, spans: list[telemetry.Span]
+    ) -> AsyncIterator[tuple[str, dict]]:
+        start = time.perf_counter()
+        vector, generation, hit = await self._cached(query, user_id, k)
+        if hit is not None:
+            if trace:
+                yield "rerank", {"chunks": hit["chunks"], "cached": True}
+            yield "token", {"text": hit["answer"]}
+            ttft_ms = (time.perf_counter() - start) * 1000
+            telemetry.record("ttft", ttft_ms, cached=True)
+            done = {"ttft_ms": round(ttft_ms, 1), "cached": True}
+            yield "done", {**done, "spans": [s.dict() for s in spans]} if trace else done
+            return
+
+        r = await self._search(query, user_id, k, vector)
+        if trace:  # before rerank starts, so the client sees candidates early
+            yield "retrieval", {"chunks": r.dicts(r.candidates), "skipped": dict(r.skipped)}
+        await self._rank(query, r, k)
+        if trace:
+            yield "rerank", {"chunks": r.dicts(r.top), "skipped": r.skipped}
+
+        context, packing = await self._context(r.top, user_id)
+        stream = getattr(self._gen, "stream", None)
+        if stream is not None:
+            deltas = stream(query, context)
+        else:  # generators without streaming send the whole answer as one token
+            deltas = _single(await self._generate(query, context))
+
+        ttft: float | None = None
+        parts: list[str] = []
+        with telemetry.span("generation", stream=True) as s:
+            async for delta in deltas:
+                if ttft is None:
+                    ttft = time.perf_counter() - start
+                    s.set(ttft_ms=round(ttft * 1000, 1))
+                    telemetry.record("ttft", ttft * 1000)
+                parts.append(delta)
+                yield "token", {"text": delta}
+            s.set(tokens=len(parts))  # one delta per token
+        result = {"answer": "".join(parts), "chunks": r.dicts(r.top), "skipped": r.skipped, "context": packing}
+        await self._remember(query, user_id, k, vector, generation, result)
+        done = {"ttft_ms": round((ttft or 0.0) * 1000, 1)}
+        yield "done", {**done, "context": packing, "spans": [s.dict() for s in spans]} if trace else done
+
+    async def _cached(
+        self, query: str, user_id: str, k: int
+    ) -> tuple[Sequence[float] | None, int | None, dict | None]:
+        """
+        (query embedding, cache generation, cached result) – all None when
+        caching is off. The generation is read before the lookup, so an
+        upsert during retrieval stops the answer from being stored. Cache
+        calls run in a worker thread: the sqlite cache blocks on its file.
+        """
+        if self._cache is None:
+            return None, None, None
+        with telemetry.span("answer_cache") as s:
+            generation = await asyncio.to_thread(self._cache.generation, user_id)
+            vector = (await self._embed([query]))[0]
+            hit = await asyncio.to_thread(self._cache.get, user_id, k, vector)
+            s.set(hit=hit is not None)
+        return vector, generation, hit
+
+    async def _remember(
+        self,
+        query: str,
+        user_id: str,
+        k: int,
+        vector: Sequence[float] | None,
+        generation: int | None,
+        result: dict,
+    ) -> None:
+        if self._cache is not None and vector is not None:
+            await asyncio.to_thread(self._cache.put, user_id, k, query, vector, result, generation)
+
+    def _invalidate(self, namespace: str) -> None:
+        """Store change hook; stores fire it on the loop after async writes, so it moves off it there."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:  # a sync caller or a store's worker thread
+            self._cache.invalidate(namespace)
+            return
+        # until it lands a lookup may still hit, but answers retrieved meanwhile are not stored
+        loop.run_in_executor(None, self._cache.invalidate, namespace)
+
+    async def _context(self, chunks: Sequence[Chunk], namespace: str) -> tuple[list[str], dict]:
+        """(context texts, packing stats) – generators without `pack` get raw chunk texts."""
+        with telemetry.span("context", chunks=len(chunks)) as s:
+            if self._neighbours and self._docstore is not None:  # ranked after every hit: the budget goes to hits first
+                extra = await asyncio.to_thread(self._docstore.neighbours, namespace, chunks, self._neighbours)
+                chunks = [*chunks, *extra]
+                s.set(neighbours=len(extra))
+            pack = getattr(self._gen, "pack", None)
+            if pack is None:
+                return [c.text for c in chunks], {}
+            packed = pack(chunks)
+            s.set(**packed.stats())
+        if packed.tokens_saved or packed.dropped:
+            logger.info("context packing %s", packed.stats())
+        return packed.texts, packed.stats()
+
+    async def _embed(self, texts: Sequence[str]) -> Sequence[Sequence[float]]:
+        out = self._embedding.embed_texts(texts)
+        return await out if inspect.isawaitable(out) else out
+
+    async def _generate(self, query: str, context: Sequence[str]) -> str:
+        # 4. Generation (await if coroutine; else off-thread)
+        with telemetry.span("generation", stream=False) as s:
+            if inspect.iscoroutinefunction(self._gen.run):
+                answer = await self._gen.run(query, context)
+            else:
+                loop = asyncio.get_running_loop()
+                answer = await loop.run_in_executor(None, lambda: self._gen.run(query, context))
+            if s.recording:
+                s.set(tokens=len(tokenizer().encode_ordinary(answer)))
+        return answer
+
+    async def _retrieve(
+        self, query: str, user_id: str, k: int, vector: Sequence[float] | None = None
+    ) -> _Retrieval:
+        """Expansion, retrieval and rerank, skipping stages the adaptive thresholds allow."""
+        r = await self._search(query, user_id, k, vector)
+        await self._rank(query, r, k)
+        return r
+
+    async def _search(
+        self, query: str, user_id: str, k: int, vector: Sequence[float] | None = None
+    ) -> _Retrieval:
+        """
+        Expansion and retrieval: the fused candidates, not yet reranked.
+        `vector` is the query's embedding when the answer cache computed it.
+        """
+        skipped: dict[str, str] = {}
         queries: list[str] = [query]
+        results: list[list[ScoredChunk]] = []
+
+        # 1. Expansion (await OpenAI) – in adaptive mode only if the original query is weak
         if self._exp:
-            queries += await self._exp.run(query)
-
-        # 2. Parallel retrieval
-        loop = asyncio.get_running_loop()
-        tasks = [
-            self._store.query_async(q, namespace=user_id, k=k)  # type: ignore[attr-defined]
-            if hasattr(self._store, "query_async")
-            else loop.run_in_executor(None, functools.partial(self._store.query, q, user_id, k))
-            for q in queries
-        ]
-        results: Sequence[list[Chunk]] = await asyncio.gather(*tasks)
-        dedup: dict[str, Chunk] = {c.id: c for sub in results for c in sub}
-
-        # 3. Rerank (CPU) in background thread
-        top = await loop.run_in_executor(
-            None, functools.partial(self._rerank.run, query, list(dedup.values()), k)
-        )
+            if self._skip_expansion_above is not None:
+                with telemetry.span("retrieval", queries=1) as s:
+                    embeds = None if vector is None else [vector]
+                    results = await self._store.query_many_async(queries, namespace=user_id, k=k, embeds=embeds)
+                    s.set(hits=len(results[0]))
+                reason = _confident(results[0], self._skip_expansion_above)
+                if reason:
+                    skipped["expansion"] = reason
+            if "expansion" not in skipped:
+                with telemetry.span("expansion") as s:
+                    queries += await self._exp.run(query)
+                    s.set(queries=len(queries) - 1)
 
-        # 4. Generation (await if coroutine; else off-thread)
-        if inspect.iscoroutinefunction(self._gen.run):
-            answer = await self._gen.run(query, [c.text for c in top])
+        # 2. Batched retrieval: one embedding call for every remaining query
+        if len(queries) > len(results):
+            with telemetry.span("retrieval", queries=len(queries) - len(results)) as s:
+                embeds = None
+                if vector is not None and not results:  # the original is embedded already
+                    embeds = [vector, *(await self._embed(queries[1:]) if len(queries) > 1 else [])]
+                fresh = await self._store.query_many_async(
+                    queries[len(results) :], namespace=user_id, k=k, embeds=embeds
+                )
+                s.set(hits=sum(len(hits) for hits in fresh))
+            results += fresh
+        candidates = list(_fuse(results).values())
+        scores = {
+            h.chunk.id: h.score for hits in reversed(results) for h in hits if h.score is not None
+        }
+        return _Retrieval(candidates, scores, skipped, results[0])
+
+    async def _rank(self, query: str, r: _Retrieval, k: int) -> None:
+        """3. Rerank (CPU) into `r.top`: micro-batched across requests, or in a background thread."""
+        reason = _confident(r.first, self._skip_rerank_above)
+        if reason:
+            r.skipped["rerank"] = reason
+            r.top = r.candidates[:k]
         else:
-            answer = await loop.run_in_executor(
-                None, lambda: self._gen.run(query, [c.text for c in top])
-            )
+            with telemetry.span("rerank", candidates=len(r.candidates)) as s:
+                if inspect.iscoroutinefunction(self._rerank.run):
+                    r.top = await self._rerank.run(query, r.candidates, k)
+                else:
+                    loop = asyncio.get_running_loop()
+                    r.top = await loop.run_in_executor(
+                        None, functools.partial(self._rerank.run, query, r.candidates, k)
+                    )
+                s.set(top=len(r.top))
+        if r.skipped:
+            logger.info("adaptive skip %s", r.skipped)
 
-        return {"answer": answer, "chunks": [asdict(c) for c in top]} if trace else answer
+    async def aclose(self) -> None:
+        """Close the store and shared HTTP clients bound to the running loop."""
+        await self._store.aclose()
+        await clients.aclose()
 
     # ── Sync wrapper for legacy scripts / tests ────────────────────
     def answer(self, *args, **kwargs):
-        return asyncio.run(self.answer_async(*args, **kwargs))
+        async def _once():
+            try:
+                return await self.answer_async(*args, **kwargs)
+            finally:
+                await self.aclose()  # the loop dies with asyncio.run
+
+        return asyncio.run(_once())
+
+
+@dataclass(slots=True)
+class _Retrieval:
+    candidates: list[Chunk]  # fused, best first
+    scores: dict[str, float]  # retrieval similarity by chunk id (original query wins)
+    skipped: dict[str, str]  # stage -> reason
+    first: list[ScoredChunk]  # hits for the original query, for the adaptive rerank skip
+    top: list[Chunk] = field(default_factory=list)  # after rerank
+
+    def dicts(self, chunks: Sequence[Chunk]) -> list[dict]:
+        return [{**asdict(c), "score": self.scores.get(c.id)} for c in chunks]
+
+
+def _confident(hits: Sequence[ScoredChunk], threshold: float | None) -> str | None:
+    """Reason string when the best hit clears `threshold`, else None."""
+    if threshold is None or not hits or hits[0].score is None:
+        return None
+    best = hits[0].score
+    return f"top score {best:.3f} >= {threshold}" if best >= threshold else None
+
+
+def _fuse(results: Sequence[Sequence[ScoredChunk]], c: int = 60) -> dict[str, Chunk]:
+    """Reciprocal-rank fusion across per-query hit lists; best candidates first."""
+    fused: dict[str, float] = {}
+    chunks: dict[str, Chunk] = {}
+    for hits in results:
+        for rank, hit in enumerate(hits):
+            fused[hit.chunk.id] = fused.get(hit.chunk.id, 0.0) + 1.0 / (c + rank + 1)
+            chunks.setdefault(hit.chunk.id, hit.chunk)
+    return {cid: chunks[cid] for cid in sorted(fused, key=fused.__getitem__, reverse=True)}
+
+
+async def _single(text: str) -> AsyncIterator[str]:
+    yield text
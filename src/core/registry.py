@@ -0,0 +1,59 @@
+from __future__ import annotations
+from typing import Any, Callable, Sequence
+import asyncio
+import logging
+import threading
+import time
+from src import config
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class Registry:
+    """
+    Named components built on first use. A factory may pull in other
+    components through `get`; `requires` names the config subsystems it
+    needs, checked before the factory runs. `warm_up` builds everything
+    concurrently in threads, for an app's startup hook.
+    """
+
+    def __init__(self) -> None:
+        self._factories: dict[str, tuple[Callable[[], Any], tuple[str, ...]]] = {}
+        self._built: dict[str, Any] = {}
+        self._locks: dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, factory: Callable[[], Any], requires: Sequence[str] = ()) -> None:
+        self._factories[name] = (factory, tuple(requires))
+
+    def get(self, name: str) -> Any:
+        if name in self._built:
+            return self._built[name]
+        if name not in self._factories:
+            raise KeyError(f"unknown component {name!r}")
+        with self._lock:
+            lock = self._locks.setdefault(name, threading.Lock())
+        with lock:  # one build per component; different components build in parallel
+            if name not in self._built:
+                factory, requires = self._factories[name]
+                config.require(*requires)
+                start = time.perf_counter()
+                self._built[name] = factory()
+                logger.info("built %s in %.0f ms", name, (time.perf_counter() - start) * 1000)
+        return self._built[name]
+
+    async def aget(self, name: str) -> Any:
+        """`get` that builds off the event loop when the component is cold."""
+        if name in self._built:
+            return self._built[name]
+        return await asyncio.to_thread(self.get, name)
+
+    def peek(self, name: str) -> Any | None:
+        """The component if it has been built, without building it."""
+        return self._built.get(name)
+
+    async def warm_up(self, names: Sequence[str] | None = None) -> None:
+        start = time.perf_counter()
+        await asyncio.gather(*(asyncio.to_thread(self.get, n) for n in names or list(self._factories)))
+        logger.info("warm-up finished in %.0f ms", (time.perf_counter() - start) * 1000)
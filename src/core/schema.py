@@ -7,6 +7,23 @@ class Chunk:
     text: str
     index: int
     source: str
+    page_start: int | None = None  # 1-based pages the chunk spans, when the format has pages
+    page_end: int | None = None
+
+    def pages(self) -> dict[str, int]:
+        """Page fields that are set, for store metadata (which rejects nulls)."""
+        out = {}
+        if self.page_start is not None:
+            out["page_start"] = self.page_start
+        if self.page_end is not None:
+            out["page_end"] = self.page_end
+        return out
+
+
+@dataclass(slots=True, frozen=True)
+class ScoredChunk:
+    chunk: Chunk
+    score: float | None  # similarity, higher is better; None if the store has none
 
 
 @dataclass(slots=True)
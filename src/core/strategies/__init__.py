@@ -1,5 +1,6 @@
 from .expansion import PromptExpansion
-from .rerank import SbertRerank
+from .rerank import RerankBatcher, SbertRerank
 from .generation import OpenAICompletion
+from .context import ContextPacker
 
-__all__ = ["PromptExpansion", "SbertRerank", "OpenAICompletion"]
+__all__ = ["PromptExpansion", "SbertRerank", "RerankBatcher", "OpenAICompletion", "ContextPacker"]
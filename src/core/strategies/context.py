@@ -0,0 +1,118 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Sequence
+import logging
+from core.schema import Chunk
+from core.tokenizer import tokenizer
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+@dataclass(slots=True)
+class PackedContext:
+    texts: list[str]  # one per merged span, best-ranked span first
+    chunk_ids: list[str]  # chunks that made it in, in rank order
+    tokens: int  # tokens of the joined context
+    tokens_saved: int  # vs. joining the same chunks unmerged
+    dropped: int  # chunks left out by the budget
+
+    def stats(self) -> dict[str, int]:
+        return {"context_tokens": self.tokens, "tokens_saved": self.tokens_saved, "chunks_dropped": self.dropped}
+
+
+class ContextPacker:
+    """
+    Fit reranked chunks into a token budget. Chunks are taken greedily in
+    rank order; chunks adjacent by (source, index) merge into one span with
+    their shared overlap written once, so a neighbour only costs its new
+    tokens. A chunk that does not fit is skipped and smaller ones after it
+    still get a chance; if even the best chunk is too long it is cut at a
+    token boundary.
+    """
+
+    def __init__(self, max_tokens: int = 3000, separator: str = "\n\n", min_overlap_chars: int = 16) -> None:
+        self.max_tokens = max_tokens
+        self._sep = separator
+        self._min_overlap = min_overlap_chars
+
+    def pack(self, chunks: Sequence[Chunk]) -> PackedContext:
+        enc = tokenizer()
+        if not chunks:
+            return PackedContext([], [], 0, 0, 0)
+        sep = len(enc.encode_ordinary(self._sep))
+        sizes = [len(t) for t in enc.encode_ordinary_batch([c.text for c in chunks])]
+        chosen: dict[tuple[str, int], int] = {}  # (source, index) -> rank
+        overlaps: dict[tuple[int, int], int] = {}  # (left rank, right rank) -> shared chars
+        used = -sep  # n spans need n - 1 separators
+        for rank, c in enumerate(chunks):
+            if (c.source, c.index) in chosen:
+                continue
+            cost = sizes[rank] + sep
+            for left, right in (((c.source, c.index - 1), None), (None, (c.source, c.index + 1))):
+                nb = chosen.get(left or right)
+                if nb is None:
+                    continue
+                pair = (nb, rank) if left else (rank, nb)
+                shared = overlaps[pair] = _overlap(chunks[pair[0]].text, chunks[pair[1]].text, self._min_overlap)
+                if shared:  # written once, and no separator inside the span
+                    cost -= len(enc.encode_ordinary(chunks[pair[1]].text[:shared])) + sep
+            if used + cost <= self.max_tokens:
+                chosen[(c.source, c.index)] = rank
+                used += cost
+
+        if not chosen:  # the best chunk alone is over budget
+            text = enc.decode(enc.encode_ordinary(chunks[0].text)[: self.max_tokens])
+            return PackedContext([text], [chunks[0].id], self.max_tokens, 0, len(chunks) - 1)
+
+        texts = [text for _, text in sorted(self._spans(chunks, chosen, overlaps))]
+        ranks = sorted(chosen.values())
+        tokens = len(enc.encode_ordinary(self._sep.join(texts)))
+        naive = sum(sizes[r] for r in ranks) + sep * (len(ranks) - 1)
+        return PackedContext(
+            texts=texts,
+            chunk_ids=[chunks[r].id for r in ranks],
+            tokens=tokens,
+            tokens_saved=max(0, naive - tokens),
+            dropped=len(chunks) - len(ranks),
+        )
+
+    def fit(self, text: str) -> str:
+        """Cut `text` to the budget at a token boundary."""
+        enc = tokenizer()
+        tokens = enc.encode_ordinary(text)
+        return text if len(tokens) <= self.max_tokens else enc.decode(tokens[: self.max_tokens])
+
+    def _spans(
+        self,
+        chunks: Sequence[Chunk],
+        chosen: dict[tuple[str, int], int],
+        overlaps: dict[tuple[int, int], int],
+    ) -> list[tuple[int, str]]:
+        """(best rank, text) per run of consecutive indexes within a source."""
+        spans: list[tuple[int, str]] = []
+        prev: tuple[str, int] | None = None
+        for key in sorted(chosen):
+            rank = chosen[key]
+            if prev is not None and prev[0] == key[0] and prev[1] + 1 == key[1]:
+                best, text = spans[-1]
+                shared = overlaps.get((chosen[prev], rank), 0)
+                joiner = "" if shared else self._sep
+                spans[-1] = (min(best, rank), text + joiner + chunks[rank].text[shared:])
+            else:
+                spans.append((rank, chunks[rank].text))
+            prev = key
+        return spans
+
+
+def _overlap(left: str, right: str, min_chars: int) -> int:
+    """Length of the longest suffix of `left` that is a prefix of `right` (0 below `min_chars`)."""
+    probe = right[:min_chars]
+    if len(probe) < min_chars:
+        return 0
+    pos = left.find(probe)
+    while pos != -1:
+        if right.startswith(left[pos:]):
+            return len(left) - pos
+        pos = left.find(probe, pos + 1)
+    return 0
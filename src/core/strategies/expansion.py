@@ -4,14 +4,12 @@ from typing import Sequence
 import json
 import logging
 import yaml
-from openai import AsyncOpenAI
+from core import clients
 from src import config
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
-_client = AsyncOpenAI(api_key=config.OPENAI_API_KEY)
-
 
 class PromptExpansion:
     def __init__(
@@ -28,7 +26,7 @@ class PromptExpansion:
 
     async def run(self, query: str) -> Sequence[str]:
         user_msg = self._template.format(query=query, n=self._n)
-        resp = await _client.chat.completions.create(
+        resp = await clients.openai_client().chat.completions.create(
             model=self._model,
             messages=[
                 {"role": "system", "content": self._system},
@@ -1,39 +1,58 @@
 from __future__ import annotations
 from pathlib import Path
-from typing import Sequence
+from typing import AsyncIterator, Sequence
 import logging
 import yaml
-from openai import AsyncOpenAI
+from core import clients
+from core.schema import Chunk
+from core.strategies.context import ContextPacker, PackedContext
 from src import config
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
-_client = AsyncOpenAI(api_key=config.OPENAI_API_KEY)
-
 
 class OpenAICompletion:
     def __init__(
         self,
         model: str | None = None,
-        max_context: int = 12_000,
+        max_context_tokens: int = 3000,
         prompts_path: str | None = None,
     ) -> None:
         self._model = model or config.GPT_MODEL
-        self._max_ctx = max_context
+        self._packer = ContextPacker(max_context_tokens)
         cfg = yaml.safe_load(Path(prompts_path or config.PROMPTS_PATH).read_text())["generation"]
         self._system = cfg["system"]
         self._template = cfg["template"]
 
+    def pack(self, chunks: Sequence[Chunk]) -> PackedContext:
+        """Reranked chunks -> context spans within the prompt token budget."""
+        return self._packer.pack(chunks)
+
     async def run(self, query: str, context: Sequence[str]) -> str:
-        joined = "\n\n".join(context)[: self._max_ctx]
-        user_msg = self._template.format(query=query, context=joined)
-        resp = await _client.chat.completions.create(
+        resp = await clients.openai_client().chat.completions.create(
             model=self._model,
-            messages=[
-                {"role": "system", "content": self._system},
-                {"role": "user", "content": user_msg},
-            ],
+            messages=self._messages(query, context),
             temperature=0,
         )
         return resp.choices[0].message.content.strip()
+
+    async def stream(self, query: str, context: Sequence[str]) -> AsyncIterator[str]:
+        """Yield content deltas as the model produces them."""
+        resp = await clients.openai_client().chat.completions.create(
+            model=self._model,
+            messages=self._messages(query, context),
+            temperature=0,
+            stream=True,
+        )
+        async for event in resp:
+            if event.choices and event.choices[0].delta.content:
+                yield event.choices[0].delta.content
+
+    def _messages(self, query: str, context: Sequence[str]) -> list[dict]:
+        joined = self._packer.fit("\n\n".join(context))  # no-op for packed context
+        user_msg = self._template.format(query=query, context=joined)
+        return [
+            {"role": "system", "content": self._system},
+            {"role": "user", "content": user_msg},
+        ]
@@ -1,17 +1,72 @@
 from __future__ import annotations
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from pathlib import Path
 from typing import Sequence
+import asyncio
+import functools
 import logging
+import queue
+import threading
+import time
 import numpy as np
-from sentence_transformers import CrossEncoder, SentenceTransformer, util
 from core.schema import Chunk
+from src import config
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 
+class OnnxCrossEncoder:
+    """
+    Cross-encoder on ONNX Runtime (int8-quantized export by default).
+    Pairs are sorted by length and batched so each batch pads only to its
+    own longest pair; sequences are truncated to `max_length` tokens.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        model_file: str,
+        max_length: int = 256,
+        batch_size: int = 32,
+        threads: int | None = None,
+    ) -> None:
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_path, tokenizer_path = _resolve(model, model_file)
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        opts.intra_op_num_threads = threads or 0  # 0 = one per physical core
+        opts.inter_op_num_threads = 1
+        self._session = ort.InferenceSession(model_path, opts, providers=["CPUExecutionProvider"])
+        self._inputs = {i.name for i in self._session.get_inputs()}
+        self._tok = Tokenizer.from_file(tokenizer_path)
+        self._tok.enable_truncation(max_length)
+        self._tok.enable_padding()  # to the longest pair of each batch
+        self._batch = batch_size
+
+    def predict(self, pairs: Sequence[Sequence[str]]) -> np.ndarray:
+        order = sorted(range(len(pairs)), key=lambda i: len(pairs[i][0]) + len(pairs[i][1]))
+        scores = np.empty(len(pairs), dtype=np.float32)
+        for lo in range(0, len(order), self._batch):
+            idx = order[lo : lo + self._batch]
+            enc = self._tok.encode_batch([tuple(pairs[i]) for i in idx])
+            feed = {
+                "input_ids": np.array([e.ids for e in enc], dtype=np.int64),
+                "attention_mask": np.array([e.attention_mask for e in enc], dtype=np.int64),
+                "token_type_ids": np.array([e.type_ids for e in enc], dtype=np.int64),
+            }
+            logits = self._session.run(None, {k: v for k, v in feed.items() if k in self._inputs})[0]
+            scores[idx] = np.asarray(logits).reshape(len(idx), -1)[:, 0]
+        return scores
+
+
 class SbertRerank:
     """
-    Prefer a cross-encoder for precise reranking.
+    Prefer a cross-encoder for precise reranking: the ONNX Runtime export
+    when it is available, then the PyTorch model.
     If unavailable (no download, offline, etc.), fall back to
     embedding cosine similarity via SentenceTransformer util.dot_score.
     """
@@ -19,12 +74,36 @@ class SbertRerank:
     _CROSS_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
     _EMBED_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        backend: str | None = None,
+        max_length: int | None = None,
+        threads: int | None = None,
+    ) -> None:
         self._mode = "none"
+        backend = backend or config.RERANK_BACKEND  # auto | onnx | torch
+        max_length = max_length or config.RERANK_MAX_LENGTH
 
-        # 1️⃣ try cross-encoder
+        # 0️⃣ try the ONNX cross-encoder
+        if backend in ("auto", "onnx"):
+            try:
+                self._xe = OnnxCrossEncoder(
+                    config.RERANK_ONNX_MODEL or self._CROSS_MODEL,
+                    config.RERANK_ONNX_FILE,
+                    max_length=max_length,
+                    threads=threads or config.RERANK_THREADS,
+                )
+                self._mode = "onnx"
+                logger.info("loaded onnx cross-encoder %s", config.RERANK_ONNX_FILE)
+                return
+            except Exception as exc:
+                logger.warning("onnx cross-encoder unavailable (%s)", exc)
+
+        # 1️⃣ try cross-encoder (sentence_transformers pulls in torch: import on demand)
         try:
-            self._xe = CrossEncoder(self._CROSS_MODEL)
+            from sentence_transformers import CrossEncoder
+
+            self._xe = CrossEncoder(self._CROSS_MODEL, max_length=max_length)
             self._mode = "cross"
             logger.info("loaded cross-encoder %s", self._CROSS_MODEL)
             return
@@ -33,24 +112,160 @@ class SbertRerank:
 
         # 2️⃣ fall back to bi-encoder similarity
         try:
+            from sentence_transformers import SentenceTransformer
+
             self._be = SentenceTransformer(self._EMBED_MODEL)
             self._mode = "bi"
             logger.info("loaded bi-encoder %s for cosine rerank", self._EMBED_MODEL)
         except Exception as exc:
             logger.warning("bi-encoder unavailable (%s) – rerank disabled", exc)
 
+    @property
+    def mode(self) -> str:
+        return self._mode
+
+    def score_pairs(self, pairs: Sequence[Sequence[str]]) -> np.ndarray:
+        """Raw cross-encoder scores for [query, text] pairs (cross-encoder modes only)."""
+        return np.asarray(self._xe.predict(pairs), dtype=np.float32)
+
     # ------------------------------------------------------------------
     def run(self, query: str, chunks: Sequence[Chunk], top_n: int = 6) -> list[Chunk]:
         if self._mode == "none" or len(chunks) <= 1:
             return list(chunks)[:top_n]
 
-        if self._mode == "cross":
-            pairs = [[query, c.text] for c in chunks]
-            scores = self._xe.predict(pairs)
+        if self._mode in ("onnx", "cross"):
+            scores = self.score_pairs([[query, c.text] for c in chunks])
         else:  # bi-encoder
+            from sentence_transformers import util
+
             q_emb = self._be.encode([query], convert_to_tensor=True)
             c_emb = self._be.encode([c.text for c in chunks], convert_to_tensor=True)
             scores = util.dot_score(q_emb, c_emb)[0].cpu().numpy()
+        return _ranked(chunks, scores, top_n)
+
+
+@dataclass(slots=True)
+class _Job:
+    pairs: list[list[str]]
+    future: Future = field(default_factory=Future)
+    queued: float = field(default_factory=time.perf_counter)
+
+
+class RerankBatcher:
+    """
+    Coalesces concurrent rerank calls into one cross-encoder forward pass.
+    A worker thread takes the first waiting request, keeps collecting until
+    `max_batch` pairs are queued or `max_wait_ms` has passed, scores the
+    whole batch at once and hands each caller its slice. Modes without a
+    cross-encoder run unbatched in the default executor.
+    """
+
+    def __init__(self, rerank: SbertRerank, max_batch: int = 64, max_wait_ms: float = 5.0) -> None:
+        self._rerank = rerank
+        self._max_batch = max_batch
+        self._max_wait = max_wait_ms / 1000
+        self._queue: queue.SimpleQueue[_Job | None] = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._worker: threading.Thread | None = None
+        self._depth = self._peak = 0  # requests waiting to be scored
+        self._batches = self._requests = self._pairs = 0
+        self._wait = 0.0
+
+    @property
+    def mode(self) -> str:
+        return self._rerank.mode
+
+    async def run(self, query: str, chunks: Sequence[Chunk], top_n: int = 6) -> list[Chunk]:
+        if self.mode not in ("onnx", "cross") or len(chunks) <= 1:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, functools.partial(self._rerank.run, query, chunks, top_n))
+        job = _Job([[query, c.text] for c in chunks])
+        self._submit(job)
+        return _ranked(chunks, await asyncio.wrap_future(job.future), top_n)
+
+    def stats(self) -> dict[str, float]:
+        with self._lock:
+            return {
+                "queue_depth": self._depth,
+                "peak_queue_depth": self._peak,
+                "batches": self._batches,
+                "requests": self._requests,
+                "mean_batch_pairs": round(self._pairs / self._batches, 1) if self._batches else 0.0,
+                "mean_wait_ms": round(self._wait / self._requests * 1000, 2) if self._requests else 0.0,
+            }
+
+    def close(self) -> None:
+        """Stop the worker once the queued requests are scored."""
+        with self._lock:
+            worker, self._worker = self._worker, None
+        if worker is not None:
+            self._queue.put(None)
+            worker.join()
+
+    def _submit(self, job: _Job) -> None:
+        with self._lock:
+            self._depth += 1
+            self._peak = max(self._peak, self._depth)
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._loop, name="rerank-batcher", daemon=True)
+                self._worker.start()
+        self._queue.put(job)
+
+    def _loop(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            batch, pairs, stop = [job], len(job.pairs), False
+            deadline = time.perf_counter() + self._max_wait
+            while pairs < self._max_batch:
+                try:
+                    nxt = self._queue.get(timeout=max(0.0, deadline - time.perf_counter()))
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    stop = True
+                    break
+                batch.append(nxt)
+                pairs += len(nxt.pairs)
+            self._flush(batch)
+            if stop:
+                return
+
+    def _flush(self, batch: list[_Job]) -> None:
+        now = time.perf_counter()
+        with self._lock:
+            self._depth -= len(batch)
+            self._batches += 1
+            self._requests += len(batch)
+            self._pairs += sum(len(j.pairs) for j in batch)
+            self._wait += sum(now - j.queued for j in batch)
+        live = [j for j in batch if j.future.set_running_or_notify_cancel()]  # drop cancelled callers
+        if not live:
+            return
+        try:
+            scores = self._rerank.score_pairs([p for j in live for p in j.pairs])
+        except Exception as exc:
+            logger.exception("batched rerank failed")
+            for j in live:
+                j.future.set_exception(exc)
+            return
+        lo = 0
+        for j in live:
+            j.future.set_result(scores[lo : lo + len(j.pairs)])
+            lo += len(j.pairs)
+
+
+def _ranked(chunks: Sequence[Chunk], scores: Sequence[float], top_n: int) -> list[Chunk]:
+    ranked = sorted(zip(chunks, scores), key=lambda x: x[1], reverse=True)[:top_n]
+    return [c for c, _ in ranked]
+
+
+def _resolve(model: str, model_file: str) -> tuple[str, str]:
+    """(onnx path, tokenizer.json path) from a local export dir or a Hub repo id."""
+    local = Path(model)
+    if local.is_dir():
+        return str(local / model_file), str(local / "tokenizer.json")
+    from huggingface_hub import hf_hub_download
 
-        ranked = sorted(zip(chunks, scores), key=lambda x: x[1], reverse=True)[:top_n]
-        return [c for c, _ in ranked]
+    return hf_hub_download(model, model_file), hf_hub_download(model, "tokenizer.json")
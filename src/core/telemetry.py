@@ -0,0 +1,159 @@
+from __future__ import annotations
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, ClassVar, ContextManager, Iterator
+import logging
+import os
+import time
+from src import config
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+
+
+@dataclass(slots=True)
+class Span:
+    """One timed stage; `set` attaches sizes (tokens, candidates, ...) as it runs."""
+
+    stage: str
+    attrs: dict[str, Any] = field(default_factory=dict)
+    ms: float = 0.0
+    recording: ClassVar[bool] = True  # guard for sizes that cost something to compute
+
+    def set(self, **attrs: Any) -> None:
+        self.attrs.update(attrs)
+
+    def dict(self) -> dict[str, Any]:
+        return {"stage": self.stage, "ms": round(self.ms, 1), **self.attrs}
+
+
+class _NoSpan:
+    __slots__ = ()
+    recording: ClassVar[bool] = False
+
+    def set(self, **attrs: Any) -> None:
+        pass
+
+
+# spans of the request being traced (trace=True), else None
+_collected: ContextVar[list[Span] | None] = ContextVar("rag_spans", default=None)
+_DISABLED = nullcontext(_NoSpan())
+
+
+def span(stage: str, **attrs: Any) -> ContextManager[Span | _NoSpan]:
+    """
+    Time a stage into the `rag_stage_seconds` histogram, the OpenTelemetry
+    tracer when OTEL_SPANS is on, and the current `collect()` block. With
+    all three off this is one context-variable read and a shared no-op.
+    """
+    spans = _collected.get()
+    if spans is None and _metrics is None and _tracer is None:
+        return _DISABLED
+    return _live(Span(stage, attrs), spans)
+
+
+def record(stage: str, ms: float, **attrs: Any) -> None:
+    """
+    A duration measured elsewhere, such as time to first token, into the
+    same histogram and `collect()` block as spans (not the OTel tracer:
+    it has no span of its own).
+    """
+    spans = _collected.get()
+    if spans is None and _metrics is None:
+        return
+    s = Span(stage, attrs, ms)
+    if spans is not None:
+        spans.append(s)
+    if _metrics is not None:
+        _observe(s)
+
+
+@contextmanager
+def collect() -> Iterator[list[Span]]:
+    """Gather the spans opened in this block (and the tasks it starts) for a traced response."""
+    spans: list[Span] = []
+    token = _collected.set(spans)
+    try:
+        yield spans
+    finally:
+        try:
+            _collected.reset(token)
+        except ValueError:  # an async generator finalised from another context
+            pass
+
+
+def metrics_payload() -> tuple[bytes, str] | None:
+    """(body, content type) for a /metrics scrape; None when metrics are off."""
+    if _metrics is None:
+        return None
+    from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest
+
+    registry = REGISTRY
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):  # one registry across uvicorn/gunicorn workers
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+@contextmanager
+def _live(s: Span, spans: list[Span] | None) -> Iterator[Span]:
+    otel = _tracer.start_as_current_span(s.stage) if _tracer is not None else nullcontext()
+    start = time.perf_counter()
+    with otel as native:
+        try:
+            yield s
+        except BaseException as exc:
+            s.set(error=type(exc).__name__)
+            raise
+        finally:
+            s.ms = (time.perf_counter() - start) * 1000
+            if spans is not None:
+                spans.append(s)
+            if _metrics is not None:
+                _observe(s)
+            if native is not None:
+                native.set_attributes({k: v for k, v in s.attrs.items() if isinstance(v, (str, bool, int, float))})
+
+
+def _observe(s: Span) -> None:
+    seconds, sizes = _metrics  # type: ignore[misc]
+    seconds.labels(s.stage).observe(s.ms / 1000)
+    for name, value in s.attrs.items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            sizes.labels(s.stage, name).observe(value)
+
+
+def _prometheus() -> tuple[Any, Any] | None:
+    try:
+        from prometheus_client import Histogram
+    except ImportError:
+        logger.warning("prometheus_client is not installed; stage metrics are off")
+        return None
+    return (
+        Histogram("rag_stage_seconds", "Latency of each pipeline stage", ["stage"], buckets=_LATENCY_BUCKETS),
+        Histogram(
+            "rag_stage_size",
+            "Sizes recorded on stage spans: tokens, candidates, chunks",
+            ["stage", "field"],
+            buckets=_SIZE_BUCKETS,
+        ),
+    )
+
+
+def _otel_tracer() -> Any | None:
+    try:
+        from opentelemetry import trace
+    except ImportError:
+        logger.warning("opentelemetry-api is not installed; OTEL_SPANS is ignored")
+        return None
+    return trace.get_tracer("rag")  # exporters come from the SDK setup, e.g. opentelemetry-instrument
+
+
+_metrics = _prometheus() if config.METRICS else None
+_tracer = _otel_tracer() if config.OTEL_SPANS else None
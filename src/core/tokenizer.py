@@ -0,0 +1,27 @@
+from __future__ import annotations
+from functools import lru_cache
+import numpy as np
+import tiktoken
+
+
+@lru_cache(maxsize=1)
+def tokenizer() -> tiktoken.Encoding:
+    """cl100k_base, loaded on first use: get_encoding may download the BPE file."""
+    return tiktoken.get_encoding("cl100k_base")
+
+
+@lru_cache(maxsize=1)
+def token_byte_lengths() -> np.ndarray:
+    """UTF-8 byte length of every token id (0 for unused ids), for offset arithmetic."""
+    enc = tokenizer()
+    lengths = np.zeros(enc.n_vocab, dtype=np.int64)
+    for token, raw in enumerate(map(_token_bytes, range(enc.n_vocab))):
+        lengths[token] = len(raw)
+    return lengths
+
+
+def _token_bytes(token: int) -> bytes:
+    try:
+        return tokenizer().decode_single_token_bytes(token)
+    except KeyError:  # gaps in the special-token id range
+        return b""
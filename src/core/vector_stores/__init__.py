@@ -1,5 +1,18 @@
-from .pinecone_store import PineconeVectorStore
-from .chroma_store import ChromaVectorStore
+from importlib import import_module
 from .base import BaseVectorStore
 
-__all__ = ["PineconeVectorStore", "ChromaVectorStore", "BaseVectorStore"]
+# backends import their SDKs (pinecone, chromadb) on first access, not with the package
+_BACKENDS = {
+    "PineconeVectorStore": ".pinecone_store",
+    "ChromaVectorStore": ".chroma_store",
+    "NumpyVectorStore": ".numpy_store",
+}
+
+
+def __getattr__(name: str):
+    if name in _BACKENDS:
+        return getattr(import_module(_BACKENDS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+__all__ = ["PineconeVectorStore", "ChromaVectorStore", "NumpyVectorStore", "BaseVectorStore"]
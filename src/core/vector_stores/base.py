@@ -1,20 +1,41 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
-from typing import Iterable, Protocol, Sequence
+from typing import Awaitable, Callable, Iterable, Protocol, Sequence
+import asyncio
+import functools
+import inspect
 import logging
-from core.schema import Chunk, DocumentBatch
+from core.schema import Chunk, DocumentBatch, ScoredChunk
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+Vectors = Sequence[Sequence[float]]
+
 
 class EmbeddingModel(Protocol):
-    def embed_texts(self, texts: Sequence[str]) -> Sequence[Sequence[float]]: ...
+    def embed_texts(self, texts: Sequence[str]) -> Vectors | Awaitable[Vectors]: ...
 
 
 class BaseVectorStore(ABC):
+    """
+    Sync methods serve offline callers (CLI, scripts). The `*_async`
+    methods are what request handlers use; the defaults below push the
+    sync method onto the default executor, and stores override them with
+    native implementations that never start a nested event loop.
+    """
+
     def __init__(self, embedding: EmbeddingModel) -> None:
         self._embedding = embedding
+        self._listeners: list[Callable[[str], None]] = []
+
+    def on_change(self, callback: Callable[[str], None]) -> None:
+        """Register `callback(namespace)`, fired after every upsert or delete."""
+        self._listeners.append(callback)
+
+    def _changed(self, namespace: str) -> None:
+        for callback in self._listeners:
+            callback(namespace)
 
     @abstractmethod
     def upsert(self, batch: DocumentBatch, namespace: str) -> None: ...
@@ -24,3 +45,49 @@ class BaseVectorStore(ABC):
 
     @abstractmethod
     def delete(self, ids: Iterable[str], namespace: str) -> None: ...
+
+    def query_many(self, texts: Sequence[str], namespace: str, k: int = 6) -> list[list[ScoredChunk]]:
+        """Results per text. Stores override this to embed once and search in one pass."""
+        return [[ScoredChunk(c, None) for c in self.query(t, namespace, k)] for t in texts]
+
+    # ── Async API ──────────────────────────────────────────────────
+    async def upsert_async(self, batch: DocumentBatch, namespace: str) -> None:
+        await self._in_executor(self.upsert, batch, namespace)
+
+    async def upsert_vectors_async(self, chunks: Sequence[Chunk], embeds: Vectors, namespace: str) -> None:
+        """Write chunks whose embeddings were computed by the caller (bulk ingestion)."""
+        raise NotImplementedError(f"{type(self).__name__} cannot store precomputed embeddings")
+
+    async def query_async(self, query_text: str, namespace: str, k: int = 6) -> list[Chunk]:
+        return await self._in_executor(self.query, query_text, namespace, k)
+
+    async def delete_async(self, ids: Iterable[str], namespace: str) -> None:
+        await self._in_executor(self.delete, list(ids), namespace)
+
+    async def query_many_async(
+        self, texts: Sequence[str], namespace: str, k: int = 6, embeds: Vectors | None = None
+    ) -> list[list[ScoredChunk]]:
+        """
+        Results per text. `embeds` are the texts' embeddings when the caller
+        already has them; stores that search by text ignore them.
+        """
+        results = await asyncio.gather(*(self.query_async(t, namespace, k) for t in texts))
+        return [[ScoredChunk(c, None) for c in res] for res in results]
+
+    async def aclose(self) -> None:
+        """Release connections bound to the running loop."""
+
+    # ── Embedding bridges ──────────────────────────────────────────
+    async def _embed_async(self, texts: Sequence[str]) -> Vectors:
+        out = self._embedding.embed_texts(texts)
+        return await out if inspect.isawaitable(out) else out
+
+    def _embed(self, texts: Sequence[str]) -> Vectors:
+        """Sync bridge for offline callers; must not be used inside a running loop."""
+        out = self._embedding.embed_texts(texts)
+        return asyncio.run(out) if inspect.isawaitable(out) else out  # type: ignore[arg-type]
+
+    @staticmethod
+    async def _in_executor(fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(fn, *args))
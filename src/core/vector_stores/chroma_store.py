@@ -4,62 +4,116 @@ import logging
 import chromadb
 import asyncio
 from core.vector_stores.base import BaseVectorStore, EmbeddingModel
-from core.schema import Chunk, DocumentBatch
+from core.schema import Chunk, DocumentBatch, ScoredChunk
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 
 class ChromaVectorStore(BaseVectorStore):
+    """
+    Embedded (PersistentClient) Chroma has no async API, so the async
+    methods await the embedding on the caller's loop and only hop to a
+    worker thread for the local collection call itself.
+    """
+
     def __init__(self, embedding: EmbeddingModel, path: str = ".chroma") -> None:
         super().__init__(embedding)
         self._client = chromadb.PersistentClient(path=path)
         self._collection = self._client.get_or_create_collection("rag")
 
-    # ── Ingest (sync – runs offline) ───────────────────────────────
+    # ── Ingest ─────────────────────────────────────────────────────
     def upsert(self, batch: DocumentBatch, namespace: str) -> None:
-        ids = [c.id for c in batch.chunks]
-        present = set(self._existing_ids(ids))
-        new_chunks = [c for c in batch.chunks if c.id not in present]
+        new_chunks = self._new_chunks(batch)
+        if not new_chunks:
+            return
+        embeds = self._embed([c.text for c in new_chunks])
+        self._write(new_chunks, embeds, namespace)
+        self._changed(namespace)
+
+    async def upsert_async(self, batch: DocumentBatch, namespace: str) -> None:
+        new_chunks = await asyncio.to_thread(self._new_chunks, batch)
         if not new_chunks:
             return
+        embeds = await self._embed_async([c.text for c in new_chunks])
+        await self.upsert_vectors_async(new_chunks, embeds, namespace)
+
+    async def upsert_vectors_async(
+        self, chunks: Sequence[Chunk], embeds: Sequence[Sequence[float]], namespace: str
+    ) -> None:
+        await asyncio.to_thread(self._write, list(chunks), embeds, namespace)
+        self._changed(namespace)
+
+    # ── Retrieval ──────────────────────────────────────────────────
+    def query(self, query_text: str, namespace: str, k: int = 6) -> list[Chunk]:
+        return [h.chunk for h in self.query_many([query_text], namespace, k)[0]]
+
+    async def query_async(self, query_text: str, namespace: str, k: int = 6) -> list[Chunk]:
+        return [h.chunk for h in (await self.query_many_async([query_text], namespace, k))[0]]
+
+    def query_many(self, texts: Sequence[str], namespace: str, k: int = 6) -> list[list[ScoredChunk]]:
+        if not texts:
+            return []
+        return self._search(self._embed(texts), k)
+
+    async def query_many_async(
+        self, texts: Sequence[str], namespace: str, k: int = 6, embeds: Sequence[Sequence[float]] | None = None
+    ) -> list[list[ScoredChunk]]:
+        if not texts:
+            return []
+        if embeds is None:
+            embeds = await self._embed_async(texts)
+        return await asyncio.to_thread(self._search, embeds, k)
+
+    def delete(self, ids: Iterable[str], namespace: str) -> None:
+        self._collection.delete(ids=list(ids))
+        self._changed(namespace)
+
+    async def delete_async(self, ids: Iterable[str], namespace: str) -> None:
+        await asyncio.to_thread(self.delete, list(ids), namespace)
+
+    # ── Helpers ────────────────────────────────────────────────────
+    def _new_chunks(self, batch: DocumentBatch) -> list[Chunk]:
+        present = set(self._existing_ids([c.id for c in batch.chunks]))
+        return [c for c in batch.chunks if c.id not in present]
 
-        embeds = asyncio.run(self._embedding.embed_texts([c.text for c in new_chunks]))
+    def _write(self, chunks: list[Chunk], embeds: Sequence[Sequence[float]], namespace: str) -> None:
         metas = [
-            {"source": c.source, "index": c.index, "namespace": namespace}
-            for c in new_chunks
+            {"source": c.source, "index": c.index, "namespace": namespace, **c.pages()}
+            for c in chunks
         ]
         self._collection.upsert(
-            ids=[c.id for c in new_chunks],
+            ids=[c.id for c in chunks],
             embeddings=embeds,
             metadatas=metas,
-            documents=[c.text for c in new_chunks],
+            documents=[c.text for c in chunks],
         )
 
-    # ── Retrieval (async wrapper) ──────────────────────────────────
-    def query(self, query_text: str, namespace: str, k: int = 6) -> list[Chunk]:
-        emb = asyncio.run(self._embedding.embed_texts([query_text]))[0]
-        res = self._collection.query(query_embeddings=[emb], n_results=k)
-        out: list[Chunk] = []
-        for i, cid in enumerate(res["ids"][0]):
-            meta = res["metadatas"][0][i]
-            out.append(
-                Chunk(
+    def _search(self, embeds: Sequence[Sequence[float]], k: int) -> list[list[ScoredChunk]]:
+        # one request for every query vector
+        res = self._collection.query(
+            query_embeddings=list(embeds),
+            n_results=k,
+            include=["documents", "metadatas", "distances"],
+        )
+        space = (self._collection.metadata or {}).get("hnsw:space", "l2")
+        out: list[list[ScoredChunk]] = []
+        for q, ids in enumerate(res["ids"]):
+            hits: list[ScoredChunk] = []
+            for i, cid in enumerate(ids):
+                meta = res["metadatas"][q][i]
+                chunk = Chunk(
                     id=cid,
-                    text=res["documents"][0][i],
+                    text=res["documents"][q][i],
                     index=meta["index"],
                     source=meta["source"],
+                    page_start=meta.get("page_start"),
+                    page_end=meta.get("page_end"),
                 )
-            )
+                hits.append(ScoredChunk(chunk, _similarity(res["distances"][q][i], space)))
+            out.append(hits)
         return out
 
-    async def query_async(self, query_text: str, namespace: str, k: int = 6) -> list[Chunk]:
-        loop = asyncio.get_running_loop()
-        return await loop.run_in_executor(
-            None, lambda: self.query(query_text, namespace, k)
-        )
-
-    # ── Helpers ────────────────────────────────────────────────────
     def _existing_ids(self, ids: list[str]) -> list[str]:
         out: list[str] = []
         for i in range(0, len(ids), 100):
@@ -67,5 +121,7 @@ class ChromaVectorStore(BaseVectorStore):
             out.extend(res["ids"])
         return out
 
-    def delete(self, ids: Iterable[str], namespace: str) -> None:
-        self._collection.delete(ids=list(ids))
+
+def _similarity(distance: float, space: str) -> float:
+    # map Chroma distances onto cosine similarity for unit-norm embeddings
+    return 1.0 - distance / 2.0 if space == "l2" else 1.0 - distance
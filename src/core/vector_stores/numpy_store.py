@@ -0,0 +1,422 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Sequence
+from urllib.parse import quote
+import asyncio
+import json
+import logging
+import os
+import threading
+import numpy as np
+from core.vector_stores.base import BaseVectorStore, EmbeddingModel
+from core.schema import Chunk, DocumentBatch, ScoredChunk
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+_BLOCK = 65_536  # rows scored per matmul, bounds the float32 working set
+
+
+class NumpyVectorStore(BaseVectorStore):
+    """
+    In-process store: one directory per namespace (its name percent-encoded,
+    so any namespace stays inside `path`) holding append-only
+    segments. Each segment is a memory-mapped (rows, dim) matrix of
+    L2-normalised vectors plus a JSONL sidecar with ids and metadata, so
+    several worker processes share the same pages through the OS cache.
+
+    Upserts append a segment; deletes and overwrites only tombstone rows.
+    Once there are too many segments or too many dead rows, a background
+    thread merges the live rows into one segment, building an IVF index
+    (spherical k-means lists) when it holds `ivf_threshold` rows or more.
+    A single writer process per namespace is assumed.
+    """
+
+    def __init__(
+        self,
+        embedding: EmbeddingModel,
+        path: str = ".vectors",
+        dtype: str = "float32",
+        ivf_threshold: int = 100_000,
+        nprobe: int = 8,
+        max_segments: int = 8,
+        background_compaction: bool = True,
+    ) -> None:
+        super().__init__(embedding)
+        if dtype not in ("float32", "float16"):
+            raise ValueError(f"unsupported dtype {dtype}")
+        self._root = Path(path)
+        self._dtype = dtype
+        self._ivf_threshold = ivf_threshold
+        self._nprobe = nprobe
+        self._max_segments = max_segments
+        self._background = background_compaction
+        self._spaces: dict[str, _Namespace] = {}
+        self._guard = threading.Lock()
+
+    # ── Ingest ─────────────────────────────────────────────────────
+    def upsert(self, batch: DocumentBatch, namespace: str) -> None:
+        chunks = list({c.id: c for c in batch.chunks}.values())
+        if chunks:
+            self._append(namespace, chunks, self._embed([c.text for c in chunks]))
+
+    async def upsert_async(self, batch: DocumentBatch, namespace: str) -> None:
+        chunks = list({c.id: c for c in batch.chunks}.values())
+        if chunks:
+            embeds = await self._embed_async([c.text for c in chunks])
+            await self.upsert_vectors_async(chunks, embeds, namespace)
+
+    async def upsert_vectors_async(
+        self, chunks: Sequence[Chunk], embeds: Sequence[Sequence[float]], namespace: str
+    ) -> None:
+        await asyncio.to_thread(self._append, namespace, list(chunks), embeds)
+
+    def delete(self, ids: Iterable[str], namespace: str) -> None:
+        self._space(namespace).delete(ids)
+        self._changed(namespace)
+
+    async def delete_async(self, ids: Iterable[str], namespace: str) -> None:
+        await asyncio.to_thread(self.delete, list(ids), namespace)
+
+    # ── Retrieval ──────────────────────────────────────────────────
+    def query(self, query_text: str, namespace: str, k: int = 6) -> list[Chunk]:
+        return [h.chunk for h in self.query_many([query_text], namespace, k)[0]]
+
+    async def query_async(self, query_text: str, namespace: str, k: int = 6) -> list[Chunk]:
+        return [h.chunk for h in (await self.query_many_async([query_text], namespace, k))[0]]
+
+    def query_many(self, texts: Sequence[str], namespace: str, k: int = 6) -> list[list[ScoredChunk]]:
+        if not texts:
+            return []
+        return self._search(namespace, self._embed(texts), k)
+
+    async def query_many_async(
+        self, texts: Sequence[str], namespace: str, k: int = 6, embeds: Sequence[Sequence[float]] | None = None
+    ) -> list[list[ScoredChunk]]:
+        if not texts:
+            return []
+        if embeds is None:
+            embeds = await self._embed_async(texts)
+        # numpy releases the GIL in matmul, so concurrent searches overlap
+        return await asyncio.to_thread(self._search, namespace, embeds, k)
+
+    # ── Maintenance ────────────────────────────────────────────────
+    def compact(self, namespace: str) -> None:
+        """Synchronously merge all segments of `namespace`."""
+        self._space(namespace).compact(self._ivf_threshold)
+
+    # ── Helpers ────────────────────────────────────────────────────
+    def _space(self, namespace: str) -> _Namespace:
+        with self._guard:
+            ns = self._spaces.get(namespace)
+            if ns is None:
+                ns = self._spaces[namespace] = _Namespace(self._root / _dirname(namespace), self._dtype)
+            return ns
+
+    def _append(self, namespace: str, chunks: list[Chunk], embeds: Sequence[Sequence[float]]) -> None:
+        logger.info("upserting %s chunks to %s", len(chunks), namespace)
+        ns = self._space(namespace)
+        ns.append(chunks, np.asarray(embeds, dtype=np.float32))
+        self._changed(namespace)
+        if ns.needs_compaction(self._max_segments):
+            self._compact(ns)
+
+    def _search(
+        self, namespace: str, embeds: Sequence[Sequence[float]], k: int
+    ) -> list[list[ScoredChunk]]:
+        ns = self._space(namespace)
+        ns.refresh()
+        return ns.search(np.asarray(embeds, dtype=np.float32), k, self._nprobe)
+
+    def _compact(self, ns: _Namespace) -> None:
+        if not self._background:
+            ns.compact(self._ivf_threshold)
+        elif ns.claim_compaction():
+            threading.Thread(
+                target=ns.compact, args=(self._ivf_threshold, True), daemon=True
+            ).start()
+
+
+@dataclass(slots=True)
+class _Ivf:
+    centroids: np.ndarray  # (nlist, dim) float32, unit norm
+    order: np.ndarray  # row numbers grouped by list
+    offsets: np.ndarray  # (nlist + 1,) slice bounds into `order`
+
+    def candidates(self, q: np.ndarray, nprobe: int) -> np.ndarray:
+        probe = _top_k(self.centroids @ q, nprobe)
+        return np.concatenate([self.order[self.offsets[c] : self.offsets[c + 1]] for c in probe])
+
+
+@dataclass(slots=True)
+class _Segment:
+    name: str
+    vectors: np.ndarray  # read-only memmap (rows, dim)
+    ids: list[str]
+    metas: list[dict]
+    alive: np.ndarray  # bool (rows,), replaced (never mutated) on delete
+    ivf: _Ivf | None = None
+
+
+class _Namespace:
+    def __init__(self, path: Path, dtype: str) -> None:
+        self._path = path
+        self._dtype = dtype
+        self._lock = threading.RLock()
+        self._compacting = False
+        self._mtime = -1
+        self._dim = 0
+        self._next = 0
+        self._segments: list[_Segment] = []
+        self._where: dict[str, tuple[_Segment, int]] = {}
+        self.refresh()  # the directory is created by the first write, never by a read
+
+    # ── State on disk ──────────────────────────────────────────────
+    @property
+    def _manifest(self) -> Path:
+        return self._path / "manifest.json"
+
+    def refresh(self) -> None:
+        """Reload if another process rewrote the manifest."""
+        try:
+            mtime = self._manifest.stat().st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            data = json.loads(self._manifest.read_text())
+            self._dim, self._next = data["dim"], data["next"]
+            self._dtype = data["dtype"]  # fixed when the namespace was created
+            loaded = {s.name: s for s in self._segments}
+            segments = []
+            for entry in data["segments"]:
+                seg = loaded.get(entry["name"]) or self._open(entry["name"], entry["rows"])
+                alive = np.ones(entry["rows"], dtype=bool)
+                alive[entry["dead"]] = False
+                seg.alive = alive
+                segments.append(seg)
+            self._install(segments)
+            self._mtime = mtime
+
+    def _open(self, name: str, rows: int) -> _Segment:
+        vectors = np.memmap(
+            self._path / f"{name}.vec", dtype=self._dtype, mode="r", shape=(rows, self._dim)
+        )
+        ids, metas = [], []
+        with open(self._path / f"{name}.jsonl", encoding="utf-8") as fh:
+            for line in fh:
+                meta = json.loads(line)
+                ids.append(meta.pop("id"))
+                metas.append(meta)
+        ivf = None
+        if (self._path / f"{name}.ivf.npz").exists():
+            npz = np.load(self._path / f"{name}.ivf.npz")
+            ivf = _Ivf(npz["centroids"], npz["order"], npz["offsets"])
+        return _Segment(name, vectors, ids, metas, np.ones(rows, dtype=bool), ivf)
+
+    def _write_segment(self, vectors: np.ndarray, chunks: Sequence[dict], ivf: _Ivf | None) -> _Segment:
+        name = f"seg-{self._next:06d}"
+        self._next += 1
+        self._path.mkdir(parents=True, exist_ok=True)
+        tmp = self._path / f"{name}.vec.tmp"
+        vectors.astype(self._dtype).tofile(tmp)
+        with open(self._path / f"{name}.jsonl", "w", encoding="utf-8") as fh:
+            for meta in chunks:
+                fh.write(json.dumps(meta) + "\n")
+        if ivf is not None:
+            np.savez(self._path / f"{name}.ivf.npz", centroids=ivf.centroids, order=ivf.order, offsets=ivf.offsets)
+        os.replace(tmp, self._path / f"{name}.vec")
+        return self._open(name, len(chunks))
+
+    def _save(self) -> None:
+        data = {
+            "dim": self._dim,
+            "dtype": self._dtype,
+            "next": self._next,
+            "segments": [
+                {"name": s.name, "rows": len(s.ids), "dead": np.flatnonzero(~s.alive).tolist()}
+                for s in self._segments
+            ],
+        }
+        self._path.mkdir(parents=True, exist_ok=True)
+        tmp = self._manifest.with_suffix(".tmp")
+        tmp.write_text(json.dumps(data))
+        os.replace(tmp, self._manifest)
+        self._mtime = self._manifest.stat().st_mtime_ns
+
+    def _install(self, segments: list[_Segment]) -> None:
+        self._segments = segments
+        self._where = {
+            seg.ids[row]: (seg, row)
+            for seg in segments
+            for row in np.flatnonzero(seg.alive).tolist()
+        }
+
+    # ── Writes ─────────────────────────────────────────────────────
+    def append(self, chunks: Sequence[Chunk], embeds: np.ndarray) -> None:
+        with self._lock:
+            self.refresh()
+            if not self._dim:
+                self._dim = embeds.shape[1]
+            if embeds.shape[1] != self._dim:
+                raise ValueError(f"dimension {embeds.shape[1]} != namespace dimension {self._dim}")
+            self._kill([c.id for c in chunks])
+            metas = [
+                {"id": c.id, "text": c.text, "index": c.index, "source": c.source, **c.pages()} for c in chunks
+            ]
+            seg = self._write_segment(_normalise(embeds), metas, None)
+            self._install(self._segments + [seg])
+            self._save()
+
+    def delete(self, ids: Iterable[str]) -> None:
+        with self._lock:
+            self.refresh()
+            if self._kill(list(ids)):
+                self._save()
+
+    def _kill(self, ids: list[str]) -> int:
+        by_seg: dict[str, list[int]] = {}
+        for cid in ids:
+            hit = self._where.pop(cid, None)
+            if hit:
+                by_seg.setdefault(hit[0].name, []).append(hit[1])
+        for seg in self._segments:
+            if seg.name in by_seg:
+                alive = seg.alive.copy()  # readers may hold the old mask
+                alive[by_seg[seg.name]] = False
+                seg.alive = alive
+        return sum(len(v) for v in by_seg.values())
+
+    # ── Compaction ─────────────────────────────────────────────────
+    def needs_compaction(self, max_segments: int) -> bool:
+        total = sum(len(s.ids) for s in self._segments)
+        dead = total - len(self._where)
+        return len(self._segments) > max_segments or (total > 0 and dead / total > 0.3)
+
+    def claim_compaction(self) -> bool:
+        with self._lock:
+            if self._compacting:
+                return False
+            self._compacting = True
+            return True
+
+    def compact(self, ivf_threshold: int, claimed: bool = False) -> None:
+        if not claimed and not self.claim_compaction():
+            return
+        try:
+            with self._lock:
+                snapshot = [(s, s.alive) for s in self._segments]
+            rows = [(s, np.flatnonzero(alive)) for s, alive in snapshot]
+            n = sum(len(r) for _, r in rows)
+            vectors = np.empty((n, self._dim), dtype=np.float32)
+            metas: list[dict] = []
+            pos = 0
+            for seg, live in rows:
+                vectors[pos : pos + len(live)] = seg.vectors[live]
+                metas.extend({"id": seg.ids[r], **seg.metas[r]} for r in live.tolist())
+                pos += len(live)
+            ivf = _build_ivf(vectors) if n >= ivf_threshold else None
+
+            with self._lock:
+                # rows deleted or overwritten while we were merging stay dead
+                still = np.concatenate(
+                    [s.alive[live] for s, live in rows] or [np.zeros(0, dtype=bool)]
+                )
+                merged = self._write_segment(vectors, metas, ivf) if n else None
+                if merged is not None:
+                    merged.alive = still
+                done = {s.name for s, _ in snapshot}
+                rest = [s for s in self._segments if s.name not in done]
+                self._install(([merged] if merged is not None else []) + rest)
+                self._save()
+            for name in done:
+                for suffix in (".vec", ".jsonl", ".ivf.npz"):
+                    (self._path / f"{name}{suffix}").unlink(missing_ok=True)
+            logger.info("compacted %s: %s segments -> %s rows", self._path.name, len(done), n)
+        finally:
+            self._compacting = False
+
+    # ── Search ─────────────────────────────────────────────────────
+    def search(self, queries: np.ndarray, k: int, nprobe: int) -> list[list[ScoredChunk]]:
+        """Top-k for each row of `queries` (nq, dim); flat segments score all queries in one matmul."""
+        queries = _normalise(queries)
+        hits: list[list[tuple[float, _Segment, int]]] = [[] for _ in queries]
+        for seg in list(self._segments):
+            alive = seg.alive
+            if seg.ivf is not None:
+                for qi, q in enumerate(queries):
+                    rows = seg.ivf.candidates(q, nprobe)
+                    rows = rows[alive[rows]]
+                    scores = np.asarray(seg.vectors[rows], dtype=np.float32) @ q
+                    hits[qi].extend((float(scores[i]), seg, int(rows[i])) for i in _top_k(scores, k))
+                continue
+            for lo in range(0, len(seg.ids), _BLOCK):
+                block = np.asarray(seg.vectors[lo : lo + _BLOCK], dtype=np.float32)
+                scores = block @ queries.T  # (rows, nq)
+                scores[~alive[lo : lo + _BLOCK]] = -np.inf
+                for qi in range(len(queries)):
+                    col = scores[:, qi]
+                    hits[qi].extend(
+                        (float(col[i]), seg, lo + int(i)) for i in _top_k(col, k) if col[i] != -np.inf
+                    )
+        out: list[list[ScoredChunk]] = []
+        for per_query in hits:
+            per_query.sort(key=lambda h: h[0], reverse=True)
+            out.append([
+                ScoredChunk(
+                    Chunk(id=seg.ids[row], text=seg.metas[row]["text"], index=seg.metas[row]["index"],
+                          source=seg.metas[row]["source"], page_start=seg.metas[row].get("page_start"),
+                          page_end=seg.metas[row].get("page_end")),
+                    score,
+                )
+                for score, seg, row in per_query[:k]
+            ])
+        return out
+
+
+def _dirname(namespace: str) -> str:
+    """`namespace` as one path component: "/" and "%" are escaped, "", "." and ".." refused."""
+    name = quote(namespace, safe="")
+    if name in ("", ".", ".."):
+        raise ValueError(f"invalid namespace {namespace!r}")
+    return name
+
+
+def _normalise(m: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(m, axis=1, keepdims=True)
+    return m / np.where(norms == 0, 1, norms)
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    if k <= 0:
+        return np.zeros(0, dtype=np.intp)
+    if k >= len(scores):
+        idx = np.arange(len(scores))
+    else:
+        idx = np.argpartition(-scores, k - 1)[:k]
+    return idx[np.argsort(-scores[idx])]
+
+
+def _build_ivf(vectors: np.ndarray, iters: int = 10, seed: int = 0) -> _Ivf:
+    """Spherical k-means over a sample, then assign every row to its nearest list."""
+    n = len(vectors)
+    nlist = int(min(4096, max(16, np.sqrt(n))))
+    rng = np.random.default_rng(seed)
+    sample = vectors[rng.choice(n, size=min(n, nlist * 64), replace=False)]
+    centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+    for _ in range(iters):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        empty = np.bincount(assign, minlength=nlist) == 0
+        sums[empty] = centroids[empty]
+        centroids = _normalise(sums)
+
+    assign = np.concatenate(
+        [np.argmax(vectors[lo : lo + _BLOCK] @ centroids.T, axis=1) for lo in range(0, n, _BLOCK)]
+    )
+    order = np.argsort(assign, kind="stable")
+    offsets = np.searchsorted(assign[order], np.arange(nlist + 1))
+    return _Ivf(centroids.astype(np.float32), order, offsets)
@@ -1,21 +1,67 @@
 from __future__ import annotations
-from typing import Iterable, Sequence, Any
+from dataclasses import dataclass
+from typing import Any, Awaitable, Iterable, Iterator, Sequence
+import asyncio
+import json
 import logging
+import time
+import weakref
 from pinecone import Pinecone, ServerlessSpec
+from core import telemetry
+from core.docstore import DocStore
 from core.vector_stores.base import BaseVectorStore, EmbeddingModel
-from core.schema import Chunk, DocumentBatch
+from core.schema import Chunk, DocumentBatch, ScoredChunk
 from src import config  # type: ignore
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+Vector = tuple[str, Sequence[float], dict]
+
+_FLOAT_BYTES = 24  # upper bound for one JSON-encoded float and its separator
+_VECTOR_OVERHEAD = 64  # keys and punctuation around one vector
+_REQUEST_OVERHEAD = 256  # namespace and envelope
+
+
+@dataclass(slots=True)
+class UpsertStats:
+    vectors: int = 0
+    batches: int = 0
+    retries: int = 0
+    seconds: float = 0.0
+
+    @property
+    def per_s(self) -> float:
+        return self.vectors / self.seconds if self.seconds else 0.0
+
 
 class PineconeVectorStore(BaseVectorStore):
-    _MAX_BATCH = 80
+    """
+    Upserts run as a pipeline: chunks are embedded in groups of
+    PINECONE_UPSERT_EMBED_BATCH and each group is sent as soon as its
+    embeddings arrive, so embedding overlaps writing. Requests are packed
+    up to PINECONE_UPSERT_MAX_BYTES of estimated payload (the API rejects
+    bodies over 2 MB; chunk text rides in the metadata) and at most
+    PINECONE_UPSERT_MAX_VECTORS vectors, `upsert_concurrency` in flight; a
+    request failing with 429, a 5xx or a transport error is retried on its
+    own with backoff, any other error fails the upsert at once.
+
+    With a `docstore`, chunk text lives there instead of in the vector
+    metadata: each group is written to the docstore before its vectors,
+    and query hits are hydrated with one docstore lookup per call. Hits
+    on vectors written without a docstore still read their metadata text.
+    """
 
-    def __init__(self, embedding: EmbeddingModel) -> None:
+    def __init__(
+        self,
+        embedding: EmbeddingModel,
+        pc: Any | None = None,
+        upsert_concurrency: int | None = None,
+        docstore: DocStore | None = None,
+    ) -> None:
         super().__init__(embedding)
-        self._pc = Pinecone(api_key=config.PINECONE_API_KEY)  # pyright: ignore
+        self._docstore = docstore
+        self._pc = pc or Pinecone(api_key=config.PINECONE_API_KEY)  # pyright: ignore
         if config.PINECONE_INDEX not in self._pc.list_indexes().names():
             self._pc.create_index(
                 name=config.PINECONE_INDEX,
@@ -24,47 +70,262 @@ class PineconeVectorStore(BaseVectorStore):
                 spec=ServerlessSpec(cloud="aws", region="us-west-2"),
             )
         self._index: Any = self._pc.Index(config.PINECONE_INDEX)
+        self._host: str | None = None
+        # the asyncio index owns an aiohttp session bound to one loop
+        self._async_indexes: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+        self._concurrency = upsert_concurrency or config.PINECONE_UPSERT_CONCURRENCY
+
+    # ── Sync API (CLI / scripts) ───────────────────────────────────
+    def upsert(self, batch: DocumentBatch, namespace: str) -> UpsertStats:
+        """The async pipeline on a private loop (must not be called inside a running one)."""
 
-    def upsert(self, batch: DocumentBatch, namespace: str) -> None:
-        logger.info("upserting %s chunks to %s", len(batch.chunks), namespace)
-        vectors = self._build_vectors(batch.chunks)
-        if len(vectors) >= self._MAX_BATCH:
-            self._batched_upsert(vectors, namespace)
-        else:
-            self._index.upsert(vectors=vectors, namespace=namespace)
+        async def _run() -> UpsertStats:
+            try:
+                return await self.upsert_async(batch, namespace)
+            finally:
+                await self.aclose()
+
+        return asyncio.run(_run())
 
     def query(self, query_text: str, namespace: str, k: int = 6) -> list[Chunk]:
-        emb = self._embedding.embed_texts([query_text])[0]
-        res = self._index.query(vector=emb, top_k=k, namespace=namespace, include_metadata=True)
-        return [
-            Chunk(
-                id=str(m["id"]),
-                text=m["metadata"]["text"],
-                index=m["metadata"]["index"],
-                source=m["metadata"]["source"],
-            )
-            for m in res["matches"]
-        ]
+        return [h.chunk for h in self.query_many([query_text], namespace, k)[0]]
+
+    def query_many(self, texts: Sequence[str], namespace: str, k: int = 6) -> list[list[ScoredChunk]]:
+        if not texts:
+            return []
+        embeds = self._embed(texts)
+        with telemetry.span("store.query", queries=len(texts), k=k):
+            results = [
+                self._index.query(vector=emb, top_k=k, namespace=namespace, include_metadata=True) for emb in embeds
+            ]
+            return self._to_scored(results, namespace, self._stored(results, namespace))
 
     def delete(self, ids: Iterable[str], namespace: str) -> None:
-        self._index.delete(ids=list(ids), namespace=namespace)
-
-    def _build_vectors(self, chunks: Sequence[Chunk]) -> list[tuple[str, Sequence[float], dict]]:
-        texts = [c.text for c in chunks]
-        embeds = self._embedding.embed_texts(texts)
-        return [
-            (
-                chunk.id,
-                embeds[i],
-                {"text": chunk.text, "index": chunk.index, "source": chunk.source},
+        ids = list(ids)
+        self._index.delete(ids=ids, namespace=namespace)
+        if self._docstore is not None:  # after the vectors: a hit never lacks its text
+            self._docstore.delete(namespace, ids)
+        self._changed(namespace)
+
+    # ── Async API (request path) ───────────────────────────────────
+    async def upsert_async(self, batch: DocumentBatch, namespace: str) -> UpsertStats:
+        chunks, step = batch.chunks, config.PINECONE_UPSERT_EMBED_BATCH
+        stats, start = UpsertStats(), time.perf_counter()
+        index = await self._async_index()
+        sends = asyncio.Semaphore(self._concurrency)
+        window = asyncio.Semaphore(self._concurrency)  # groups embedded or being embedded, not yet sent
+
+        async def _group(group: Sequence[Chunk]) -> None:
+            async with window:
+                embeds = await self._embed_async([c.text for c in group])
+                await self._store_texts(group, namespace)
+                await self._send(index, self._build_vectors(group, embeds), namespace, sends, stats)
+
+        with telemetry.span("store.upsert") as s:
+            try:
+                await _gather(_group(chunks[i : i + step]) for i in range(0, len(chunks), step))
+            finally:
+                self._finished(namespace, stats, start, s)
+        return stats
+
+    async def upsert_vectors_async(
+        self, chunks: Sequence[Chunk], embeds: Sequence[Sequence[float]], namespace: str
+    ) -> UpsertStats:
+        stats, start = UpsertStats(), time.perf_counter()
+        index = await self._async_index()
+        with telemetry.span("store.upsert") as s:
+            try:
+                await self._store_texts(chunks, namespace)
+                await self._send(
+                    index, self._build_vectors(chunks, embeds), namespace, asyncio.Semaphore(self._concurrency), stats
+                )
+            finally:
+                self._finished(namespace, stats, start, s)
+        return stats
+
+    async def query_async(self, query_text: str, namespace: str, k: int = 6) -> list[Chunk]:
+        return [h.chunk for h in (await self.query_many_async([query_text], namespace, k))[0]]
+
+    async def query_many_async(
+        self, texts: Sequence[str], namespace: str, k: int = 6, embeds: Sequence[Sequence[float]] | None = None
+    ) -> list[list[ScoredChunk]]:
+        if not texts:
+            return []
+        if embeds is None:
+            embeds = await self._embed_async(texts)
+        # Pinecone has no multi-vector query; fan out over the one pooled session
+        index = await self._async_index()
+        with telemetry.span("store.query", queries=len(texts), k=k):
+            results = await asyncio.gather(
+                *(
+                    index.query(vector=emb, top_k=k, namespace=namespace, include_metadata=True)
+                    for emb in embeds
+                )
             )
-            for i, chunk in enumerate(chunks)
-        ]
+            stored = await asyncio.to_thread(self._stored, results, namespace)  # sqlite, off the loop
+            return self._to_scored(results, namespace, stored)
 
-    def _batched_upsert(
-        self,
-        vectors: Sequence[tuple[str, Sequence[float], dict]],
-        namespace: str,
+    async def delete_async(self, ids: Iterable[str], namespace: str) -> None:
+        ids = list(ids)
+        index = await self._async_index()
+        with telemetry.span("store.delete", ids=len(ids)):
+            await index.delete(ids=ids, namespace=namespace)
+            if self._docstore is not None:
+                await asyncio.to_thread(self._docstore.delete, namespace, ids)
+        self._changed(namespace)
+
+    async def aclose(self) -> None:
+        index = self._async_indexes.pop(asyncio.get_running_loop(), None)
+        if index is not None:
+            await index.close()
+
+    # ── Upsert pipeline ────────────────────────────────────────────
+    async def _store_texts(self, chunks: Sequence[Chunk], namespace: str) -> None:
+        if self._docstore is not None:  # before the vectors, so every hit can be hydrated
+            await asyncio.to_thread(self._docstore.put_many, namespace, chunks)
+
+    async def _send(
+        self, index: Any, vectors: list[Vector], namespace: str, sends: asyncio.Semaphore, stats: UpsertStats
     ) -> None:
-        for i in range(0, len(vectors), self._MAX_BATCH):
-            self._index.upsert(vectors=vectors[i : i + self._MAX_BATCH], namespace=namespace)
+        await _gather(self._send_batch(index, b, namespace, sends, stats) for b in _batches(vectors))
+
+    async def _send_batch(
+        self, index: Any, batch: list[Vector], namespace: str, sends: asyncio.Semaphore, stats: UpsertStats
+    ) -> None:
+        retries = config.PINECONE_UPSERT_RETRIES
+        for attempt in range(retries + 1):
+            async with sends:
+                try:
+                    await index.upsert(vectors=batch, namespace=namespace)
+                    stats.vectors += len(batch)
+                    stats.batches += 1
+                    return
+                except Exception as exc:
+                    if attempt == retries or not _retryable(exc):
+                        raise
+                    stats.retries += 1
+                    logger.warning("upsert of %s vectors failed (%s); retry %s/%s", len(batch), exc, attempt + 1, retries)
+            await asyncio.sleep(0.5 * 2**attempt)  # back off without holding a send slot
+
+    def _finished(self, namespace: str, stats: UpsertStats, start: float, s: telemetry.Span) -> None:
+        """Called in a `finally`: batches written before a failure still invalidate."""
+        try:
+            stats.seconds = time.perf_counter() - start
+            s.set(vectors=stats.vectors, requests=stats.batches, retries=stats.retries)
+            logger.info(
+                "upserted %s vectors to %s in %.2fs (%.0f vectors/s, %s requests, %s retries)",
+                stats.vectors, namespace, stats.seconds, stats.per_s, stats.batches, stats.retries,
+            )
+        finally:
+            if stats.vectors:
+                self._changed(namespace)
+
+    # ── Helpers ────────────────────────────────────────────────────
+    async def _async_index(self) -> Any:
+        loop = asyncio.get_running_loop()
+        index = self._async_indexes.get(loop)
+        if index is None:
+            if self._host is None:
+                desc = await asyncio.to_thread(self._pc.describe_index, config.PINECONE_INDEX)
+                self._host = desc.host
+            index = self._async_indexes[loop] = self._pc.IndexAsyncio(host=self._host)
+        return index
+
+    def _stored(self, results: Sequence[Any], namespace: str) -> dict[str, Chunk]:
+        """Docstore texts for every hit in `results`, in one lookup."""
+        if self._docstore is None:
+            return {}
+        ids = [str(m["id"]) for res in results for m in res["matches"]]
+        with telemetry.span("docstore.get", ids=len(ids)):
+            return self._docstore.get_many(namespace, ids) if ids else {}
+
+    def _to_scored(
+        self, results: Sequence[Any], namespace: str, stored: dict[str, Chunk]
+    ) -> list[list[ScoredChunk]]:
+        """Hits per query result, texts from `stored`, else from the vector metadata."""
+        out: list[list[ScoredChunk]] = []
+        missing = 0
+        for res in results:
+            hits: list[ScoredChunk] = []
+            for m in res["matches"]:
+                chunk = stored.get(str(m["id"])) or _from_metadata(m)
+                if chunk is None:
+                    missing += 1
+                    continue
+                hits.append(ScoredChunk(chunk, float(m["score"])))
+            out.append(hits)
+        if missing:
+            logger.warning("%s hits in %s have no text in the docstore or metadata; dropped", missing, namespace)
+        return out
+
+    def _build_vectors(self, chunks: Sequence[Chunk], embeds: Sequence[Sequence[float]]) -> list[Vector]:
+        vectors: list[Vector] = []
+        for chunk, emb in zip(chunks, embeds):
+            meta = {"index": chunk.index, "source": chunk.source, **chunk.pages()}
+            if self._docstore is None:  # otherwise the text lives in the docstore
+                meta["text"] = chunk.text
+            vectors.append((chunk.id, emb, meta))
+        return vectors
+
+
+def _batches(vectors: Sequence[Vector]) -> Iterator[list[Vector]]:
+    """Consecutive runs of vectors that fit one upsert request."""
+    max_bytes, max_vectors = config.PINECONE_UPSERT_MAX_BYTES, config.PINECONE_UPSERT_MAX_VECTORS
+    batch: list[Vector] = []
+    size = _REQUEST_OVERHEAD
+    for vector in vectors:
+        n = _payload_bytes(vector)
+        if batch and (size + n > max_bytes or len(batch) == max_vectors):
+            yield batch
+            batch, size = [], _REQUEST_OVERHEAD
+        batch.append(vector)
+        size += n
+    if batch:
+        yield batch
+
+
+def _payload_bytes(vector: Vector) -> int:
+    """Upper bound on a vector's share of the JSON request body."""
+    vid, values, metadata = vector
+    return len(vid) + _FLOAT_BYTES * len(values) + len(json.dumps(metadata)) + _VECTOR_OVERHEAD
+
+
+def _retryable(exc: BaseException) -> bool:
+    """Rate limits, server errors and transport failures; not bad requests."""
+    status = getattr(exc, "status", None) or getattr(exc, "status_code", None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    transient: tuple[type[BaseException], ...] = (OSError, asyncio.TimeoutError)
+    try:
+        from aiohttp import ClientError  # the asyncio client's transport
+
+        transient += (ClientError,)
+    except ImportError:
+        pass
+    return isinstance(exc, transient)
+
+
+async def _gather(aws: Iterable[Awaitable[None]]) -> None:
+    """Run everything to completion, then raise the first error (no orphaned sends)."""
+    for result in await asyncio.gather(*aws, return_exceptions=True):
+        if isinstance(result, BaseException):
+            raise result
+
+
+def _from_metadata(match: Any) -> Chunk | None:
+    meta = match.get("metadata") or {}
+    if "text" not in meta:
+        return None
+    return Chunk(
+        id=str(match["id"]),
+        text=meta["text"],
+        index=int(meta["index"]),
+        source=meta["source"],
+        page_start=_page(meta.get("page_start")),
+        page_end=_page(meta.get("page_end")),
+    )
+
+
+def _page(value: Any) -> int | None:
+    # Pinecone returns metadata numbers as floats
+    return None if value is None else int(value)
@@ -1,3 +1,4 @@
 from .webhook_handler import DropboxWebhookHandler
+from .sync import DropboxSync, SyncReport
 
-__all__ = ["DropboxWebhookHandler"]
+__all__ = ["DropboxWebhookHandler", "DropboxSync", "SyncReport"]
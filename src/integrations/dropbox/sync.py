@@ -0,0 +1,192 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, AsyncIterator, Iterable
+import asyncio
+import json
+import logging
+import tempfile
+import httpx
+from core.ingestion import supported
+from core.ingestion.pipeline import IngestPipeline
+from integrations.supabase.repository import SupabaseRepository
+from src import config
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+@dataclass(slots=True)
+class SyncReport:
+    account: str
+    pages: int = 0
+    files: int = 0  # downloaded and handed to the pipeline
+    removed: int = 0  # sources whose chunks were deleted
+    chunks: int = 0  # embedded and written
+    failed: list[str] = field(default_factory=list)
+
+
+class DropboxSync:
+    """
+    Keeps each linked Dropbox account's files ingested into its user's
+    namespace. Webhook notifications are debounced per account: the first
+    one schedules a sync `debounce` seconds later, notifications arriving
+    meanwhile fold into it, and any arriving during the sync queue exactly
+    one more. A sync pages through `list_folder/continue` from the cursor
+    stored in Supabase; for each page it deletes the chunks of removed
+    files and folders, downloads the changed files concurrently (streamed
+    to a temporary directory) and runs them through the ingest pipeline,
+    then stores the page's cursor. A failing page leaves the cursor where
+    it was, so the next notification retries it.
+
+    Accounts live in the `table` Supabase table: account_id, user_id
+    (the namespace), access_token and cursor.
+    """
+
+    def __init__(
+        self,
+        repo: SupabaseRepository,
+        pipeline: IngestPipeline,
+        debounce: float | None = None,
+        download_concurrency: int | None = None,
+        client: httpx.AsyncClient | None = None,
+        table: str | None = None,
+    ) -> None:
+        self._repo = repo
+        self._pipeline = pipeline
+        self._debounce = config.DROPBOX_DEBOUNCE_S if debounce is None else debounce
+        self._slots = asyncio.Semaphore(download_concurrency or config.DROPBOX_DOWNLOAD_CONCURRENCY)
+        self._owns_client = client is None
+        self._client = client or httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=download_concurrency or config.DROPBOX_DOWNLOAD_CONCURRENCY),
+            timeout=httpx.Timeout(60.0, connect=5.0),
+        )
+        self._table = table or config.DROPBOX_ACCOUNTS_TABLE
+        self._api = config.DROPBOX_API_URL
+        self._content = config.DROPBOX_CONTENT_URL
+        self._dirty: set[str] = set()
+        self._tasks: dict[str, asyncio.Task] = {}
+
+    def notify(self, accounts: Iterable[str]) -> None:
+        """Schedule a sync for each account (call on the event loop; returns at once)."""
+        for account in accounts:
+            self._dirty.add(account)
+            if account not in self._tasks:
+                self._tasks[account] = asyncio.create_task(self._debounced(account))
+
+    async def idle(self) -> None:
+        """Wait until no sync is scheduled or running."""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks.values()), return_exceptions=True)
+
+    async def aclose(self) -> None:
+        """Cancel pending syncs and close the clients bound to the running loop."""
+        for task in list(self._tasks.values()):
+            task.cancel()
+        await asyncio.gather(*list(self._tasks.values()), return_exceptions=True)
+        await self._repo.aclose()
+        if self._owns_client:
+            await self._client.aclose()
+
+    async def _debounced(self, account: str) -> None:
+        try:
+            while account in self._dirty:
+                await asyncio.sleep(self._debounce)  # let the burst settle
+                self._dirty.discard(account)
+                try:
+                    report = await self.sync(account)
+                    logger.info("dropbox sync %s", report)
+                except Exception:
+                    logger.exception("dropbox sync failed for %s", account)
+        finally:
+            del self._tasks[account]
+
+    async def sync(self, account: str) -> SyncReport:
+        report = SyncReport(account)
+        rows = await self._repo.aget(self._table, f"account_id={account}", 1)
+        if not rows:
+            logger.warning("no %s row for dropbox account %s", self._table, account)
+            return report
+        row = rows[0]
+        namespace = row.get("user_id") or account
+        auth = {"Authorization": f"Bearer {row['access_token']}"}
+        async for entries, cursor in self._changes(auth, row.get("cursor")):
+            await self._apply(auth, entries, namespace, report)
+            await self._repo.aupdate(self._table, {"cursor": cursor}, {"account_id": account})
+            report.pages += 1
+        return report
+
+    # ── Dropbox API ────────────────────────────────────────────────
+    async def _changes(self, auth: dict, cursor: str | None) -> AsyncIterator[tuple[list[dict], str]]:
+        """(entries, cursor after them) per page of changes since `cursor`; a full listing without one."""
+        full = {"path": "", "recursive": True, "include_deleted": True}
+        url, payload = (f"{self._api}/files/list_folder/continue", {"cursor": cursor}) if cursor else \
+                       (f"{self._api}/files/list_folder", full)
+        while True:
+            r = await self._client.post(url, headers=auth, json=payload)
+            if cursor and r.status_code == 409 and "reset" in r.text:
+                logger.warning("dropbox cursor expired, listing everything again")
+                url, payload, cursor = f"{self._api}/files/list_folder", full, None
+                continue
+            r.raise_for_status()
+            out = r.json()
+            yield out["entries"], out["cursor"]
+            if not out.get("has_more"):
+                return
+            url, payload = f"{self._api}/files/list_folder/continue", {"cursor": out["cursor"]}
+
+    async def _download(self, auth: dict, entry: dict, dest: Path) -> None:
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        headers = {**auth, "Dropbox-API-Arg": json.dumps({"path": entry.get("id") or entry["path_lower"]})}
+        async with self._slots:
+            async with self._client.stream("POST", f"{self._content}/files/download", headers=headers) as r:
+                r.raise_for_status()
+                with dest.open("wb") as f:
+                    async for block in r.aiter_bytes(1 << 20):
+                        f.write(block)
+
+    # ── Ingestion ──────────────────────────────────────────────────
+    async def _apply(self, auth: dict, entries: list[dict], namespace: str, report: SyncReport) -> None:
+        files: dict[str, dict[str, Any]] = {}  # source → latest file entry
+        removed: set[str] = set()  # lower-cased paths of deleted files and folders
+        for entry in entries:
+            source = entry["path_display"].lstrip("/")
+            if entry[".tag"] == "deleted":
+                gone = entry["path_lower"].lstrip("/")
+                files = {s: e for s, e in files.items() if not _under(s.lower(), gone)}
+                removed.add(gone)
+            elif entry[".tag"] == "file" and supported(entry["name"]):
+                files[source] = entry
+                removed.discard(source.lower())
+
+        if removed:
+            report.removed += await self._forget(namespace, removed)
+        if not files:
+            return
+        with tempfile.TemporaryDirectory(prefix="dropbox-", dir=config.DROPBOX_SYNC_DIR or None) as tmp:
+            paths = {source: Path(tmp, source) for source in files}
+            results = await asyncio.gather(
+                *(self._download(auth, files[s], p) for s, p in paths.items()), return_exceptions=True
+            )
+            errors = [r for r in results if isinstance(r, BaseException)]
+            if errors:  # keep the cursor: the next notification retries this page
+                raise errors[0]
+            ingest = await self._pipeline.run(list(paths.values()), namespace, root=tmp)
+        report.files += len(files)
+        report.chunks += ingest.chunks
+        report.failed += [Path(p).relative_to(tmp).as_posix() for p in ingest.failed]
+
+    async def _forget(self, namespace: str, removed: set[str]) -> int:
+        manifest = self._pipeline.manifest
+        if manifest is None:
+            logger.warning("no ingest manifest: chunks of %s deleted files stay in %s", len(removed), namespace)
+            return 0
+        known = await asyncio.to_thread(manifest.sources, namespace)
+        gone = [s for s in known if any(_under(s.lower(), r) for r in removed)]
+        await self._pipeline.forget(gone, namespace)
+        return len(gone)
+
+
+def _under(path: str, prefix: str) -> bool:
+    """`path` is `prefix` or inside the folder `prefix` (both without a leading slash)."""
+    return path == prefix or path.startswith(prefix + "/")
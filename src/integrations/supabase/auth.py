@@ -1,11 +1,14 @@
 from __future__ import annotations
+import asyncio
+import hashlib
 import logging
-from functools import lru_cache
-from typing import Callable
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable
 import httpx
 import jwt
-from jwt import PyJWKClient
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Header, HTTPException, status
 from src import config
 
 logger = logging.getLogger(__name__)
@@ -13,36 +16,166 @@ logger.setLevel(logging.INFO)
 
 
 class AuthService:
-    def __init__(self) -> None:
-        self._jwks_client = PyJWKClient(self._jwks_url())
+    """
+    Verifies Supabase RS256 bearer tokens. Verified claims are cached by
+    token hash until the token's `exp` (LRU-bounded), so a token reused
+    over its lifetime is checked cryptographically once. Signing keys come
+    from a local copy of the JWKS that `start` prefetches and a daemon
+    thread refreshes every `jwks_refresh` seconds; a token with an unknown
+    `kid` triggers an immediate refetch, at most once per `jwks_min_refetch`
+    seconds. The FastAPI dependency answers cache hits on the event loop
+    and verifies misses in a worker thread.
+    """
+
+    def __init__(
+        self,
+        cache_size: int | None = None,
+        jwks_refresh: float | None = None,
+        jwks_min_refetch: float = 30.0,
+    ) -> None:
+        # None takes the config default; cache_size=0 turns the claims cache off
+        self._claims = _ClaimsCache(config.AUTH_CLAIMS_CACHE_SIZE if cache_size is None else cache_size)
+        self._refresh = config.AUTH_JWKS_REFRESH_S if jwks_refresh is None else jwks_refresh
+        self._min_refetch = jwks_min_refetch
+        self._keys: dict[str, jwt.PyJWK] = {}
+        self._refetched = float("-inf")  # monotonic time of the last unknown-kid refetch
+        self._keys_lock = threading.Lock()
+        self._started = False
+        self._stop = threading.Event()
+
+    def start(self) -> None:
+        """Fetch the JWKS now and keep it fresh in the background (idempotent)."""
+        with self._keys_lock:
+            if self._started:
+                return
+            config.require("supabase")
+            self._fetch()
+            threading.Thread(target=self._refresh_loop, name="jwks-refresh", daemon=True).start()
+            self._started = True
+
+    def close(self) -> None:
+        self._stop.set()
 
     def verify_jwt(self, token: str) -> dict:
-        signing_key = self._jwks_client.get_signing_key_from_jwt(token).key
+        claims = self._claims.get(token)
+        return claims if claims is not None else self._verify(token)
+
+    async def verify_jwt_async(self, token: str) -> dict:
+        """Cache hits on the event loop; misses (key fetch and RSA) in a worker thread."""
+        claims = self._claims.get(token)
+        return claims if claims is not None else await asyncio.to_thread(self._verify, token)
+
+    def _verify(self, token: str) -> dict:
         try:
+            kid = jwt.get_unverified_header(token).get("kid")
             claims = jwt.decode(
                 token,
-                signing_key,
+                self._signing_key(kid),
                 algorithms=["RS256"],
                 audience=config.SUPABASE_URL,
                 options={"verify_at_hash": False},
             )
-            return claims
         except jwt.PyJWTError as exc:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=str(exc)) from exc
+        self._claims.put(token, claims)
+        return claims
 
-    def fastapi_dependency(self) -> Callable[..., dict]:
-        def _dep(token: str = Depends(self._bearer_header)) -> dict:  # type: ignore
-            return self.verify_jwt(token)
+    def stats(self) -> dict[str, int]:
+        return {"keys": len(self._keys), **self._claims.stats()}
+
+    # ── FastAPI ────────────────────────────────────────────────────
+    def fastapi_dependency(self) -> Callable[..., Awaitable[dict]]:
+        async def _dep(token: str = Depends(self._bearer_header)) -> dict:  # type: ignore
+            return await self.verify_jwt_async(token)
 
         return _dep
 
+    # ── Keys ───────────────────────────────────────────────────────
+    def _signing_key(self, kid: str | None) -> object:
+        if not self._started:
+            self.start()
+        key = self._keys.get(kid)
+        if key is None:  # rotated since the last refresh, or a forged kid: refetch, rate-limited
+            with self._keys_lock:
+                if kid not in self._keys and time.monotonic() - self._refetched >= self._min_refetch:
+                    self._refetched = time.monotonic()
+                    self._fetch()
+            key = self._keys.get(kid)
+        if key is None:
+            raise jwt.InvalidKeyError(f"unknown signing key {kid!r}")
+        return key.key
+
+    def _fetch(self) -> None:
+        try:
+            r = httpx.get(self._jwks_url(), timeout=httpx.Timeout(10.0, connect=5.0))
+            r.raise_for_status()
+            keyset = jwt.PyJWKSet.from_dict(r.json())
+        except (httpx.HTTPError, jwt.PyJWTError, ValueError) as exc:
+            logger.warning("jwks fetch failed (%s); keeping %s cached keys", exc, len(self._keys))
+            return
+        self._keys = {k.key_id: k for k in keyset.keys}  # swapped whole: readers need no lock
+
+    def _refresh_loop(self) -> None:
+        while not self._stop.wait(self._refresh):
+            self._fetch()
+
     @staticmethod
-    @lru_cache
     def _jwks_url() -> str:
         return f"{config.SUPABASE_URL}/auth/v1/keys"
 
     @staticmethod
-    def _bearer_header(authorization: str | None = None) -> str:
+    def _bearer_header(authorization: str | None = Header(None)) -> str:
         if not authorization or not authorization.startswith("Bearer "):
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing bearer")
         return authorization.split(" ", 1)[1]
+
+
+def claims_dependency(service: Callable[[], Awaitable[AuthService]]) -> Callable[..., Awaitable[dict]]:
+    """
+    `AuthService.fastapi_dependency` for a service resolved per request,
+    e.g. from a component registry that builds it at startup or first use.
+    """
+
+    async def _dep(token: str = Depends(AuthService._bearer_header)) -> dict:  # type: ignore
+        return await (await service()).verify_jwt_async(token)
+
+    return _dep
+
+
+class _ClaimsCache:
+    """Verified claims by sha256(token), each valid until the token's exp."""
+
+    def __init__(self, max_entries: int) -> None:
+        self._max = max_entries
+        self._lru: OrderedDict[bytes, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> dict | None:
+        key = hashlib.sha256(token.encode()).digest()
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is not None and entry[0] <= time.time():
+                del self._lru[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._lru.move_to_end(key)
+            self.hits += 1
+            return dict(entry[1])
+
+    def put(self, token: str, claims: dict) -> None:
+        exp = claims.get("exp")
+        if not isinstance(exp, (int, float)) or self._max <= 0:  # no expiry: never cache
+            return
+        key = hashlib.sha256(token.encode()).digest()
+        with self._lock:
+            self._lru[key] = (float(exp), dict(claims))
+            self._lru.move_to_end(key)
+            while len(self._lru) > self._max:
+                self._lru.popitem(last=False)
+
+    def stats(self) -> dict[str, int]:
+        return {"cached_tokens": len(self._lru), "hits": self.hits, "misses": self.misses}
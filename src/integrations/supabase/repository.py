@@ -1,6 +1,10 @@
 from __future__ import annotations
+import asyncio
+import itertools
 import logging
-from typing import Any, Sequence
+import threading
+import weakref
+from typing import Any, AsyncIterator, Iterator, Sequence
 import httpx
 from src import config
 
@@ -9,7 +13,22 @@ logger.setLevel(logging.INFO)
 
 
 class SupabaseRepository:
-    def __init__(self) -> None:
+    """
+    PostgREST access over pooled keep-alive connections (HTTP/2 when the
+    `h2` package is installed). Every call has a sync form on one shared
+    `httpx.Client` and an async `a…` form on an `httpx.AsyncClient` per
+    event loop. `insert` and `upsert` send rows in chunks of `chunk_rows`;
+    `iter_rows` streams a large result set page by page with Range headers.
+    """
+
+    def __init__(
+        self,
+        timeout: float | None = None,
+        max_connections: int | None = None,
+        http2: bool | None = None,
+        chunk_rows: int = 500,
+        page_rows: int = 1000,
+    ) -> None:
         self._url = f"{config.SUPABASE_URL}/rest/v1"
         self._key = config.SUPABASE_SERVICE_ROLE_KEY
         self._headers = {
@@ -17,35 +36,173 @@ class SupabaseRepository:
             "Authorization": f"Bearer {self._key}",
             "Content-Type": "application/json",
         }
+        self._timeout = httpx.Timeout(timeout or config.SUPABASE_TIMEOUT, connect=5.0)
+        max_connections = max_connections or config.SUPABASE_MAX_CONNECTIONS
+        self._limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self._http2 = _http2_available() if (config.SUPABASE_HTTP2 if http2 is None else http2) else False
+        self._chunk = chunk_rows
+        self._page = page_rows
+        self._client: httpx.Client | None = None
+        self._client_lock = threading.Lock()
+        # httpx async pools bind to the loop that first uses them
+        self._aclients: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient] = (
+            weakref.WeakKeyDictionary()
+        )
 
+    # ── Sync ───────────────────────────────────────────────────────
     def get(self, table: str, filters: str = "", limit: int | None = None) -> list[dict]:
         logger.info("supabase get %s", table)
-        params: dict[str, Any] = {"select": "*"}
-        if filters:
-            params.update(self._parse_filters(filters))
-        if limit:
-            params["limit"] = str(limit)
-        r = httpx.get(f"{self._url}/{table}", headers=self._headers, params=params, timeout=8)
+        r = self._sync().get(f"/{table}", params=self._select(filters, limit))
         r.raise_for_status()
         return r.json()
 
+    def iter_rows(self, table: str, filters: str = "", order: str | None = None) -> Iterator[dict]:
+        """Every matching row, fetched `page_rows` at a time (pass `order` for a stable walk)."""
+        params = self._select(filters, None, order)
+        for lo in itertools.count(0, self._page):
+            r = self._sync().get(f"/{table}", params=params, headers=_range(lo, self._page))
+            if r.status_code == 416:  # past the end
+                return
+            r.raise_for_status()
+            rows = r.json()
+            yield from rows
+            if len(rows) < self._page:
+                return
+
     def insert(self, table: str, rows: Sequence[dict]) -> None:
         logger.info("supabase insert %s rows into %s", len(rows), table)
-        r = httpx.post(f"{self._url}/{table}", headers=self._headers, json=rows, timeout=8)
-        r.raise_for_status()
+        for batch in _chunks(rows, self._chunk):
+            r = self._sync().post(f"/{table}", json=batch, headers={"Prefer": "return=minimal"})
+            r.raise_for_status()
+
+    def upsert(self, table: str, rows: Sequence[dict], on_conflict: str, ignore_duplicates: bool = False) -> None:
+        """Insert or merge on the unique columns in `on_conflict` ("a,b")."""
+        logger.info("supabase upsert %s rows into %s", len(rows), table)
+        headers, params = _upsert(on_conflict, ignore_duplicates)
+        for batch in _chunks(rows, self._chunk):
+            r = self._sync().post(f"/{table}", json=batch, params=params, headers=headers)
+            r.raise_for_status()
 
     def update(self, table: str, patch: dict, eq: dict[str, str]) -> None:
         logger.info("supabase update %s", table)
-        params = {f"eq.{k}": v for k, v in eq.items()}
-        r = httpx.patch(
-            f"{self._url}/{table}", headers=self._headers, params=params, json=patch, timeout=8
-        )
+        r = self._sync().patch(f"/{table}", params=_eq(eq), json=patch)
+        r.raise_for_status()
+
+    def close(self) -> None:
+        with self._client_lock:
+            client, self._client = self._client, None
+        if client is not None:
+            client.close()
+
+    # ── Async ──────────────────────────────────────────────────────
+    async def aget(self, table: str, filters: str = "", limit: int | None = None) -> list[dict]:
+        logger.info("supabase get %s", table)
+        r = await self._async().get(f"/{table}", params=self._select(filters, limit))
+        r.raise_for_status()
+        return r.json()
+
+    async def aiter_rows(self, table: str, filters: str = "", order: str | None = None) -> AsyncIterator[dict]:
+        params = self._select(filters, None, order)
+        for lo in itertools.count(0, self._page):
+            r = await self._async().get(f"/{table}", params=params, headers=_range(lo, self._page))
+            if r.status_code == 416:
+                return
+            r.raise_for_status()
+            rows = r.json()
+            for row in rows:
+                yield row
+            if len(rows) < self._page:
+                return
+
+    async def ainsert(self, table: str, rows: Sequence[dict]) -> None:
+        logger.info("supabase insert %s rows into %s", len(rows), table)
+        client = self._async()
+        for batch in _chunks(rows, self._chunk):
+            r = await client.post(f"/{table}", json=batch, headers={"Prefer": "return=minimal"})
+            r.raise_for_status()
+
+    async def aupsert(
+        self, table: str, rows: Sequence[dict], on_conflict: str, ignore_duplicates: bool = False
+    ) -> None:
+        logger.info("supabase upsert %s rows into %s", len(rows), table)
+        headers, params = _upsert(on_conflict, ignore_duplicates)
+        client = self._async()
+        for batch in _chunks(rows, self._chunk):
+            r = await client.post(f"/{table}", json=batch, params=params, headers=headers)
+            r.raise_for_status()
+
+    async def aupdate(self, table: str, patch: dict, eq: dict[str, str]) -> None:
+        logger.info("supabase update %s", table)
+        r = await self._async().patch(f"/{table}", params=_eq(eq), json=patch)
         r.raise_for_status()
 
+    async def aclose(self) -> None:
+        """Close the async client bound to the running loop."""
+        client = self._aclients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    # ── Clients ────────────────────────────────────────────────────
+    def _sync(self) -> httpx.Client:
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = httpx.Client(**self._client_options())
+        return self._client
+
+    def _async(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._aclients.get(loop)
+        if client is None:
+            client = self._aclients[loop] = httpx.AsyncClient(**self._client_options())
+        return client
+
+    def _client_options(self) -> dict[str, Any]:
+        return dict(
+            base_url=self._url, headers=self._headers, timeout=self._timeout, limits=self._limits, http2=self._http2
+        )
+
+    def _select(self, filters: str, limit: int | None, order: str | None = None) -> dict[str, str]:
+        params: dict[str, str] = {"select": "*"}
+        if filters:
+            params.update(self._parse_filters(filters))
+        if limit:
+            params["limit"] = str(limit)
+        if order:
+            params["order"] = order
+        return params
+
     @staticmethod
     def _parse_filters(expr: str) -> dict[str, str]:
         out: dict[str, str] = {}
         for part in expr.split(","):
             k, v = part.split("=", 1)
-            out[f"eq.{k.strip()}"] = v.strip()
+            out[k.strip()] = f"eq.{v.strip()}"
         return out
+
+
+def _eq(eq: dict[str, str]) -> dict[str, str]:
+    return {k: f"eq.{v}" for k, v in eq.items()}  # PostgREST: column=eq.value
+
+
+def _upsert(on_conflict: str, ignore_duplicates: bool) -> tuple[dict[str, str], dict[str, str]]:
+    resolution = "ignore-duplicates" if ignore_duplicates else "merge-duplicates"
+    return {"Prefer": f"resolution={resolution},return=minimal"}, {"on_conflict": on_conflict}
+
+
+def _chunks(rows: Sequence[dict], size: int) -> Iterator[list[dict]]:
+    for i in range(0, len(rows), size):
+        yield list(rows[i : i + size])
+
+
+def _range(lo: int, size: int) -> dict[str, str]:
+    return {"Range-Unit": "items", "Range": f"{lo}-{lo + size - 1}"}
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401  (httpx's optional HTTP/2 dependency)
+    except ImportError:
+        logger.warning("h2 not installed – supabase client falls back to HTTP/1.1")
+        return False
+    return True
@@ -0,0 +1,115 @@
+from core.answer_cache import InMemoryAnswerCache, SqliteAnswerCache
+from core.schema import Chunk, DocumentBatch
+from core.orchestrator import RagOrchestrator
+from test_orchestrator import DummyEmbed, EchoGen
+from test_vector_store import InMemoryVectorStore
+
+class NotifyingStore(InMemoryVectorStore):
+    def upsert(self, batch, namespace):
+        super().upsert(batch, namespace)
+        self._changed(namespace)
+
+    def query(self, query_text, namespace, k):
+        self.calls = getattr(self, "calls", 0) + 1
+        return super().query(query_text, namespace, k)
+
+def test_similarity_ttl_and_namespaces(tmp_path):
+    for cache in (InMemoryAnswerCache(threshold=0.9), SqliteAnswerCache(str(tmp_path / "a.sqlite"), threshold=0.9)):
+        cache.put("u", 4, "q", [1.0, 0.0], {"answer": "a"})
+        assert cache.get("u", 4, [0.99, 0.05]) == {"answer": "a"}
+        assert cache.get("u", 4, [0.0, 1.0]) is None
+        assert cache.get("u", 8, [1.0, 0.0]) is None
+        assert cache.get("other", 4, [1.0, 0.0]) is None
+        cache.invalidate("u")
+        assert cache.get("u", 4, [1.0, 0.0]) is None
+        cache.ttl = -1
+        cache.put("u", 4, "q", [1.0, 0.0], {"answer": "a"})
+        assert cache.get("u", 4, [1.0, 0.0]) is None
+
+def test_orchestrator_uses_cache_until_upsert():
+    emb = DummyEmbed()
+    store = NotifyingStore(emb)
+    store.upsert(DocumentBatch("s", [Chunk(id="1", text="ctx", index=0, source="s")]), "u")
+    rag = RagOrchestrator(store, EchoGen(), emb, answer_cache=InMemoryAnswerCache())
+
+    assert rag.answer("q", user_id="u", k=1) == "answer:q:ctx"
+    assert rag.answer("q", user_id="u", k=1, trace=True)["cached"] is True
+    assert store.calls == 1
+
+    store.upsert(DocumentBatch("s", [Chunk(id="2", text="new", index=1, source="s")]), "u")
+    rag.answer("q", user_id="u", k=1)
+    assert store.calls == 2
+
+def test_put_after_invalidate_is_dropped(tmp_path):
+    for cache in (InMemoryAnswerCache(), SqliteAnswerCache(str(tmp_path / "a.sqlite"))):
+        seen = cache.generation("u")
+        cache.invalidate("u")  # an upsert lands between lookup and put
+        cache.put("u", 4, "q", [1.0, 0.0], {"answer": "stale"}, seen)
+        assert cache.get("u", 4, [1.0, 0.0]) is None
+        cache.put("u", 4, "q", [1.0, 0.0], {"answer": "fresh"}, cache.generation("u"))
+        assert cache.get("u", 4, [1.0, 0.0]) == {"answer": "fresh"}
+
+def test_orchestrator_skips_caching_when_invalidated_during_retrieval():
+    class IngestDuringQuery(NotifyingStore):
+        def query(self, query_text, namespace, k):
+            hits = super().query(query_text, namespace, k)
+            if self.calls == 1:
+                self._changed(namespace)
+            return hits
+
+    emb = DummyEmbed()
+    store = IngestDuringQuery(emb)
+    store.upsert(DocumentBatch("s", [Chunk(id="1", text="ctx", index=0, source="s")]), "u")
+    rag = RagOrchestrator(store, EchoGen(), emb, answer_cache=InMemoryAnswerCache())
+
+    rag.answer("q", user_id="u", k=1)
+    assert "cached" not in rag.answer("q", user_id="u", k=1, trace=True)
+    assert store.calls == 2
+
+def test_cache_miss_embeds_the_query_once_and_stays_off_the_loop(tmp_path):
+    import asyncio
+    import threading
+    from core.vector_stores.numpy_store import NumpyVectorStore
+
+    class CountingEmbed(DummyEmbed):
+        calls = 0
+
+        def embed_texts(self, texts):
+            self.calls += 1
+            return super().embed_texts(texts)
+
+    class ThreadLog(SqliteAnswerCache):
+        threads: list = []
+
+        def generation(self, namespace):
+            self.threads.append(threading.current_thread())
+            return super().generation(namespace)
+
+        def get(self, namespace, k, vector):
+            self.threads.append(threading.current_thread())
+            return super().get(namespace, k, vector)
+
+        def put(self, *args):
+            self.threads.append(threading.current_thread())
+            super().put(*args)
+
+        def invalidate(self, namespace):
+            self.threads.append(threading.current_thread())
+            super().invalidate(namespace)
+
+    emb = CountingEmbed()
+    store = NumpyVectorStore(emb, path=str(tmp_path / "vectors"), background_compaction=False)
+    store.upsert(DocumentBatch("s", [Chunk(id="1", text="ctx", index=0, source="s")]), "u")
+    cache = ThreadLog(str(tmp_path / "a.sqlite"))
+    rag = RagOrchestrator(store, EchoGen(), emb, answer_cache=cache)
+    emb.calls = 0
+
+    async def main():
+        answer = await rag.answer_async("q", user_id="u", k=1)
+        store._changed("u")  # as stores do on the loop after an async write
+        return answer
+
+    assert asyncio.run(main()) == "answer:q:ctx"
+    assert emb.calls == 1  # the cache lookup's embedding is reused for retrieval
+    assert len(cache.threads) == 4 and threading.main_thread() not in cache.threads
+    assert cache.generation("u") == 1
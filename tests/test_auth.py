@@ -0,0 +1,92 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import HTTPException
+from integrations.supabase.auth import AuthService
+
+class JwksStub(BaseHTTPRequestHandler):
+    keys: dict = {}  # kid → private key
+    fetches = 0
+
+    def do_GET(self) -> None:
+        type(self).fetches += 1
+        jwks = {"keys": [
+            {**json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(k.public_key())), "kid": kid, "alg": "RS256"}
+            for kid, k in self.keys.items()
+        ]}
+        raw = json.dumps(jwks).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def log_message(self, *args) -> None:
+        pass
+
+@pytest.fixture
+def issuer(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), JwksStub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    monkeypatch.setenv("SUPABASE_URL", url)
+    monkeypatch.setenv("SUPABASE_SERVICE_KEY", "x")
+    JwksStub.keys = {"k1": rsa.generate_private_key(public_exponent=65537, key_size=2048)}
+    JwksStub.fetches = 0
+
+    def token(kid="k1", ttl=60, sub="u1"):
+        claims = {"sub": sub, "aud": url, "exp": int(time.time()) + ttl}
+        return jwt.encode(claims, JwksStub.keys[kid], algorithm="RS256", headers={"kid": kid})
+
+    yield token
+    server.shutdown()
+
+def test_claims_are_cached_until_exp(issuer, monkeypatch):
+    auth = AuthService(jwks_refresh=3600)
+    auth.start()
+    assert JwksStub.fetches == 1
+    decode = jwt.decode
+    calls = []
+    monkeypatch.setattr(jwt, "decode", lambda *a, **kw: calls.append(1) or decode(*a, **kw))
+
+    tok = issuer(ttl=1)
+    assert auth.verify_jwt(tok)["sub"] == "u1"
+    assert auth.verify_jwt(tok)["sub"] == "u1"
+    assert len(calls) == 1 and auth.stats()["hits"] == 1
+
+    time.sleep(max(0.0, jwt.decode(tok, options={"verify_signature": False})["exp"] - time.time() + 0.05))
+    with pytest.raises(HTTPException) as err:
+        auth.verify_jwt(tok)  # the cache entry expired with the token; verification rejects it
+    assert err.value.status_code == 401 and len(calls) == 3
+
+def test_dependency_refetches_jwks_for_a_rotated_kid_but_not_for_forged_ones(issuer):
+    auth = AuthService(jwks_refresh=3600, jwks_min_refetch=60)
+    dep = auth.fastapi_dependency()
+    assert asyncio.run(dep(issuer()))["sub"] == "u1"
+    assert JwksStub.fetches == 1
+
+    JwksStub.keys["k2"] = rsa.generate_private_key(public_exponent=65537, key_size=2048)  # rotation
+    assert asyncio.run(dep(issuer(kid="k2", sub="u2")))["sub"] == "u2"
+    assert JwksStub.fetches == 2
+
+    forged = jwt.encode({"sub": "x"}, JwksStub.keys["k2"], algorithm="RS256", headers={"kid": "nope"})
+    for _ in range(3):
+        with pytest.raises(HTTPException):
+            asyncio.run(dep(forged))
+    assert JwksStub.fetches == 2  # refetches for unknown kids are rate-limited
+
+def test_cache_size_zero_disables_the_claims_cache(issuer, monkeypatch):
+    auth = AuthService(cache_size=0, jwks_refresh=3600)
+    decode = jwt.decode
+    calls = []
+    monkeypatch.setattr(jwt, "decode", lambda *a, **kw: calls.append(1) or decode(*a, **kw))
+
+    tok = issuer()
+    for _ in range(2):
+        assert asyncio.run(auth.fastapi_dependency()(tok))["sub"] == "u1"
+    assert len(calls) == 2 and auth.stats()["cached_tokens"] == 0
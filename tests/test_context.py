@@ -0,0 +1,23 @@
+from core.schema import Chunk
+from core.strategies.context import ContextPacker
+from core.tokenizer import tokenizer
+
+TEXT = " ".join(f"word{i}" for i in range(400))
+
+def test_packer_merges_neighbours_and_respects_budget():
+    a = Chunk(id="a", text=TEXT[:1200], index=0, source="doc")
+    b = Chunk(id="b", text=TEXT[900:2100], index=1, source="doc")
+    other = Chunk(id="o", text="unrelated passage " * 20, index=0, source="other")
+
+    packed = ContextPacker(max_tokens=10_000).pack([b, other, a])
+    assert packed.texts == [TEXT[:2100], other.text]
+    assert packed.chunk_ids == ["b", "o", "a"]
+    assert packed.tokens_saved > 0 and packed.dropped == 0
+
+    budget = len(tokenizer().encode_ordinary(b.text)) + 5
+    tight = ContextPacker(max_tokens=budget).pack([b, other, a])
+    assert tight.tokens <= budget and tight.dropped >= 1
+    assert tight.texts[0] == b.text
+
+    cut = ContextPacker(max_tokens=10).pack([a])
+    assert cut.tokens == 10 and TEXT.startswith(cut.texts[0])
@@ -0,0 +1,118 @@
+import asyncio
+import io
+import json
+from typing import Sequence
+import httpx
+from docx import Document
+from core.ingestion.base import IngestParams
+from core.ingestion.manifest import IngestManifest
+from core.ingestion.pipeline import IngestPipeline
+from core.vector_stores.base import EmbeddingModel
+from core.vector_stores.numpy_store import NumpyVectorStore
+from integrations.dropbox import DropboxSync
+
+class LengthEmbed(EmbeddingModel):
+    async def embed_texts(self, texts: Sequence[str]) -> Sequence[Sequence[float]]:
+        return [[float(len(t)), 1.0, 0.0] for t in texts]
+
+class FakeRepo:
+    def __init__(self, rows: dict[str, dict]) -> None:
+        self.rows = rows
+
+    async def aget(self, table, filters="", limit=None):
+        account = filters.split("=", 1)[1]
+        return [dict(self.rows[account])] if account in self.rows else []
+
+    async def aupdate(self, table, patch, eq):
+        self.rows[eq["account_id"]].update(patch)
+
+    async def aclose(self):
+        pass
+
+class StubDropbox:
+    """list_folder / continue / download over an in-memory change log."""
+
+    def __init__(self) -> None:
+        self.files: dict[str, bytes] = {}
+        self.log: list[dict] = []
+        self.calls: list[str] = []
+
+    def put(self, path: str, data: bytes) -> None:
+        self.files[path] = data
+        self.log.append({".tag": "file", "name": path.rsplit("/", 1)[-1], "path_display": path,
+                         "path_lower": path.lower(), "id": f"id:{path}"})
+
+    def delete(self, path: str) -> None:
+        self.files = {p: d for p, d in self.files.items() if p != path and not p.startswith(path + "/")}
+        self.log.append({".tag": "deleted", "name": path.rsplit("/", 1)[-1], "path_display": path,
+                         "path_lower": path.lower()})
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        assert request.headers["Authorization"] == "Bearer tok"
+        endpoint = request.url.path.split("/2/", 1)[1]
+        self.calls.append(endpoint)
+        if endpoint == "files/download":
+            path = json.loads(request.headers["Dropbox-API-Arg"])["path"].removeprefix("id:")
+            return httpx.Response(200, content=self.files[path])
+        if endpoint == "files/list_folder":
+            entries = [e for e in self.log if e[".tag"] == "file" and e["path_display"] in self.files]
+            return httpx.Response(200, json={"entries": entries, "cursor": str(len(self.log)), "has_more": False})
+        start = int(json.loads(request.content)["cursor"])
+        end = min(start + 3, len(self.log))
+        return httpx.Response(200, json={"entries": self.log[start:end], "cursor": str(end),
+                                         "has_more": end < len(self.log)})
+
+def _docx(paragraphs: int) -> bytes:
+    doc = Document()
+    for i in range(paragraphs):
+        doc.add_paragraph(f"Paragraph {i} about pumps, valves and maintenance schedules.")
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+def test_sync_debounces_persists_cursor_and_deletes_removed_files(tmp_path, monkeypatch):
+    from src import config
+
+    monkeypatch.setattr(config, "DROPBOX_API_URL", "http://stub/2")
+    monkeypatch.setattr(config, "DROPBOX_CONTENT_URL", "http://stub/2")
+    dropbox = StubDropbox()
+    dropbox.put("/Manuals/pump.docx", _docx(30))
+    dropbox.put("/Manuals/valve.docx", _docx(20))
+    dropbox.put("/notes.txt", b"not ingestible")
+    repo = FakeRepo({"acct": {"account_id": "acct", "user_id": "u1", "access_token": "tok", "cursor": None}})
+    store = NumpyVectorStore(LengthEmbed(), path=str(tmp_path / "vectors"), background_compaction=False)
+    manifest = IngestManifest(str(tmp_path / "m.sqlite"))
+    pipeline = IngestPipeline(
+        store, LengthEmbed(), parse_workers=1, batch_size=8,
+        params=IngestParams(chunk_size=64, overlap=8), manifest=manifest,
+    )
+
+    def sources():
+        return {h.chunk.source for h in store.query_many(["x"], "u1", k=1000)[0]}
+
+    async def scenario():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(dropbox.handler))
+        sync = DropboxSync(repo, pipeline, debounce=0.05, client=client)
+        for _ in range(5):  # a webhook storm
+            sync.notify(["acct"])
+        await sync.idle()
+        assert dropbox.calls.count("files/list_folder") == 1 and dropbox.calls.count("files/download") == 2
+        assert repo.rows["acct"]["cursor"] == "3"
+        assert await asyncio.to_thread(sources) == {"Manuals/pump.docx", "Manuals/valve.docx"}
+
+        dropbox.calls.clear()
+        dropbox.delete("/Manuals")
+        dropbox.put("/Specs/seal.docx", _docx(10))
+        dropbox.put("/Specs/seal.docx", _docx(12))  # edited twice in one page: downloaded once
+        dropbox.put("/Specs/gasket.docx", _docx(10))  # second page
+        for _ in range(3):
+            sync.notify(["acct", "unknown"])
+        await sync.idle()
+        assert dropbox.calls == ["files/list_folder/continue", "files/download"] * 2
+        assert repo.rows["acct"]["cursor"] == "7"
+        await sync.aclose()
+        await client.aclose()
+
+    asyncio.run(scenario())
+    assert sources() == {"Specs/seal.docx", "Specs/gasket.docx"}
+    assert sorted(manifest.sources("u1")) == ["Specs/gasket.docx", "Specs/seal.docx"]
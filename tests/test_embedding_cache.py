@@ -0,0 +1,43 @@
+import asyncio
+from typing import Sequence
+from core.embedding_cache import CachedEmbedding, EmbeddingCache
+
+class CountingEmbed:
+    model = "dummy"
+    dimensions = 3
+
+    def __init__(self):
+        self.seen: list[str] = []
+
+    def embed_texts(self, texts: Sequence[str]) -> Sequence[Sequence[float]]:
+        self.seen.extend(texts)
+        return [[float(len(t))] * 3 for t in texts]
+
+def test_cache_hits_and_persistence(tmp_path):
+    path = str(tmp_path / "emb.sqlite")
+    inner = CountingEmbed()
+    emb = CachedEmbedding(inner, EmbeddingCache(path))
+
+    first = asyncio.run(emb.embed_texts(["a", "bb", "a"]))
+    assert first == [[1.0] * 3, [2.0] * 3, [1.0] * 3]
+    assert inner.seen == ["a", "bb"]
+
+    asyncio.run(emb.embed_texts(["bb", "ccc"]))
+    assert inner.seen == ["a", "bb", "ccc"]
+    assert emb.cache.stats()["hits"] == 1
+
+    # fresh process: served from disk
+    inner2 = CountingEmbed()
+    emb2 = CachedEmbedding(inner2, EmbeddingCache(path))
+    assert asyncio.run(emb2.embed_texts(["ccc"])) == [[3.0] * 3]
+    assert inner2.seen == []
+
+def test_cache_evicts_by_size(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "emb.sqlite"), max_bytes=12 * 10, memory_items=2)
+    keys = [EmbeddingCache.key("m", 3, str(i)) for i in range(20)]
+    for k in keys:
+        cache.put_many([k], [[0.5] * 3])
+    assert cache.stats()["disk_bytes"] <= 12 * 10
+    assert cache.stats()["memory_items"] == 2
+    assert cache.get_many(keys[:1]) == [None]
+    assert cache.get_many(keys[-1:]) == [[0.5] * 3]
@@ -0,0 +1,43 @@
+import asyncio
+from types import SimpleNamespace
+import httpx
+import openai
+from core.embeddings import OpenAIEmbedding
+
+class FakeEmbeddings:
+    def __init__(self, fail_first: int = 0):
+        self.calls: list[list[str]] = []
+        self.in_flight = 0
+        self.peak = 0
+        self._fail = fail_first
+
+    async def create(self, model, input, encoding_format, **kw):
+        self.calls.append(input)
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        if self._fail:
+            self._fail -= 1
+            resp = httpx.Response(429, request=httpx.Request("POST", "http://fake"))
+            raise openai.RateLimitError("slow down", response=resp, body=None)
+        data = [SimpleNamespace(index=i, embedding=[float(t)]) for i, t in enumerate(input)]
+        return SimpleNamespace(data=list(reversed(data)))
+
+def test_batches_run_concurrently_and_keep_order():
+    fake = FakeEmbeddings()
+    emb = OpenAIEmbedding(model="m", batch=10, concurrency=4, client=SimpleNamespace(embeddings=fake))
+    texts = [str(i) for i in range(95)]
+    out = asyncio.run(emb.embed_texts(texts))
+    assert [v[0] for v in out] == [float(t) for t in texts]
+    assert len(fake.calls) == 10
+    assert fake.peak == 4
+
+def test_retries_rate_limited_batch(monkeypatch):
+    async def no_sleep(_):
+        return None
+    fake = FakeEmbeddings(fail_first=2)
+    emb = OpenAIEmbedding(model="m", client=SimpleNamespace(embeddings=fake))
+    monkeypatch.setattr("core.embeddings.asyncio.sleep", no_sleep)
+    assert asyncio.run(emb.embed_texts(["1", "2"])) == [[1.0], [2.0]]
+    assert len(fake.calls) == 3
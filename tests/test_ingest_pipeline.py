@@ -0,0 +1,139 @@
+import asyncio
+import os
+from typing import Sequence
+from docx import Document
+from core.ingestion import pipeline as pipeline_module
+from core.ingestion.base import IngestParams
+from core.ingestion.pipeline import IngestPipeline
+from core.vector_stores.base import EmbeddingModel
+from core.vector_stores.numpy_store import NumpyVectorStore
+
+class LengthEmbed(EmbeddingModel):
+    async def embed_texts(self, texts: Sequence[str]) -> Sequence[Sequence[float]]:
+        await asyncio.sleep(0.01)
+        return [[float(len(t)), 1.0, 0.0] for t in texts]
+
+def _docx(path, paragraphs: int) -> None:
+    doc = Document()
+    for i in range(paragraphs):
+        doc.add_paragraph(f"Paragraph {i} about pumps, valves and maintenance schedules.")
+    doc.save(path)
+
+def test_pipeline_ingests_files_and_skips_broken_ones(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    for n in range(4):
+        _docx(docs / f"manual{n}.docx", 30)
+    (docs / "broken.pdf").write_bytes(b"not a pdf")
+
+    store = NumpyVectorStore(LengthEmbed(), path=str(tmp_path / "vectors"), background_compaction=False)
+    pipeline = IngestPipeline(
+        store, LengthEmbed(), parse_workers=2, embed_workers=2, upsert_workers=2,
+        batch_size=8, queue_size=2, params=IngestParams(chunk_size=64, overlap=8),
+    )
+    report = asyncio.run(pipeline.run(sorted(docs.iterdir()), "tenant"))
+
+    assert report.files == 4 and report.failed == [str(docs / "broken.pdf")]
+    assert report.chunks > 8 and [s["stage"] for s in report.stages] == ["parse", "embed", "upsert"]
+    hits = store.query_many(["x"], "tenant", k=1000)[0]
+    assert len({h.chunk.id for h in hits}) == report.chunks
+    assert {h.chunk.source for h in hits} == {f"manual{n}.docx" for n in range(4)}
+
+def test_manifest_skips_unchanged_and_deletes_stale(tmp_path):
+    from core.ingestion.manifest import IngestManifest
+
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    for n in range(3):
+        _docx(docs / f"manual{n}.docx", 30)
+    store = NumpyVectorStore(LengthEmbed(), path=str(tmp_path / "vectors"), background_compaction=False)
+    manifest = IngestManifest(str(tmp_path / "m.sqlite"))
+    pipeline = IngestPipeline(
+        store, LengthEmbed(), parse_workers=2, batch_size=8,
+        params=IngestParams(chunk_size=64, overlap=8), manifest=manifest,
+    )
+
+    def ids():
+        return {h.chunk.id for h in store.query_many(["x"], "t", k=1000)[0]}
+
+    first = asyncio.run(pipeline.run(sorted(docs.iterdir()), "t"))
+    before = ids()
+    again = asyncio.run(pipeline.run(sorted(docs.iterdir()), "t"))
+    assert again.unchanged == 3 and again.chunks == 0 and ids() == before
+
+    _docx(docs / "manual0.docx", 20)  # shorter: its tail chunks go stale
+    (docs / "manual2.docx").unlink()
+    changed = asyncio.run(pipeline.run(sorted(docs.iterdir()), "t", prune=True))
+    assert changed.unchanged == 1 and 0 < changed.chunks < first.chunks and changed.deleted > 0
+    assert {c.split("_")[0] for c in ids()} == {"manual0", "manual1"}
+    assert ids() == manifest.chunk_ids("t", "manual0.docx") | manifest.chunk_ids("t", "manual1.docx")
+    assert sorted(manifest.sources("t")) == ["manual0.docx", "manual1.docx"]
+
+def test_same_name_in_different_folders_keeps_both(tmp_path):
+    import pytest
+    from core.ingestion.manifest import IngestManifest
+
+    docs = tmp_path / "docs"
+    for year, paragraphs in (("2023", 20), ("2024", 30)):  # the shorter one's chunks are shared
+        (docs / year).mkdir(parents=True)
+        _docx(docs / year / "report.docx", paragraphs)
+    paths = sorted(docs.rglob("*.docx"))
+    store = NumpyVectorStore(LengthEmbed(), path=str(tmp_path / "vectors"), background_compaction=False)
+    manifest = IngestManifest(str(tmp_path / "m.sqlite"))
+    pipeline = IngestPipeline(
+        store, LengthEmbed(), parse_workers=2, batch_size=8,
+        params=IngestParams(chunk_size=64, overlap=8), manifest=manifest,
+    )
+
+    def ids():
+        return {h.chunk.id for h in store.query_many(["x"], "t", k=1000)[0]}
+
+    for root in (None, {p: p.parent for p in paths}):  # one root, or a root per path: both give "report.docx"
+        with pytest.raises(ValueError, match="report.docx"):
+            asyncio.run(pipeline.run(paths, "t", root=root))
+
+    asyncio.run(pipeline.run(paths, "t", root=docs))
+    again = asyncio.run(pipeline.run(paths, "t", root=docs, prune=True))
+    assert again.unchanged == 2 and again.chunks == 0 and again.deleted == 0
+    assert sorted(manifest.sources("t")) == ["2023/report.docx", "2024/report.docx"]
+    assert {c.split("_")[0] for c in ids()} == {"report"}  # ids keep the file stem
+
+    _docx(docs / "2024" / "report.docx", 5)  # its chunks that 2023 still holds must survive
+    asyncio.run(pipeline.run(paths, "t", root=docs))
+    assert manifest.chunk_ids("t", "2023/report.docx") <= ids()
+    (docs / "2023" / "report.docx").unlink()
+    asyncio.run(pipeline.run(paths[1:], "t", root=docs, prune=True))
+    assert ids() == manifest.chunk_ids("t", "2024/report.docx")
+
+def _parse_or_die(path, name, params, known_hash):
+    if name == "boom.docx":
+        os._exit(1)  # like a worker killed past its memory cap
+    return _real_parse(path, name, params, known_hash)
+
+_real_parse = pipeline_module._parse
+
+def test_dead_parse_worker_fails_only_its_file(tmp_path, monkeypatch):
+    import resource
+    from src import config
+
+    monkeypatch.setattr(config, "PDF_WORKER_MAX_MB", 512)
+    monkeypatch.setattr(pipeline_module, "_parse", _parse_or_die)
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    for n in range(4):
+        _docx(docs / f"manual{n}.docx", 30)
+    _docx(docs / "boom.docx", 5)
+
+    pool = pipeline_module._ParsePool(1)
+    capped = pool._executor.submit(resource.getrlimit, resource.RLIMIT_AS).result()[0]
+    pool.shutdown()
+    assert capped != resource.RLIM_INFINITY  # parse workers run under the memory cap
+
+    store = NumpyVectorStore(LengthEmbed(), path=str(tmp_path / "vectors"), background_compaction=False)
+    pipeline = IngestPipeline(
+        store, LengthEmbed(), parse_workers=2, batch_size=8, params=IngestParams(chunk_size=64, overlap=8),
+    )
+    report = asyncio.run(pipeline.run(sorted(docs.iterdir()), "tenant"))
+    assert report.failed == [str(docs / "boom.docx")] and report.files == 4
+    hits = store.query_many(["x"], "tenant", k=1000)[0]
+    assert {h.chunk.source for h in hits} == {f"manual{n}.docx" for n in range(4)}
@@ -17,3 +17,128 @@ def test_chunking():
 
     ids = [c.id for c in batch]
     assert len(set(ids)) == len(batch)
+
+
+def test_streaming_chunker_matches_whole_document_windows(monkeypatch):
+    import hashlib
+    from core.ingestion import base
+    from core.tokenizer import tokenizer
+
+    text = "".join(
+        f"Section {i}\nLorem ipsum, 'twas 123 — café 中文 😀\n\n  - item {i}.\n" for i in range(200)
+    )
+    params = IngestParams(chunk_size=40, overlap=7)
+    monkeypatch.setattr(base, "_SEGMENT_CHARS", 64)  # force many incremental segments
+    pages = [text[i : i + 500] for i in range(0, len(text), 500)]
+    got = [(c.id, c.text, c.index) for c in TextIngestor(params)._chunk(pages, "dir/manual.pdf")]
+
+    enc = tokenizer()
+    tokens = enc.encode(text)
+    expected = []
+    for i in range(0, len(tokens), 33):
+        window = enc.decode(tokens[i : i + 40])
+        expected.append((f"manual_{hashlib.md5(window.encode()).hexdigest()[:12]}", window, i // 33))
+    assert got == expected
+
+
+def _pdf(pages: list[str]) -> bytes:
+    """Minimal PDF with one line of Helvetica text per page."""
+    n = len(pages)
+    objs = [b"<< /Type /Catalog /Pages 2 0 R >>"]
+    kids = " ".join(f"{3 + 2 * i} 0 R" for i in range(n))
+    objs.append(f"<< /Type /Pages /Kids [{kids}] /Count {n} >>".encode())
+    for i, text in enumerate(pages):
+        objs.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {4 + 2 * i} 0 R"
+            f" /Resources << /Font << /F1 {3 + 2 * n} 0 R >> >> >>".encode()
+        )
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode()
+        objs.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+    objs.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    out, offsets = bytearray(b"%PDF-1.4\n"), []
+    for num, body in enumerate(objs, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (num, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objs) + 1)
+    out += b"".join(b"%010d 00000 n \n" % o for o in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objs) + 1, xref)
+    return bytes(out)
+
+
+def test_pdf_pages_are_chunk_metadata_and_parallel_matches_serial():
+    from core.ingestion.pdf_ingestor import PdfIngestor
+
+    pages = [f"Page {i} covers pump {i} and its valve maintenance schedule" for i in range(1, 11)]
+    pages[4] = ""  # blank page: skipped, but numbering continues
+    data = _pdf(pages)
+    params = IngestParams(chunk_size=12, overlap=2)
+
+    serial = PdfIngestor(params, workers=1).ingest_bytes(data, "manual.pdf").chunks
+    parallel = PdfIngestor(params, workers=2, pages_per_task=3, parallel_min_pages=1).ingest_bytes(
+        data, "manual.pdf"
+    ).chunks
+
+    assert serial == parallel
+    assert serial[0].page_start == 1
+    assert serial[-1].page_end == 10
+    for c in serial:
+        assert c.page_start <= c.page_end
+        for p, text in enumerate(pages, 1):
+            if text and f"pump {p} " in c.text:
+                assert c.page_start <= p <= c.page_end
+
+
+def test_xlsx_streams_rows_with_sheet_as_page():
+    from io import BytesIO
+    import openpyxl
+    from core.ingestion.xlsx_ingestor import XlsxIngestor
+
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Pumps"
+    ws.append(["id", "name", "pressure"])
+    for i in range(40):
+        ws.append([i, f"pump {i}", 1.5 + i if i % 5 else None])
+    ws.append([None, "   ", None])  # blank row
+    wb.create_sheet("Notes").append(["check seals monthly"])
+    buf = BytesIO()
+    wb.save(buf)
+
+    ingestor = XlsxIngestor(IngestParams(chunk_size=30, overlap=5), rows_per_section=7)
+    text = ingestor._convert_to_markdown(buf.getvalue())
+    lines = text.split("\n")
+    assert lines[:3] == ["# Pumps", "id | name | pressure", "0 | pump 0"]
+    assert lines[3] == "1 | pump 1 | 2.5"
+    assert lines[-2:] == ["# Notes", "check seals monthly"]
+    assert len(lines) == 44
+
+    chunks = ingestor.ingest_bytes(buf.getvalue(), "inventory.xlsx").chunks
+    assert chunks[0].page_start == 1
+    assert chunks[-1].page_end == 2
+    assert [c.id for c in chunks] == [c.id for c in ingestor._chunk(text, "inventory.xlsx")]
+
+def test_xlsx_sparse_rows_keep_column_positions():
+    from io import BytesIO
+    import openpyxl
+    from core.ingestion.xlsx_ingestor import XlsxIngestor
+
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Checks"
+    ws.append(["part", "due", "done", "notes"])
+    ws.append(["seal", None, True, None])
+    ws.append([None, 3.0, False, "  "])
+    ws.append([None, None, None, "replace gasket"])
+    ws.append([None, None, None, None])
+    buf = BytesIO()
+    wb.save(buf)
+
+    lines = XlsxIngestor()._convert_to_markdown(buf.getvalue()).split("\n")
+    assert lines == [
+        "# Checks",
+        "part | due | done | notes",
+        "seal |  | True",
+        " | 3 | False",
+        " |  |  | replace gasket",
+    ]
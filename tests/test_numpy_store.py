@@ -0,0 +1,77 @@
+from typing import Sequence
+from core.schema import Chunk, DocumentBatch
+from core.vector_stores.base import EmbeddingModel
+from core.vector_stores.numpy_store import NumpyVectorStore
+
+class AxisEmbed(EmbeddingModel):
+    # "t<n>" -> one-hot on axis n, so the nearest neighbour is exact
+    def embed_texts(self, texts: Sequence[str]) -> Sequence[Sequence[float]]:
+        out = []
+        for t in texts:
+            v = [0.0] * 8
+            v[int(t[1:]) % 8] = 1.0
+            out.append(v)
+        return out
+
+def _batch(*ids: int) -> DocumentBatch:
+    return DocumentBatch(source="s", chunks=[Chunk(id=f"c{i}", text=f"t{i}", index=i, source="s") for i in ids])
+
+def test_upsert_query_delete_and_reopen(tmp_path):
+    store = NumpyVectorStore(AxisEmbed(), path=str(tmp_path), background_compaction=False)
+    store.upsert(_batch(0, 1, 2), "u")
+    store.upsert(_batch(3, 4), "u")
+    assert [c.id for c in store.query("t3", "u", 1)] == ["c3"]
+    assert store.query("t3", "other", 1) == []
+
+    store.delete(["c3"], "u")
+    assert "c3" not in [c.id for c in store.query("t3", "u", 5)]
+
+    reopened = NumpyVectorStore(AxisEmbed(), path=str(tmp_path))
+    assert [c.id for c in reopened.query("t4", "u", 1)] == ["c4"]
+    assert len(reopened.query("t0", "u", 10)) == 4
+
+def test_compaction_with_ivf_keeps_live_rows(tmp_path):
+    store = NumpyVectorStore(
+        AxisEmbed(), path=str(tmp_path), ivf_threshold=16, nprobe=16, max_segments=2,
+        background_compaction=False, dtype="float16",
+    )
+    for lo in range(0, 40, 10):
+        store.upsert(_batch(*range(lo, lo + 10)), "u")
+    store.delete(["c5"], "u")
+    store.compact("u")
+    assert len(list((tmp_path / "u").glob("*.vec"))) == 1
+    hits = [c.id for c in store.query("t5", "u", 10)]
+    assert "c5" not in hits and "c13" in hits
+
+def test_query_many_embeds_once_and_scores(tmp_path):
+    class Counting(AxisEmbed):
+        calls = 0
+
+        def embed_texts(self, texts):
+            Counting.calls += 1
+            return super().embed_texts(texts)
+
+    store = NumpyVectorStore(Counting(), path=str(tmp_path), background_compaction=False)
+    store.upsert(_batch(0, 1, 2, 3), "u")
+    Counting.calls = 0
+    out = store.query_many(["t1", "t2", "t3"], "u", 2)
+    assert Counting.calls == 1
+    assert [hits[0].chunk.id for hits in out] == ["c1", "c2", "c3"]
+    assert abs(out[0][0].score - 1.0) < 1e-6 and out[0][1].score < out[0][0].score
+
+def test_namespaces_stay_inside_the_store_and_reads_create_nothing(tmp_path):
+    import pytest
+    root = tmp_path / "vectors"
+    store = NumpyVectorStore(AxisEmbed(), path=str(root), background_compaction=False)
+    assert store.query("t1", "nobody", 1) == []
+    store.delete(["c1"], "nobody")
+    assert not root.exists()
+
+    store.upsert(_batch(1), "../escape")
+    store.upsert(_batch(2), "a/b")
+    assert sorted(p.name for p in root.iterdir()) == ["..%2Fescape", "a%2Fb"]
+    assert not (tmp_path / "escape").exists()
+    assert [c.id for c in store.query("t2", "a/b", 1)] == ["c2"]
+    for bad in ("", ".", ".."):
+        with pytest.raises(ValueError):
+            store.query("t1", bad, 1)
@@ -1,5 +1,5 @@
 from typing import Sequence
-from core.schema import Chunk, DocumentBatch
+from core.schema import Chunk, DocumentBatch, ScoredChunk
 from core.vector_stores.base import BaseVectorStore, EmbeddingModel
 from core.orchestrator import RagOrchestrator
 
@@ -32,3 +32,100 @@ def test_orchestrator_answer():
     rag = RagOrchestrator(store, gen, emb)
     out = rag.answer("q", user_id="u", k=1, trace=False)
     assert out.startswith("answer:q:")
+
+class StreamGen(EchoGen):
+    async def stream(self, query: str, context: Sequence[str]):
+        for part in ("ans", "wer"):
+            yield part
+
+def test_orchestrator_stream():
+    import asyncio
+    emb = DummyEmbed()
+    order = []
+
+    class OrderedRerank:
+        def run(self, query, chunks, top_n=6):
+            order.append("reranking")
+            return list(chunks)[:top_n]
+
+    rag = RagOrchestrator(MemoryStore(emb), StreamGen(), emb, rerank=OrderedRerank())
+
+    async def collect():
+        events = []
+        async for name, payload in rag.answer_stream("q", user_id="u", k=1, trace=True):
+            order.append(name)
+            events.append((name, payload))
+        return events
+
+    events = asyncio.run(collect())
+    assert order == ["retrieval", "reranking", "rerank", "token", "token", "done"]
+    assert "".join(p["text"] for name, p in events if name == "token") == "answer"
+    assert events[-1][1]["ttft_ms"] >= 0
+    assert [s["ms"] for s in events[-1][1]["spans"] if s["stage"] == "ttft"] == [events[-1][1]["ttft_ms"]]
+
+class ScoredStore(MemoryStore):
+    def __init__(self, embedding: EmbeddingModel, score: float):
+        super().__init__(embedding)
+        self._score = score
+
+    async def query_many_async(self, texts, namespace, k=6, embeds=None):
+        return [[ScoredChunk(c, self._score) for c in self._chunks[:k]] for _ in texts]
+
+class CountingExpansion:
+    calls = 0
+
+    async def run(self, query: str):
+        CountingExpansion.calls += 1
+        return ["q2"]
+
+class CountingRerank:
+    calls = 0
+
+    def run(self, query, chunks, top_n=6):
+        CountingRerank.calls += 1
+        return list(chunks)[:top_n]
+
+def test_adaptive_skips_stages_on_confident_hit():
+    emb = DummyEmbed()
+    for score, skipped in ((0.95, {"expansion", "rerank"}), (0.5, set())):
+        CountingExpansion.calls = CountingRerank.calls = 0
+        rag = RagOrchestrator(
+            ScoredStore(emb, score), EchoGen(), emb, CountingExpansion(), CountingRerank(),
+            skip_expansion_above=0.9, skip_rerank_above=0.9,
+        )
+        out = rag.answer("q", user_id="u", k=1, trace=True)
+        assert set(out["skipped"]) == skipped
+        assert out["chunks"][0]["score"] == score
+        assert CountingExpansion.calls == CountingRerank.calls == (0 if skipped else 1)
+
+def test_trace_reports_stage_spans_with_sizes():
+    from core import telemetry
+
+    emb = DummyEmbed()
+    rag = RagOrchestrator(ScoredStore(emb, 0.5), EchoGen(), emb, CountingExpansion(), CountingRerank())
+    out = rag.answer("q", user_id="u", k=1, trace=True)
+    spans = {s["stage"]: s for s in out["spans"]}
+    assert list(spans) == ["expansion", "retrieval", "rerank", "context", "generation", "answer"]
+    assert spans["expansion"]["queries"] == 1 and spans["retrieval"]["queries"] == 2
+    assert spans["rerank"]["candidates"] == 1 and spans["rerank"]["top"] == 1
+    assert spans["generation"]["tokens"] > 0 and all(s["ms"] >= 0 for s in out["spans"])
+    if telemetry._metrics is None:  # untraced calls record nothing
+        assert telemetry.span("rerank") is telemetry.span("generation")
+
+def test_neighbours_are_fetched_off_the_loop():
+    import threading
+    emb = DummyEmbed()
+    seen = {}
+
+    class Docstore:
+        def neighbours(self, namespace, chunks, window):
+            seen["thread"] = threading.current_thread()
+            return [Chunk(id="n", text="next", index=1, source="s")]
+
+    class ContextGen:
+        def run(self, query, context):
+            return "|".join(context)
+
+    rag = RagOrchestrator(MemoryStore(emb), ContextGen(), emb, docstore=Docstore(), neighbours=1)
+    assert rag.answer("q", user_id="u", k=1) == "ctx|next"
+    assert seen["thread"] is not threading.main_thread()
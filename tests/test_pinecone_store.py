@@ -0,0 +1,137 @@
+import asyncio
+import json
+from types import SimpleNamespace
+from typing import Sequence
+from core.docstore import SqliteDocStore
+from core.schema import Chunk, DocumentBatch
+from core.vector_stores.pinecone_store import PineconeVectorStore
+
+DIM = 256
+
+class SlowEmbed:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    async def embed_texts(self, texts: Sequence[str]) -> Sequence[Sequence[float]]:
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return [[0.123456789012345678] * DIM for _ in texts]
+
+class FakeAsyncIndex:
+    def __init__(self, fail_first: int = 0) -> None:
+        self.requests: list[int] = []  # serialized bytes per accepted request
+        self.stored: dict[str, dict] = {}
+        self.in_flight = self.peak = 0
+        self.fail_first = fail_first
+
+    async def upsert(self, vectors, namespace):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(0.005)
+            if self.fail_first:
+                self.fail_first -= 1
+                raise ConnectionError("transient")
+            body = json.dumps({"namespace": namespace, "vectors": [
+                {"id": i, "values": list(v), "metadata": m} for i, v, m in vectors
+            ]})
+            self.requests.append(len(body))
+            self.stored.update({i: m for i, _, m in vectors})
+        finally:
+            self.in_flight -= 1
+
+    async def query(self, vector, top_k, namespace, include_metadata):
+        return {"matches": [{"id": i, "score": 0.9, "metadata": m} for i, m in list(self.stored.items())[:top_k]]}
+
+    async def delete(self, ids, namespace):
+        for i in ids:
+            self.stored.pop(i, None)
+
+    async def close(self):
+        pass
+
+class FakePinecone:
+    def __init__(self, index: FakeAsyncIndex) -> None:
+        self._index = index
+
+    def list_indexes(self):
+        return SimpleNamespace(names=lambda: ["rag-index"])
+
+    def Index(self, name):
+        return object()
+
+    def describe_index(self, name):
+        return SimpleNamespace(host="fake")
+
+    def IndexAsyncio(self, host):
+        return self._index
+
+def test_upsert_packs_requests_by_bytes_runs_concurrently_and_retries_alone(monkeypatch):
+    from src import config
+
+    monkeypatch.setattr(config, "PINECONE_UPSERT_MAX_BYTES", 200_000)
+    monkeypatch.setattr(config, "PINECONE_UPSERT_EMBED_BATCH", 50)
+    index = FakeAsyncIndex(fail_first=1)
+    embed = SlowEmbed()
+    store = PineconeVectorStore(embed, pc=FakePinecone(index), upsert_concurrency=3)
+    chunks = [Chunk(id=f"c{i}", text="pump " * (20 + i % 300), index=i, source="m.pdf") for i in range(400)]
+    changed = []
+    store.on_change(changed.append)
+
+    stats = store.upsert(DocumentBatch(source="m.pdf", chunks=chunks), "ns")
+
+    assert set(index.stored) == {c.id for c in chunks} and stats.vectors == 400
+    assert embed.calls == 8 and stats.retries == 1
+    assert stats.batches == len(index.requests) > 8  # payload-sized, not one request per group
+    assert max(index.requests) <= 200_000
+    assert 1 < index.peak <= 3
+    assert changed == ["ns"]
+
+def test_docstore_keeps_texts_out_of_metadata_and_hydrates_hits(tmp_path):
+    index = FakeAsyncIndex()
+    index.stored["legacy"] = {"text": "old pump notes", "index": 0.0, "source": "old.pdf"}  # written before the docstore
+    docstore = SqliteDocStore(str(tmp_path / "docs.sqlite"))
+    store = PineconeVectorStore(SlowEmbed(), pc=FakePinecone(index), docstore=docstore)
+    chunks = [Chunk(id=f"c{i}", text=f"valve part {i}", index=i, source="m.pdf", page_start=1, page_end=1) for i in range(5)]
+
+    async def run():
+        await store.upsert_async(DocumentBatch(source="m.pdf", chunks=chunks), "ns")
+        hits = (await store.query_many_async(["valve"], "ns", k=6))[0]
+        await store.delete_async(["c4"], "ns")
+        return hits
+
+    hits = asyncio.run(run())
+    assert all("text" not in index.stored[c.id] for c in chunks[:4])
+    assert {h.chunk for h in hits} == {*chunks, Chunk(id="legacy", text="old pump notes", index=0, source="old.pdf")}
+    assert docstore.get_many("ns", ["c3", "c4"]) == {"c3": chunks[3]} and docstore.get_many("other", ["c3"]) == {}
+    assert docstore.neighbours("ns", [chunks[1], chunks[2]], window=2) == [chunks[0], chunks[3]]
+
+class ApiError(Exception):
+    def __init__(self, status: int) -> None:
+        super().__init__(f"HTTP {status}")
+        self.status = status
+
+def test_rejected_request_fails_at_once_but_written_batches_still_invalidate(monkeypatch):
+    import pytest
+    from src import config
+
+    class RejectAfterFirst(FakeAsyncIndex):
+        calls = 0
+
+        async def upsert(self, vectors, namespace):
+            if self.requests:
+                self.calls += 1
+                raise ApiError(400)
+            await super().upsert(vectors, namespace)
+
+    monkeypatch.setattr(config, "PINECONE_UPSERT_MAX_VECTORS", 10)
+    index = RejectAfterFirst()
+    store = PineconeVectorStore(SlowEmbed(), pc=FakePinecone(index), upsert_concurrency=1)
+    changed = []
+    store.on_change(changed.append)
+    chunks = [Chunk(id=f"c{i}", text="pump", index=i, source="m.pdf") for i in range(20)]
+
+    with pytest.raises(ApiError):
+        store.upsert(DocumentBatch(source="m.pdf", chunks=chunks), "ns")
+    assert index.calls == 1 and len(index.stored) == 10  # a 400 is not retried
+    assert changed == ["ns"]  # the batch that was written still invalidates
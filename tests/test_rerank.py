@@ -0,0 +1,142 @@
+import asyncio
+import threading
+import numpy as np
+from core.schema import Chunk
+from core.strategies.rerank import RerankBatcher
+
+class FakeCrossEncoder:
+    mode = "cross"
+
+    def __init__(self):
+        self.batches: list[int] = []
+        self.threads: set[str] = set()
+
+    def score_pairs(self, pairs):
+        self.batches.append(len(pairs))
+        self.threads.add(threading.current_thread().name)
+        return np.array([float(len(text)) for _, text in pairs], dtype=np.float32)
+
+def test_batcher_coalesces_concurrent_requests():
+    xe = FakeCrossEncoder()
+    batcher = RerankBatcher(xe, max_batch=64, max_wait_ms=50)
+    chunks = [Chunk(id=str(i), text="x" * i, index=i, source="s") for i in range(1, 5)]
+
+    async def fire():
+        return await asyncio.gather(*(batcher.run(f"q{n}", chunks, top_n=2) for n in range(10)))
+
+    results = asyncio.run(fire())
+    batcher.close()
+    assert all([c.id for c in top] == ["4", "3"] for top in results)
+    assert sum(xe.batches) == 40 and len(xe.batches) < 10
+    assert xe.threads == {"rerank-batcher"}
+    stats = batcher.stats()
+    assert stats["requests"] == 10 and stats["queue_depth"] == 0 and stats["peak_queue_depth"] >= 2
+
+def _onnx_export(tmp_path):
+    """A local export dir: word-level tokenizer.json ([CLS] a [SEP] b [SEP]) and a placeholder model."""
+    from tokenizers import Tokenizer
+    from tokenizers.models import WordLevel
+    from tokenizers.pre_tokenizers import Whitespace
+    from tokenizers.processors import TemplateProcessing
+
+    words = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "q", "a", "b", "c", "d", "e"]
+    tok = Tokenizer(WordLevel({w: i for i, w in enumerate(words)}, unk_token="[UNK]"))
+    tok.pre_tokenizer = Whitespace()
+    tok.post_processor = TemplateProcessing(
+        single="[CLS] $A [SEP]", pair="[CLS] $A [SEP] $B:1 [SEP]:1", special_tokens=[("[CLS]", 2), ("[SEP]", 3)]
+    )
+    tok.save(str(tmp_path / "tokenizer.json"))
+    (tmp_path / "model.onnx").write_bytes(b"")
+    return tmp_path
+
+class FakeSession:
+    """Stands in for onnxruntime.InferenceSession: the logit of a row is its unpadded length."""
+    inputs = ("input_ids", "attention_mask", "token_type_ids")
+    feeds: list = []
+
+    def __init__(self, path, opts=None, providers=None):
+        self.path = path
+
+    def get_inputs(self):
+        return [type("Input", (), {"name": n})() for n in self.inputs]
+
+    def run(self, outputs, feed):
+        FakeSession.feeds.append(feed)
+        return [feed["attention_mask"].sum(axis=1, keepdims=True).astype(np.float32)]
+
+def test_onnx_cross_encoder_batches_by_length_and_keeps_pair_order(tmp_path, monkeypatch):
+    import pytest
+    ort = pytest.importorskip("onnxruntime")
+    pytest.importorskip("tokenizers")
+    from core.strategies.rerank import OnnxCrossEncoder
+
+    monkeypatch.setattr(ort, "InferenceSession", FakeSession)
+    monkeypatch.setattr(FakeSession, "feeds", [])
+    xe = OnnxCrossEncoder(str(_onnx_export(tmp_path)), "model.onnx", max_length=8, batch_size=2)
+    pairs = [["q", "a b c"], ["q", "a"], ["q", "a b c d e"], ["q", "a b"], ["q", "b"]]
+
+    scores = xe.predict(pairs)
+    # [CLS] q [SEP] text [SEP]; the longest pair is truncated to max_length
+    assert scores.tolist() == [7.0, 5.0, 8.0, 6.0, 5.0]
+    widths = [f["input_ids"].shape[1] for f in FakeSession.feeds]
+    assert widths == [5, 7, 8]  # each batch pads only to its own longest pair
+    first = FakeSession.feeds[0]
+    assert first["attention_mask"].tolist() == [[1] * 5, [1] * 5]
+    assert FakeSession.feeds[1]["attention_mask"].tolist() == [[1] * 6 + [0], [1] * 7]
+    assert first["token_type_ids"].tolist() == [[0, 0, 0, 1, 1]] * 2
+
+def test_onnx_cross_encoder_feeds_only_the_model_inputs(tmp_path, monkeypatch):
+    import pytest
+    ort = pytest.importorskip("onnxruntime")
+    pytest.importorskip("tokenizers")
+    from core.strategies.rerank import OnnxCrossEncoder
+
+    monkeypatch.setattr(ort, "InferenceSession", FakeSession)
+    monkeypatch.setattr(FakeSession, "feeds", [])
+    monkeypatch.setattr(FakeSession, "inputs", ("input_ids", "attention_mask"))
+    xe = OnnxCrossEncoder(str(_onnx_export(tmp_path)), "model.onnx")
+    assert xe.predict([["q", "a"]]).tolist() == [5.0]
+    assert set(FakeSession.feeds[0]) == {"input_ids", "attention_mask"}
+
+def test_sbert_rerank_backend_selection_and_fallback(monkeypatch):
+    import sys
+    import types
+    from core.strategies import rerank
+
+    class Onnx:
+        fail = False
+
+        def __init__(self, *args, **kwargs):
+            if Onnx.fail:
+                raise RuntimeError("no export")
+
+        def predict(self, pairs):
+            return [float(len(t)) for _, t in pairs]
+
+    class Cross:
+        fail = False
+
+        def __init__(self, *args, **kwargs):
+            if Cross.fail:
+                raise OSError("offline")
+
+        def predict(self, pairs):
+            return [-float(len(t)) for _, t in pairs]
+
+    class Bi:
+        def __init__(self, *args, **kwargs): ...
+
+    monkeypatch.setattr(rerank, "OnnxCrossEncoder", Onnx)
+    monkeypatch.setitem(
+        sys.modules, "sentence_transformers", types.SimpleNamespace(CrossEncoder=Cross, SentenceTransformer=Bi)
+    )
+    chunks = [Chunk(id=str(i), text="x" * i, index=i, source="s") for i in range(1, 4)]
+
+    onnx = rerank.SbertRerank(backend="auto")
+    assert onnx.mode == "onnx" and [c.id for c in onnx.run("q", chunks, 2)] == ["3", "2"]
+    assert rerank.SbertRerank(backend="torch").mode == "cross"  # never tries onnx
+    Onnx.fail = True
+    cross = rerank.SbertRerank(backend="onnx")
+    assert cross.mode == "cross" and [c.id for c in cross.run("q", chunks, 2)] == ["1", "2"]
+    Cross.fail = True
+    assert rerank.SbertRerank(backend="auto").mode == "bi"
@@ -0,0 +1,42 @@
+import asyncio
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+import pytest
+from core.registry import Registry
+
+BENCH = Path(__file__).resolve().parents[1] / "scripts" / "bench_startup.py"
+
+def test_app_import_is_light_and_needs_no_credentials():
+    out = subprocess.run(
+        [sys.executable, str(BENCH), "--runs", "1", "--top", "0"], capture_output=True, text=True, check=True
+    ).stdout
+    assert "heavy modules loaded: none" in out
+    budget_ms = float(os.getenv("IMPORT_BUDGET_MS", "8000"))
+    assert float(re.search(r"median (\d+) ms", out).group(1)) < budget_ms
+
+def test_registry_builds_once_and_checks_config(monkeypatch):
+    calls = []
+
+    def slow():
+        calls.append(threading.current_thread().name)
+        time.sleep(0.05)
+        return object()
+
+    reg = Registry()
+    reg.register("a", slow)
+    reg.register("b", lambda: ("b", reg.get("a")))
+    reg.register("needs_key", object, requires=("dropbox",))
+    assert reg.peek("a") is None and calls == []
+
+    asyncio.run(reg.warm_up(["a", "b", "a"]))
+    assert len(calls) == 1
+    assert reg.get("b")[1] is reg.get("a")
+
+    monkeypatch.delenv("DROPBOX_APP_SECRET", raising=False)
+    with pytest.raises(RuntimeError, match="DROPBOX_APP_SECRET"):
+        reg.get("needs_key")
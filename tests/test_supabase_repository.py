@@ -0,0 +1,96 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import pytest
+from integrations.supabase.repository import SupabaseRepository
+
+ROWS = [{"id": i, "name": f"file {i}"} for i in range(2500)]
+
+class FakePostgrest(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    requests: list[tuple] = []  # method, query, headers, client port, rows posted
+    paths: list[str] = []  # raw request paths, query string included
+
+    def do_GET(self) -> None:
+        self._log()
+        if "Range" not in self.headers:
+            self._send(200, ROWS[:1])
+            return
+        lo, hi = (int(x) for x in self.headers["Range"].split("-"))
+        if lo >= len(ROWS):
+            self._send(416, [])
+        else:
+            self._send(206, ROWS[lo : hi + 1])
+
+    def do_POST(self) -> None:
+        self._log(len(json.loads(self.rfile.read(int(self.headers["Content-Length"])))))
+        self._send(201, None)
+
+    def do_PATCH(self) -> None:
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self._log()
+        self._send(204, None)
+
+    def _log(self, rows: int = 0) -> None:
+        self.paths.append(self.path)
+        query = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+        self.requests.append((self.command, query, dict(self.headers), self.client_address[1], rows))
+
+    def _send(self, code: int, payload) -> None:
+        raw = b"" if payload is None else json.dumps(payload).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def log_message(self, *args) -> None:
+        pass
+
+@pytest.fixture
+def repo(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakePostgrest)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("SUPABASE_URL", f"http://127.0.0.1:{server.server_address[1]}")
+    monkeypatch.setenv("SUPABASE_SERVICE_KEY", "x")
+    FakePostgrest.requests = []
+    FakePostgrest.paths = []
+    yield SupabaseRepository(chunk_rows=400, page_rows=1000)
+    server.shutdown()
+
+def test_paginated_reads_and_chunked_upsert_reuse_one_connection(repo):
+    assert list(repo.iter_rows("files", "owner=u1", order="id")) == ROWS
+    repo.upsert("files", ROWS[:1000], on_conflict="id")
+    repo.close()
+
+    gets = [r for r in FakePostgrest.requests if r[0] == "GET"]
+    assert [g[2]["Range"] for g in gets] == ["0-999", "1000-1999", "2000-2999"]
+    assert gets[0][1] == {"select": "*", "owner": "eq.u1", "order": "id"}
+    posts = [r for r in FakePostgrest.requests if r[0] == "POST"]
+    assert [p[4] for p in posts] == [400, 400, 200]
+    assert posts[0][1] == {"on_conflict": "id"}
+    assert posts[0][2]["Prefer"] == "resolution=merge-duplicates,return=minimal"
+    assert len({r[3] for r in FakePostgrest.requests}) == 1  # one keep-alive connection
+
+def test_async_client_pages_and_upserts(repo):
+    async def run():
+        rows = [row async for row in repo.aiter_rows("files")]
+        await repo.aupsert("files", ROWS[:10], on_conflict="id", ignore_duplicates=True)
+        await repo.aclose()
+        return rows
+
+    assert asyncio.run(run()) == ROWS
+    assert FakePostgrest.requests[-1][2]["Prefer"].startswith("resolution=ignore-duplicates")
+    assert len({r[3] for r in FakePostgrest.requests}) == 1
+
+def test_filters_are_sent_as_postgrest_column_eq_value(repo):
+    # the baseline sent eq.column=value, which PostgREST does not read as a filter
+    repo.get("dropbox_accounts", "account_id=a1, user_id=u1", limit=1)
+    repo.update("dropbox_accounts", {"cursor": "c2"}, {"account_id": "a1"})
+    repo.close()
+    assert FakePostgrest.paths == [
+        "/rest/v1/dropbox_accounts?select=%2A&account_id=eq.a1&user_id=eq.u1&limit=1",
+        "/rest/v1/dropbox_accounts?account_id=eq.a1",
+    ]